@@ -0,0 +1,177 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+
+from cachi2.core.checksum import SUPPORTED_ALGORITHMS, ChecksumInfo
+from cachi2.core.config import get_config
+from cachi2.core.utils import get_cache_dir, materialize_file
+
+log = logging.getLogger(__name__)
+
+CACHE_ALGORITHM = "sha256"
+
+
+class ArtifactCache:
+    """A content-addressed store of downloaded artifacts, shared between Cachi2 runs.
+
+    Artifacts are stored under their checksum: <root>/blobs/sha256/ab/abcdef...
+
+    The index maps the key under which an artifact was fetched (typically its URL) to the checksum
+    of its content: <root>/index/<sha256 of the key> contains "sha256:abcdef...". Artifacts can
+    also be looked up by their checksums, for other algorithms than sha256 the index has an
+    entry for each checksum the artifact was verified against.
+
+    Both the artifacts and the index entries are written atomically (write to a temporary file,
+    then rename), so concurrent Cachi2 processes can safely share the same cache.
+
+    Note that the cache does not verify the artifacts against the checksums expected by the user,
+    callers are still responsible for doing that after an artifact gets materialized. The content
+    behind a URL can change, if it does not match the expected checksums, the caller should
+    forget the cached artifact and download it again.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """Initialize an ArtifactCache rooted at the specified directory."""
+        self.root = root
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Return the path to the cached artifact for this key, if there is one."""
+        index_file = self._index_path(key)
+        try:
+            algorithm, _, digest = index_file.read_text().strip().partition(":")
+        except FileNotFoundError:
+            return None
+
+        blob = self._blob_path(algorithm, digest)
+        if not blob.is_file():
+            log.debug("Artifact cache index for %s points to a missing blob", key)
+            return None
+
+        return blob
+
+    def lookup_checksums(self, checksums: Iterable[ChecksumInfo]) -> Optional[Path]:
+        """Return the path to a cached artifact that has any of these checksums, if there is one."""
+        for algorithm, digest in checksums:
+            if algorithm == CACHE_ALGORITHM:
+                blob: Optional[Path] = self._blob_path(algorithm, digest)
+                if blob and not blob.is_file():
+                    blob = None
+            else:
+                blob = self.lookup(_checksum_key(algorithm, digest))
+
+            if blob:
+                return blob
+        return None
+
+    def materialize(self, key: str, to_path: Path, checksums: Iterable[ChecksumInfo] = ()) -> bool:
+        """Place the cached artifact for this key at the specified path.
+
+        :param checksums: the expected checksums of the artifact, if any of them is in the cache,
+            prefer it over the artifact indexed under the key
+        :return: True if the artifact was found in the cache, False otherwise
+        """
+        blob = self.lookup_checksums(checksums) or self.lookup(key)
+        if blob is None:
+            return False
+
+        log.debug("Artifact cache hit: %s", key)
+        materialize_file(blob, to_path)
+        return True
+
+    def store(
+        self,
+        key: str,
+        file_path: Path,
+        checksums: Iterable[ChecksumInfo] = (),
+        digests: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Add a file to the cache and index it under the specified key.
+
+        :param checksums: the checksums the file was verified against, the file is also indexed
+            under those that it matches
+        :param digests: the already known checksums of the file by algorithm, e.g. computed while
+            it was being downloaded. The file is read only to compute the missing ones.
+        """
+        checksums = [
+            checksum
+            for checksum in checksums
+            if checksum.algorithm != CACHE_ALGORITHM and checksum.algorithm in SUPPORTED_ALGORITHMS
+        ]
+        digests = dict(digests or {})
+        hashers = {
+            algorithm: hashlib.new(algorithm)
+            for algorithm in {CACHE_ALGORITHM, *(checksum.algorithm for checksum in checksums)}
+            if algorithm not in digests
+        }
+        if hashers:
+            with open(file_path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    for hasher in hashers.values():
+                        hasher.update(chunk)
+            digests.update((algorithm, hasher.hexdigest()) for algorithm, hasher in hashers.items())
+        digest = digests[CACHE_ALGORITHM]
+
+        blob = self._blob_path(CACHE_ALGORITHM, digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp_blob = self._tmp_path(blob)
+            materialize_file(file_path, tmp_blob)
+            os.replace(tmp_blob, blob)
+
+        self._write_index(key, digest)
+        for algorithm, expected_digest in checksums:
+            if digests[algorithm] == expected_digest:
+                self._write_index(_checksum_key(algorithm, expected_digest), digest)
+
+        log.debug("Stored %s in the artifact cache as %s:%s", key, CACHE_ALGORITHM, digest)
+
+    def forget(self, key: str, checksums: Iterable[ChecksumInfo] = ()) -> None:
+        """Remove the cached artifact for this key, e.g. if it turned out to be bad.
+
+        :param checksums: the checksums that the artifact was expected to match, the artifacts
+            found under them (see lookup_checksums) are removed as well
+        """
+        self._index_path(key).unlink(missing_ok=True)
+        for algorithm, digest in checksums:
+            if algorithm == CACHE_ALGORITHM:
+                # the blob is named after its checksum, it must have been corrupted
+                self._blob_path(algorithm, digest).unlink(missing_ok=True)
+            else:
+                self._index_path(_checksum_key(algorithm, digest)).unlink(missing_ok=True)
+
+        log.debug("Removed %s from the artifact cache", key)
+
+    def _write_index(self, key: str, digest: str) -> None:
+        index_file = self._index_path(key)
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_index_file = self._tmp_path(index_file)
+        tmp_index_file.write_text(f"{CACHE_ALGORITHM}:{digest}\n")
+        os.replace(tmp_index_file, index_file)
+
+    def _blob_path(self, algorithm: str, digest: str) -> Path:
+        return self.root.joinpath("blobs", algorithm, digest[:2], digest)
+
+    def _index_path(self, key: str) -> Path:
+        key_digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.root.joinpath("index", key_digest[:2], key_digest)
+
+    @staticmethod
+    def _tmp_path(path: Path) -> Path:
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        os.close(fd)
+        return Path(tmp_path)
+
+
+def _checksum_key(algorithm: str, digest: str) -> str:
+    return f"checksum:{algorithm}:{digest}"
+
+
+def get_artifact_cache() -> Optional[ArtifactCache]:
+    """Get the artifact cache, or None if the cache is disabled in the config."""
+    if not get_config().use_artifact_cache:
+        return None
+    return ArtifactCache(get_cache_dir().joinpath("artifacts"))
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import threading
+from collections.abc import AsyncIterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from cachi2.core.config import get_config
+from cachi2.core.models.input import Request
+
+log = logging.getLogger(__name__)
+
+
+class _Batch:
+    """The state shared by all the requests of a batch."""
+
+    def __init__(self, download_limit: int) -> None:
+        self.caches: dict[str, dict[Any, Any]] = {}
+        self.download_slots = threading.BoundedSemaphore(download_limit)
+        self.lock = threading.Lock()
+
+
+_batch: Optional[_Batch] = None
+
+
+def run_batch(
+    requests: Sequence[Request], process_request: Callable[[Request], None]
+) -> dict[int, BaseException]:
+    """Process many requests in one Cachi2 process.
+
+    Up to batch_concurrency_limit requests are processed at the same time. The requests share
+    the state of the process: the HTTP sessions, the caches of the package managers (see
+    get_batch_cache) and the limit on the number of concurrent downloads (see download_slot).
+    A failed request does not stop the other ones.
+
+    :param requests: the requests to process
+    :param process_request: process a single request, e.g. fetch its dependencies and write
+        the output files
+    :return: the errors of the failed requests, by their index in the list of requests
+    """
+    global _batch
+
+    config = get_config()
+    _batch = _Batch(download_limit=config.concurrency_limit)
+
+    def process(i: int, request: Request) -> None:
+        log.info("[%d/%d] Processing %s", i + 1, len(requests), request.source_dir)
+        process_request(request)
+        log.info("[%d/%d] Done processing %s", i + 1, len(requests), request.source_dir)
+
+    try:
+        with ThreadPoolExecutor(
+            config.batch_concurrency_limit, thread_name_prefix="cachi2-batch"
+        ) as executor:
+            futures = [executor.submit(process, i, request) for i, request in enumerate(requests)]
+    finally:
+        _batch = None
+
+    errors = {}
+    for i, (request, future) in enumerate(zip(requests, futures)):
+        if error := future.exception():
+            log.error(
+                "[%d/%d] Failed to process %s: %s", i + 1, len(requests), request.source_dir, error
+            )
+            errors[i] = error
+
+    return errors
+
+
+def get_batch_cache(name: str) -> Optional[dict[Any, Any]]:
+    """Get the cache with this name, shared by all the requests of the running batch.
+
+    Package managers can use it to avoid repeating the same work for each request of a batch,
+    e.g. fetching the same PyPI project page. Outside of a batch, return None.
+
+    The cache is a plain dict, used by many threads at once. Single operations on it (get, set,
+    setdefault) are atomic.
+    """
+    batch = _batch
+    if batch is None:
+        return None
+
+    with batch.lock:
+        return batch.caches.setdefault(name, {})
+
+
+@asynccontextmanager
+async def download_slot() -> AsyncIterator[None]:
+    """Wait until the number of downloads in progress in the running batch is under the limit.
+
+    In a batch, the concurrency_limit config option limits the number of concurrent downloads
+    of all the requests together, not just of each request. Outside of a batch, do not wait.
+    """
+    batch = _batch
+    if batch is None:
+        yield
+        return
+
+    download_slots = batch.download_slots
+    acquire = asyncio.ensure_future(asyncio.to_thread(download_slots.acquire))
+    try:
+        await asyncio.shield(acquire)
+    except asyncio.CancelledError:
+        # the slot still gets acquired in the worker thread, give it back
+        acquire.add_done_callback(lambda _: download_slots.release())
+        raise
+
+    try:
+        yield
+    finally:
+        download_slots.release()
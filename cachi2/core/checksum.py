@@ -2,11 +2,13 @@ import base64
 import hashlib
 import logging
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from os import PathLike
 from pathlib import Path
-from typing import Iterable, NamedTuple, Optional, Union
+from typing import Iterable, Mapping, NamedTuple, Optional, Union
 
 from cachi2.core.errors import PackageRejected
+from cachi2.core.tracing import span
 
 log = logging.getLogger(__name__)
 
@@ -46,7 +48,7 @@ class _MismatchInfo(NamedTuple):
 def must_match_any_checksum(
     file_path: Union[str, PathLike[str]],
     expected_checksums: Iterable[ChecksumInfo],
-    chunk_size: int = 10240,
+    chunk_size: int = 1024 * 1024,
 ) -> None:
     """Verify that the file matches at least one of the expected checksums.
 
@@ -55,30 +57,140 @@ def must_match_any_checksum(
     If none of the checksums match, log all the mismatches and skipped algorithms at WARNING level,
     then raise an exception.
 
+    The file is read only once, all the needed checksums are computed in the same pass.
+
     :param file_path: path to the file to verify
     :param expected_checksums: all the possible checksums for this file
     :param chunk_size: when computing checksums, read the file in chunks of this size
     :raises PackageRejected: if none of the expected checksums matched the actual checksum
                              (for any of the supported algorithms)
     """
-    filename = Path(file_path).name
-    log.info("Verifying checksums of %s", filename)
-    mismatches: list[_MismatchInfo] = []
+    verifier = ChecksumVerifier(expected_checksums)
 
-    for algorithm, expected_digests in _group_by_algorithm(expected_checksums).items():
-        if algorithm in SUPPORTED_ALGORITHMS:
-            digest = _get_hexdigest(file_path, algorithm, chunk_size)
-        else:
-            digest = None
+    with span("verify_checksums", file=Path(file_path).name) as span_args:
+        if verifier.needs_data:
+            span_args["bytes"] = 0
+            buffer = bytearray(chunk_size)
+            view = memoryview(buffer)
+            with open(file_path, "rb", buffering=0) as f:
+                while n_bytes := f.readinto(buffer):
+                    verifier.update(view[:n_bytes])
+                    span_args["bytes"] += n_bytes
 
-        if digest not in expected_digests:
-            mismatches.append(_MismatchInfo(algorithm, digest))
-        else:
-            log.debug("%s: %s checksum matches: %s", filename, algorithm, digest)
-            return
+        verifier.verify(Path(file_path).name)
+
+
+def must_match_any_checksum_concurrently(
+    files: Mapping[Path, Iterable[ChecksumInfo]],
+    max_workers: Optional[int] = None,
+) -> None:
+    """Verify many files at once, see must_match_any_checksum.
+
+    The files are verified in a thread pool (hashlib releases the GIL while hashing). All files
+    get verified even if some of them fail the verification.
+
+    :param files: the expected checksums for each file
+    :param max_workers: maximum number of files verified at the same time (default: based on
+                        the number of CPUs, see concurrent.futures.ThreadPoolExecutor)
+    :raises PackageRejected: if any of the files did not match any of its expected checksums
+    """
+    failed_files = find_checksum_mismatches(files, max_workers)
+    if failed_files:
+        raise _checksum_mismatch_error(", ".join(file_path.name for file_path in failed_files))
+
+
+def find_checksum_mismatches(
+    files: Mapping[Path, Iterable[ChecksumInfo]],
+    max_workers: Optional[int] = None,
+) -> list[Path]:
+    """Verify many files at once, return the ones that did not match any of their checksums.
+
+    See must_match_any_checksum_concurrently, the mismatches are logged but not raised.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(must_match_any_checksum, file_path, checksums)
+            for file_path, checksums in files.items()
+        ]
+
+    failed_files = []
+    for file_path, future in zip(files, futures):
+        try:
+            future.result()
+        except PackageRejected:
+            failed_files.append(file_path)
+
+    return failed_files
 
-    _log_mismatches(filename, mismatches)
-    raise PackageRejected(
+
+class ChecksumVerifier:
+    """Verify data against the expected checksums incrementally, as it is being read or written.
+
+    >>> verifier = ChecksumVerifier(expected_checksums)
+    >>> for chunk in chunks:
+    ...     verifier.update(chunk)
+    >>> verifier.verify("some-file.tar.gz")
+
+    The verification follows the same rules as must_match_any_checksum.
+    """
+
+    def __init__(
+        self, expected_checksums: Iterable[ChecksumInfo], extra_algorithms: Iterable[str] = ()
+    ) -> None:
+        """Initialize a ChecksumVerifier.
+
+        :param expected_checksums: all the possible checksums for the data
+        :param extra_algorithms: also compute the checksums with these algorithms, see hexdigests
+        """
+        self._expected_digests = _group_by_algorithm(expected_checksums)
+        self._hashers = {
+            algorithm: hashlib.new(algorithm)
+            for algorithm in {*self._expected_digests, *extra_algorithms}
+            if algorithm in SUPPORTED_ALGORITHMS
+        }
+
+    @property
+    def needs_data(self) -> bool:
+        """Check if any of the expected checksums use a supported algorithm."""
+        return bool(self._hashers)
+
+    def update(self, data: Union[bytes, memoryview]) -> None:
+        """Feed the next chunk of data to all the needed hash algorithms."""
+        for hasher in self._hashers.values():
+            hasher.update(data)
+
+    def hexdigests(self) -> dict[str, str]:
+        """Get the checksums of the data fed so far, for all the computed algorithms."""
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self._hashers.items()}
+
+    def verify(self, filename: str) -> None:
+        """Verify that the data fed so far matches at least one of the expected checksums.
+
+        :param filename: name of the file the data belongs to, used for logging
+        :raises PackageRejected: if none of the expected checksums matched the actual checksum
+                                 (for any of the supported algorithms)
+        """
+        log.info("Verifying checksums of %s", filename)
+        mismatches: list[_MismatchInfo] = []
+
+        for algorithm, expected_digests in self._expected_digests.items():
+            if hasher := self._hashers.get(algorithm):
+                digest: Optional[str] = hasher.hexdigest()
+            else:
+                digest = None
+
+            if digest not in expected_digests:
+                mismatches.append(_MismatchInfo(algorithm, digest))
+            else:
+                log.debug("%s: %s checksum matches: %s", filename, algorithm, digest)
+                return
+
+        _log_mismatches(filename, mismatches)
+        raise _checksum_mismatch_error(filename)
+
+
+def _checksum_mismatch_error(filename: str) -> PackageRejected:
+    return PackageRejected(
         f"Failed to verify {filename} against any of the provided checksums.",
         solution=(
             "Please check if the expected checksums are correct.\n"
@@ -95,14 +207,6 @@ def _group_by_algorithm(checksums: Iterable[ChecksumInfo]) -> dict[str, set[str]
     return digests_by_algorithm
 
 
-def _get_hexdigest(file_path: Union[str, PathLike[str]], algorithm: str, chunk_size: int) -> str:
-    with open(file_path, "rb") as f:
-        hasher = hashlib.new(algorithm)
-        while chunk := f.read(chunk_size):
-            hasher.update(chunk)
-        return hasher.hexdigest()
-
-
 def _log_mismatches(filename: str, mismatches: list[_MismatchInfo]) -> None:
     for algorithm, digest in mismatches:
         if digest is not None:
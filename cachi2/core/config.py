@@ -12,12 +12,24 @@ class Config(BaseModel, extra="forbid"):
     """Singleton that provides default configuration for the Cachi2 process."""
 
     goproxy_url: str = "https://proxy.golang.org,direct"
+    incremental_fetch: bool = False
     default_environment_variables: dict = {}
+    gomod_cache_max_size_mb: int = 10240
+    gomod_concurrency_limit: int = 1
     gomod_download_max_tries: int = 5
+    gomod_native_download: bool = False
+    gomod_skip_tag_fetch: bool = False
     gomod_strict_vendor: bool = True
     subprocess_timeout: int = 3600
     requests_timeout: int = 45
     concurrency_limit: int = 5
+    batch_concurrency_limit: int = 4
+    package_manager_concurrency_limit: int = 1
+    use_artifact_cache: bool = False
+    use_git_archive: bool = False
+    use_git_mirror_cache: bool = False
+    use_gomod_cache: bool = False
+    yarn_in_place: bool = False
 
 
 def get_config() -> Config:
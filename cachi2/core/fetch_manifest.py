@@ -0,0 +1,223 @@
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import subprocess  # nosec
+from pathlib import Path
+from typing import Callable, Optional
+
+import pydantic
+
+from cachi2.core.config import get_config
+from cachi2.core.models.input import PackageInput, PackageManagerType, Request
+from cachi2.core.models.output import RequestOutput
+from cachi2.core.utils import run_cmd
+
+log = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".cachi2-fetch-manifest.json"
+
+# the files that determine the dependencies, relative to the package path
+_LOCKFILES: dict[PackageManagerType, tuple[str, ...]] = {
+    "gomod": ("go.mod", "go.sum", "vendor/modules.txt"),
+    "npm": ("package.json", "package-lock.json", "npm-shrinkwrap.json"),
+    "pip": (
+        "requirements.txt",
+        "requirements-build.txt",
+        "setup.py",
+        "setup.cfg",
+        "pyproject.toml",
+    ),
+    "yarn": ("package.json", "yarn.lock", ".yarnrc.yml"),
+}
+
+
+class _ManifestEntry(pydantic.BaseModel):
+    """The output of a package manager and what it was produced from."""
+
+    fingerprint: str
+    output: RequestOutput
+    # paths of the downloaded files (relative to the output directory) and their sizes
+    artifacts: dict[str, int]
+
+
+class _FetchManifest(pydantic.BaseModel):
+    """The content of the fetch manifest, an entry for each package manager."""
+
+    entries: dict[str, _ManifestEntry] = {}
+
+
+def resolve_incrementally(
+    request: Request,
+    resolve_by_type: Callable[[Request], dict[PackageManagerType, RequestOutput]],
+) -> dict[PackageManagerType, RequestOutput]:
+    """Reuse the outputs of a previous run into the same output directory where possible.
+
+    The output of each package manager is recorded in a manifest in the output directory along
+    with its fingerprint: the cachi2 version, the config, the flags, the package entries,
+    the git commit and the hashes of the lockfiles. If the fingerprint has not changed and all
+    the downloaded files are still there, the package manager is not run again.
+
+    The git work tree of the packages must be clean (no modified or untracked files), otherwise
+    the package manager always runs. Files ignored by git are not taken into account, except for
+    the lockfiles.
+
+    :param request: the request to process
+    :param resolve_by_type: run the package managers of a request, return their outputs by type
+    :return: the outputs of all the package managers in the request, by type
+    """
+    manifest_path = request.output_dir.join_within_root(MANIFEST_FILENAME).path
+    manifest = _load_manifest(manifest_path)
+    fingerprints = _get_fingerprints(request)
+
+    outputs: dict[PackageManagerType, RequestOutput] = {}
+    for pkg_type, fingerprint in fingerprints.items():
+        entry = manifest.entries.get(pkg_type)
+        if (
+            fingerprint
+            and entry
+            and entry.fingerprint == fingerprint
+            and _artifacts_exist(request.output_dir.path, entry.artifacts)
+        ):
+            log.info("%s: nothing changed since the previous run, reusing its output", pkg_type)
+            outputs[pkg_type] = entry.output
+
+    stale_packages = [package for package in request.packages if package.type not in outputs]
+    if stale_packages:
+        # the entries would not match the (partially) overwritten files if the run fails
+        for package in stale_packages:
+            manifest.entries.pop(package.type, None)
+        _write_manifest(manifest_path, manifest)
+
+        stale_request = request.model_copy(update={"packages": stale_packages})
+        fresh_outputs = resolve_by_type(stale_request)
+
+        for pkg_type, output in fresh_outputs.items():
+            if fingerprint := fingerprints.get(pkg_type):
+                manifest.entries[pkg_type] = _ManifestEntry(
+                    fingerprint=fingerprint,
+                    output=output,
+                    artifacts=_list_artifacts(request.output_dir.path, pkg_type),
+                )
+        _write_manifest(manifest_path, manifest)
+        outputs.update(fresh_outputs)
+
+    return {pkg_type: outputs[pkg_type] for pkg_type in sorted(outputs)}
+
+
+def _load_manifest(path: Path) -> _FetchManifest:
+    try:
+        return _FetchManifest.model_validate_json(path.read_text())
+    except FileNotFoundError:
+        return _FetchManifest()
+    except pydantic.ValidationError as e:
+        log.warning("Ignoring the invalid fetch manifest %s: %s", path, e)
+        return _FetchManifest()
+
+
+def _write_manifest(path: Path, manifest: _FetchManifest) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(manifest.model_dump_json())
+
+
+def _get_fingerprints(request: Request) -> dict[PackageManagerType, Optional[str]]:
+    """Compute the fingerprint of each package manager, None if the output cannot be reused."""
+    packages_by_type: dict[PackageManagerType, list[PackageInput]] = {}
+    for package in request.packages:
+        packages_by_type.setdefault(package.type, []).append(package)
+
+    commit_id = _get_clean_commit_id(request, [package.path for package in request.packages])
+    if commit_id is None:
+        return {pkg_type: None for pkg_type in packages_by_type}
+
+    common = {
+        "cachi2_version": importlib.metadata.version("cachi2"),
+        "config": get_config().model_dump(mode="json"),
+        "flags": sorted(request.flags),
+        "commit": commit_id,
+        # the outputs include absolute paths, e.g. of the project files
+        "source_dir": str(request.source_dir.path.resolve()),
+        "output_dir": str(request.output_dir.path.resolve()),
+    }
+    return {
+        pkg_type: _hash_json(
+            common
+            | {
+                "packages": [package.model_dump(mode="json") for package in packages],
+                "lockfiles": _hash_lockfiles(request, packages),
+            }
+        )
+        for pkg_type, packages in packages_by_type.items()
+    }
+
+
+def _get_clean_commit_id(request: Request, package_paths: list[Path]) -> Optional[str]:
+    """Get the HEAD commit of the source repository, None if the packages have local changes."""
+    pathspecs = [str(path) for path in package_paths]
+    try:
+        output_subpath = request.output_dir.path.relative_to(request.source_dir.path)
+        pathspecs.append(f":(exclude){output_subpath}")
+    except ValueError:
+        # the output directory is not in the source directory
+        pass
+
+    params = {"cwd": request.source_dir}
+    try:
+        commit_id = run_cmd(["git", "rev-parse", "HEAD"], params).strip()
+        status = run_cmd(
+            ["git", "status", "--porcelain", "--untracked-files=all", "--", *pathspecs], params
+        )
+    except subprocess.CalledProcessError:
+        log.debug("Cannot determine the git commit of %s, not reusing outputs", request.source_dir)
+        return None
+
+    if status:
+        log.info("The source directory has local changes, not reusing the previous outputs")
+        return None
+
+    return commit_id
+
+
+def _hash_lockfiles(request: Request, packages: list[PackageInput]) -> dict[str, Optional[str]]:
+    lockfile_hashes: dict[str, Optional[str]] = {}
+    for package in packages:
+        package_dir = request.source_dir.join_within_root(package.path)
+        lockfiles = list(_LOCKFILES[package.type])
+        # pip packages can specify their requirements files
+        lockfiles.extend(map(str, getattr(package, "requirements_files", None) or []))
+        lockfiles.extend(map(str, getattr(package, "requirements_build_files", None) or []))
+
+        for lockfile in lockfiles:
+            path = package_dir.join_within_root(lockfile)
+            key = str(path.subpath_from_root)
+            try:
+                lockfile_hashes[key] = hashlib.sha256(path.path.read_bytes()).hexdigest()
+            except FileNotFoundError:
+                lockfile_hashes[key] = None
+
+    return lockfile_hashes
+
+
+def _hash_json(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def _list_artifacts(output_dir: Path, pkg_type: PackageManagerType) -> dict[str, int]:
+    artifacts = {}
+    for dirpath, _, filenames in os.walk(output_dir / "deps" / pkg_type):
+        for filename in filenames:
+            path = Path(dirpath, filename)
+            artifacts[str(path.relative_to(output_dir))] = path.lstat().st_size
+    return artifacts
+
+
+def _artifacts_exist(output_dir: Path, artifacts: dict[str, int]) -> bool:
+    for relpath, size in artifacts.items():
+        try:
+            if output_dir.joinpath(relpath).lstat().st_size != size:
+                return False
+        except FileNotFoundError:
+            log.info("%s is missing, fetching the dependencies again", relpath)
+            return False
+    return True
@@ -24,11 +24,16 @@ DEFAULT_RETRY_OPTIONS: Dict[str, Any] = {
 }
 
 
-def get_requests_session(retry_options: Optional[dict] = None) -> Session:
+def get_requests_session(
+    retry_options: Optional[dict] = None,
+    pool_maxsize: int = requests.adapters.DEFAULT_POOLSIZE,
+) -> Session:
     """
     Create a requests session with retries.
 
     :param dict retry_options: overwrite options for initialization of Retry instance
+    :param int pool_maxsize: maximum number of connections to keep alive per host, should be
+        at least the number of threads sharing the session
     :return: the configured requests session
     :rtype: requests.Session
     """
@@ -36,7 +41,9 @@ def get_requests_session(retry_options: Optional[dict] = None) -> Session:
         retry_options = {}
     session = requests.Session()
     retry_options = {**DEFAULT_RETRY_OPTIONS, **retry_options}
-    adapter = requests.adapters.HTTPAdapter(max_retries=Retry(**retry_options))
+    adapter = requests.adapters.HTTPAdapter(
+        max_retries=Retry(**retry_options), pool_maxsize=pool_maxsize
+    )
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
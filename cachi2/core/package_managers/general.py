@@ -4,7 +4,7 @@ import logging
 import types
 from os import PathLike
 from pathlib import Path
-from typing import Any, Dict, Optional, Set, Union
+from typing import Any, Callable, Collection, Dict, Iterable, Mapping, Optional, Set, Union
 from urllib.parse import urlparse
 
 import aiohttp
@@ -12,13 +12,21 @@ import aiohttp_retry
 import requests
 from requests.auth import AuthBase
 
+from cachi2.core.artifact_cache import CACHE_ALGORITHM, get_artifact_cache
+from cachi2.core.batch import download_slot
+from cachi2.core.checksum import (
+    ChecksumInfo,
+    ChecksumVerifier,
+    find_checksum_mismatches,
+)
 from cachi2.core.config import get_config
-from cachi2.core.errors import FetchError
+from cachi2.core.errors import Cachi2Error, FetchError, PackageRejected
 from cachi2.core.http_requests import (
     DEFAULT_RETRY_OPTIONS,
     SAFE_REQUEST_METHODS,
     get_requests_session,
 )
+from cachi2.core.tracing import span
 
 pkg_requests_session = get_requests_session(retry_options={"allowed_methods": SAFE_REQUEST_METHODS})
 
@@ -43,17 +51,19 @@ def download_binary_file(
     :raise FetchError: If download failed
     """
     timeout = get_config().requests_timeout
-    try:
-        resp = pkg_requests_session.get(
-            url, stream=True, verify=not insecure, auth=auth, timeout=timeout
-        )
-        resp.raise_for_status()
-    except requests.RequestException as e:
-        raise FetchError(f"Could not download {url}: {e}")
+    with span("download", url=url) as span_args:
+        try:
+            resp = pkg_requests_session.get(
+                url, stream=True, verify=not insecure, auth=auth, timeout=timeout
+            )
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            raise FetchError(f"Could not download {url}: {e}")
 
-    with open(download_path, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=chunk_size):
-            f.write(chunk)
+        with open(download_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+        span_args["bytes"] = Path(download_path).stat().st_size
 
 
 async def _async_download_binary_file(
@@ -62,25 +72,48 @@ async def _async_download_binary_file(
     download_path: Union[str, PathLike[str]],
     auth: Optional[aiohttp.BasicAuth] = None,
     chunk_size: int = 8192,
-) -> None:
+    checksums: Iterable[ChecksumInfo] = (),
+    insecure: bool = False,
+    hash_algorithms: Collection[str] = (),
+) -> dict[str, str]:
     """
     Download a binary file (such as a TAR archive) from a URL using asyncio.
 
+    If checksums are provided, the file is verified while it is being downloaded (there is no
+    need to read it again afterwards).
+
     :param aiohttp_retry.RetryClient session: Aiohttp interface for making HTTP requests.
     :param str url: URL for file download
     :param str download_path: File path location
     :param aiohttp.BasicAuth auth: Authentication for the URL
     :param int chunk_size: Chunk size param for Response.content.read()
+    :param checksums: all the possible checksums for the file, see must_match_any_checksum
+    :param bool insecure: Do not verify SSL for the URL
+    :param hash_algorithms: also compute the checksums of the file with these algorithms
+    :return: the checksums of the file by algorithm, for the algorithms of the expected checksums
+        and the hash_algorithms
     :raise FetchError: If download failed
+    :raise PackageRejected: If the file does not match any of the checksums (the file is removed)
     """
+    checksums = list(checksums)
+    if checksums or hash_algorithms:
+        verifier: Optional[ChecksumVerifier] = ChecksumVerifier(checksums, hash_algorithms)
+    else:
+        verifier = None
+
     try:
-        async with session.get(url, auth=auth, raise_for_status=True) as resp:
-            with open(download_path, "wb") as f:
-                while True:
-                    chunk = await resp.content.read(chunk_size)
-                    if not chunk:
-                        break
-                    f.write(chunk)
+        with span("download", url=url) as span_args:
+            async with session.get(url, auth=auth, raise_for_status=True, ssl=not insecure) as resp:
+                span_args["bytes"] = 0
+                with open(download_path, "wb") as f:
+                    while True:
+                        chunk = await resp.content.read(chunk_size)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        span_args["bytes"] += len(chunk)
+                        if verifier:
+                            verifier.update(chunk)
 
     except Exception as exception:
         log.error(f"Unsuccessful download: {url}")
@@ -91,16 +124,91 @@ async def _async_download_binary_file(
 
     log.debug(f"Download completed - {url}")
 
+    if not verifier:
+        return {}
+
+    if checksums:
+        try:
+            verifier.verify(Path(download_path).name)
+        except PackageRejected:
+            Path(download_path).unlink()
+            raise
+
+    return verifier.hexdigests()
+
 
 async def async_download_files(
     files_to_download: Dict[str, Union[str, PathLike[str]]],
     concurrency_limit: int,
+    checksums: Optional[Mapping[str, Iterable[ChecksumInfo]]] = None,
+    insecure_urls: Collection[str] = frozenset(),
+    on_download: Optional[Callable[[str, Path], None]] = None,
+    on_failure: Optional[Callable[[str, Cachi2Error], None]] = None,
 ) -> None:
     """Asynchronous function to download files.
 
+    If the artifact cache is enabled, files found in the cache (by their expected checksums or by
+    their URL) are not downloaded again. A cached file that does not match the expected checksums
+    is removed from the cache and downloaded again. Files are added to the cache only after they
+    have been verified.
+
     :param files_to_download: Dict of files to download with file paths
     :param concurrency_limit: Max number of concurrent tasks (downloads).
+    :param checksums: Dict of expected checksums by URL. Files are verified while being
+        downloaded, the first mismatch fails the whole batch.
+    :param insecure_urls: Do not verify SSL for these URLs
+    :param on_download: Called with the URL and path of each file as soon as the file is
+        downloaded and verified, e.g. to validate the file contents. Runs in a worker thread,
+        so that it does not hold up the other downloads. An exception fails the whole batch.
+    :param on_failure: Called with the URL of a file and the error if the file could not be
+        downloaded or does not match its checksums, instead of failing the whole batch. It can
+        re-raise the error to fail the batch anyway.
+    :raise FetchError: If any download failed
+    :raise PackageRejected: If any file does not match its expected checksums
     """
+    if checksums is None:
+        checksums = {}
+
+    artifact_cache = get_artifact_cache()
+
+    async def download(
+        session: aiohttp_retry.RetryClient, url: str, download_path: Union[str, PathLike[str]]
+    ) -> None:
+        try:
+            # in a batch, the concurrent downloads of all the requests count towards the limit
+            async with download_slot():
+                digests = await _async_download_binary_file(
+                    session,
+                    url,
+                    download_path,
+                    checksums=checksums.get(url, ()),
+                    insecure=url in insecure_urls,
+                    # the cache needs the checksum, compute it while downloading
+                    hash_algorithms=[CACHE_ALGORITHM] if artifact_cache else (),
+                )
+        except Cachi2Error as e:
+            if on_failure is None:
+                raise
+            on_failure(url, e)
+            return
+
+        if artifact_cache:
+            # before on_download, which may move the file away
+            await asyncio.to_thread(
+                artifact_cache.store, url, Path(download_path), checksums.get(url, ()), digests
+            )
+        await asyncio.to_thread(call_on_download, url, Path(download_path))
+
+    def call_on_download(url: str, download_path: Path) -> None:
+        if on_download is None:
+            return
+        try:
+            on_download(url, download_path)
+        except Exception:
+            if artifact_cache:
+                # e.g. the file failed the caller's own verification, do not reuse it
+                artifact_cache.forget(url, checksums.get(url, ()))
+            raise
 
     async def on_request_start(
         session: aiohttp.ClientSession,
@@ -120,6 +228,38 @@ async def async_download_files(
         retry_options=retry_options, trace_configs=[trace_config]
     )
 
+    if artifact_cache:
+        cached = {
+            url: Path(download_path)
+            for url, download_path in files_to_download.items()
+            if artifact_cache.materialize(url, Path(download_path), checksums.get(url, ()))
+        }
+        mismatches = find_checksum_mismatches(
+            {
+                cached_path: expected_checksums
+                for url, cached_path in cached.items()
+                if (expected_checksums := list(checksums.get(url, ())))
+            },
+            max_workers=concurrency_limit,
+        )
+        for url, cached_path in list(cached.items()):
+            if cached_path in mismatches:
+                # e.g. the content behind the URL changed and the user updated the checksum
+                log.warning("The cached %s does not match, downloading it again", url)
+                artifact_cache.forget(url, checksums.get(url, ()))
+                # it can be a hardlink to the cached file, do not download into it
+                cached_path.unlink()
+                del cached[url]
+
+        for url, cached_path in cached.items():
+            call_on_download(url, cached_path)
+
+        files_to_download = {
+            url: download_path
+            for url, download_path in files_to_download.items()
+            if url not in cached
+        }
+
     async with retry_client as session:
         tasks: Set[asyncio.Task] = set()
 
@@ -130,7 +270,7 @@ async def async_download_files(
                 # Check for exceptions
                 try:
                     await asyncio.gather(*done)
-                except FetchError:
+                except Cachi2Error:
                     # Close retry_client if any request fails (other tasks can be running,
                     # if a task is closed with the client open, an Warning is raised).
                     await retry_client.close()
@@ -138,7 +278,7 @@ async def async_download_files(
                         t.cancel()
                     raise
 
-            tasks.add(asyncio.create_task(_async_download_binary_file(session, url, download_path)))
+            tasks.add(asyncio.create_task(download(session, url, download_path)))
 
         await asyncio.gather(*tasks)
 
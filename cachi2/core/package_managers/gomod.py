@@ -1,17 +1,25 @@
+import asyncio
+import base64
+import hashlib
 import logging
 import os
 import re
 import shutil
 import subprocess  # nosec
 import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from functools import cached_property
+from functools import cached_property, partial
 from itertools import chain
 from pathlib import Path
 from types import TracebackType
 from typing import (
+    IO,
     TYPE_CHECKING,
     Any,
+    Callable,
     Iterable,
     Iterator,
     Literal,
@@ -34,14 +42,28 @@ if TYPE_CHECKING:
     from typing_extensions import Self
 
 from cachi2.core.config import get_config
-from cachi2.core.errors import FetchError, PackageManagerError, PackageRejected, UnexpectedFormat
+from cachi2.core.errors import (
+    Cachi2Error,
+    FetchError,
+    PackageManagerError,
+    PackageRejected,
+    UnexpectedFormat,
+)
 from cachi2.core.models.input import Request
 from cachi2.core.models.output import EnvironmentVariable, RequestOutput
 from cachi2.core.models.property_semantics import PropertySet
 from cachi2.core.models.sbom import Component
+from cachi2.core.package_managers.general import async_download_files
+from cachi2.core.plan import PlannedArtifact
 from cachi2.core.rooted_path import PathOutsideRoot, RootedPath
 from cachi2.core.scm import get_repo_id
-from cachi2.core.utils import get_cache_dir, load_json_stream, run_cmd
+from cachi2.core.utils import (
+    get_cache_dir,
+    materialize_directory,
+    materialize_file,
+    run_cmd,
+    run_cmd_json_stream,
+)
 
 log = logging.getLogger(__name__)
 
@@ -211,6 +233,9 @@ class StandardPackage(NamedTuple):
         return Component(name=self.name, purl=self.purl)
 
 
+_toolchain_install_lock = threading.Lock()
+
+
 # NOTE: Skim the class once we don't need to work with multiple versions of Go
 class Go:
     """High level wrapper over the 'go' CLI command.
@@ -254,17 +279,49 @@ class Go:
         if params is None:
             params = {}
 
-        # we check both values to silence the type checker complaining self._release might be None
-        if self._install_toolchain and self._release:
-            self._bin = self._install(self._release)
-            self._install_toolchain = False
-
-        cmd = [self._bin] + cmd
+        cmd = [self._get_bin()] + cmd
         if retry:
             return self._retry(cmd, **params)
 
         return self._run(cmd, **params)
 
+    def iter_json(
+        self, cmd: list[str], params: Optional[dict] = None, retry: bool = False
+    ) -> Iterator[Any]:
+        """Run a Go command and parse the JSON objects from its output as they are printed.
+
+        Unlike load_json_stream(go(cmd)), the output is never held in memory as a whole. The
+        command runs as the returned iterator is consumed.
+
+        :param cmd: Go CLI options
+        :param params: additional subprocess arguments, e.g. 'env'
+        :param retry: whether the command should be retried on failure (e.g. network actions),
+            the command then runs right away and the objects are collected in a list, because
+            a retried command cannot take back the objects it has already yielded
+        :returns: the parsed JSON objects
+        """
+        if params is None:
+            params = {}
+
+        cmd = [self._get_bin()] + cmd
+        if retry:
+            return iter(self._retry(cmd, runner=self._run_json_list, **params))
+
+        return self._run_json(cmd, **params)
+
+    def _get_bin(self) -> str:
+        # we check both values to silence the type checker complaining self._release might be None
+        if self._install_toolchain and self._release:
+            # Multiple modules may be processed in parallel, only install the toolchain once
+            with _toolchain_install_lock:
+                if bin_ := self._locate_toolchain(self._release):
+                    self._bin = bin_
+                else:
+                    self._bin = self._install(self._release)
+            self._install_toolchain = False
+
+        return self._bin
+
     @property
     def version(self) -> version.Version:
         """Version of the Go toolchain as a packaging.version.Version object."""
@@ -359,7 +416,9 @@ class Go:
         log.debug(f"Go {release} toolchain installed at: {cachi2_go_dest_dir}")
         return str(cachi2_go_dest_dir / "bin/go")
 
-    def _retry(self, cmd: list[str], **kwargs: Any) -> str:
+    def _retry(
+        self, cmd: list[str], runner: Optional[Callable[..., Any]] = None, **kwargs: Any
+    ) -> Any:
         """Run gomod command in a networking context.
 
         Commands that involve networking, such as dependency downloads, may fail due to network
@@ -379,8 +438,8 @@ class Go:
             max_tries=n_tries,
             logger=log,
         )
-        def run_go(_cmd: list[str], **kwargs: Any) -> str:
-            return self._run(_cmd, **kwargs)
+        def run_go(_cmd: list[str], **kwargs: Any) -> Any:
+            return (runner or self._run)(_cmd, **kwargs)
 
         try:
             return run_go(cmd, **kwargs)
@@ -401,6 +460,19 @@ class Go:
                 f"Go execution failed: `{' '.join(cmd)}` failed with {rc=}"
             ) from e
 
+    def _run_json(self, cmd: list[str], **kwargs: Any) -> Iterator[Any]:
+        try:
+            log.debug(f"Running '{cmd}'")
+            yield from run_cmd_json_stream(cmd, kwargs)
+        except subprocess.CalledProcessError as e:
+            rc = e.returncode
+            raise PackageManagerError(
+                f"Go execution failed: `{' '.join(cmd)}` failed with {rc=}"
+            ) from e
+
+    def _run_json_list(self, cmd: list[str], **kwargs: Any) -> list[Any]:
+        return list(self._run_json(cmd, **kwargs))
+
 
 ModuleID = tuple[str, str]
 
@@ -562,7 +634,8 @@ def fetch_gomod_source(request: Request) -> RequestOutput:
 
     with GoCacheTemporaryDirectory(prefix="cachi2-") as tmp_dir:
         request.gomod_download_dir.path.mkdir(exist_ok=True, parents=True)
-        for subpath in subpaths:
+
+        def process_module(subpath: str) -> list[Component]:
             log.info("Fetching the gomod dependencies at subpath %s", subpath)
 
             log.info(f'Fetching the gomod dependencies at the "{subpath}" directory')
@@ -593,21 +666,40 @@ def fetch_gomod_source(request: Request) -> RequestOutput:
 
             packages = _create_packages_from_parsed_data(modules, resolve_result.parsed_packages)
 
-            components.extend(module.to_component() for module in modules)
-            components.extend(package.to_component() for package in packages)
+            module_components = [module.to_component() for module in modules]
+            module_components.extend(package.to_component() for package in packages)
+            return module_components
+
+        # All the modules share the same module cache, the go command locks it as needed.
+        # The components are collected in the order of the subpaths, regardless of which
+        # module finished first.
+        max_workers = min(config.gomod_concurrency_limit, len(subpaths))
+        if max_workers <= 1:
+            for subpath in subpaths:
+                components.extend(process_module(subpath))
+        else:
+            with ThreadPoolExecutor(max_workers, thread_name_prefix="cachi2-gomod") as executor:
+                futures = [executor.submit(process_module, subpath) for subpath in subpaths]
+                for future in futures:
+                    components.extend(future.result())
+
+        tmp_download_cache_dir = Path(tmp_dir).joinpath(request.go_mod_cache_download_part)
+
+        if (module_cache := _get_module_cache()) and tmp_download_cache_dir.exists():
+            log.debug("Adding dependencies from %s to the Go module cache", tmp_download_cache_dir)
+            module_cache.store(tmp_download_cache_dir)
+            module_cache.evict()
 
         if "gomod-vendor-check" not in request.flags and "gomod-vendor" not in request.flags:
-            tmp_download_cache_dir = Path(tmp_dir).joinpath(request.go_mod_cache_download_part)
             if tmp_download_cache_dir.exists():
                 log.debug(
                     "Adding dependencies from %s to %s",
                     tmp_download_cache_dir,
                     request.gomod_download_dir,
                 )
-                shutil.copytree(
-                    tmp_download_cache_dir,
-                    str(request.gomod_download_dir),
-                    dirs_exist_ok=True,
+                # the temporary directory gets deleted afterwards, move the files if possible
+                materialize_directory(
+                    tmp_download_cache_dir, request.gomod_download_dir.path, move=True
                 )
 
     return RequestOutput.from_obj_list(
@@ -619,6 +711,39 @@ def fetch_gomod_source(request: Request) -> RequestOutput:
     )
 
 
+def plan_gomod_source(request: Request) -> list[PlannedArtifact]:
+    """List the module .zip files that fetch_gomod_source would download, see cachi2.core.plan.
+
+    The modules are listed from go.sum, the go command may not need all of them (or may need
+    modules that are not there yet, if go.sum is not up to date). Without an http(s) proxy in
+    GOPROXY, the modules are listed without a URL.
+    """
+    proxy = _get_http_goproxy(get_config().goproxy_url)
+    module_cache = _get_module_cache()
+
+    artifacts = []
+    for package in request.gomod_packages:
+        app_dir = request.source_dir.join_within_root(package.path)
+        for name, module_version in sorted(_parse_go_sum(app_dir)):
+            subpath = Path(
+                _escape_module_path(name), "@v", _escape_module_path(module_version) + ".zip"
+            )
+            url = f"{proxy.rstrip('/')}/{subpath.as_posix()}" if proxy else None
+            artifact = PlannedArtifact(
+                package_manager="gomod",
+                name=name,
+                version=module_version,
+                kind="download",
+                url=url,
+            )
+            if module_cache and (cached_zip := module_cache.root / subpath).exists():
+                artifact.cached = True
+                artifact.size = cached_zip.stat().st_size
+            artifacts.append(artifact)
+
+    return artifacts
+
+
 def _create_main_module_from_parsed_data(
     main_module_dir: RootedPath, repo_name: str, parsed_main_module: ParsedModule
 ) -> Module:
@@ -692,10 +817,32 @@ def _protect_against_symlinks(app_dir: RootedPath) -> None:
     check_potential_symlink("go.mod")
     check_potential_symlink("go.sum")
     check_potential_symlink("vendor/modules.txt")
-    for go_file in app_dir.path.rglob("*.go"):
+    # Only symlinks can lead outside the source directory, don't resolve every single *.go file
+    for go_file in _find_symlinks(app_dir.path, suffix=".go"):
         check_potential_symlink(go_file.relative_to(app_dir))
 
 
+def _find_symlinks(directory: Path, suffix: str = "") -> Iterator[Path]:
+    """Find the symlinks whose names end with the suffix in a directory tree.
+
+    Symlinked directories are not followed. The file types come from os.scandir, which gets them
+    from the directory listing itself on most file systems, so there is no syscall per file.
+    """
+    directories = [directory]
+    while directories:
+        try:
+            entries = list(os.scandir(directories.pop()))
+        except (FileNotFoundError, PermissionError):
+            continue
+
+        for entry in entries:
+            if entry.is_symlink():
+                if entry.name.endswith(suffix):
+                    yield Path(entry.path)
+            elif entry.is_dir():
+                directories.append(Path(entry.path))
+
+
 def _find_missing_gomod_files(source_path: RootedPath, subpaths: list[str]) -> list[Path]:
     """
     Find all go modules with missing gomod files.
@@ -748,7 +895,10 @@ def _resolve_gomod(
         "GOTOOLCHAIN": "local",
     }
 
-    if config.goproxy_url:
+    if module_cache := _get_module_cache():
+        module_cache.validate(app_dir.join_within_root("go.sum").path)
+        env["GOPROXY"] = module_cache.goproxy(config.goproxy_url)
+    elif config.goproxy_url:
         env["GOPROXY"] = config.goproxy_url
 
     if "cgo-disable" in request.flags:
@@ -756,6 +906,11 @@ def _resolve_gomod(
 
     run_params = {"env": env, "cwd": app_dir}
 
+    if config.gomod_native_download:
+        _download_modules_from_go_sum(
+            app_dir, Path(tmp_dir, Request.go_mod_cache_download_part), config.goproxy_url
+        )
+
     go = Go()
     go1_21 = version.Version("1.21")
     go_base_version = go.version
@@ -800,7 +955,7 @@ def _resolve_gomod(
         log.info("Downloading the gomod dependencies")
         downloaded_modules = (
             ParsedModule.model_validate(obj)
-            for obj in load_json_stream(go(["mod", "download", "-json"], run_params, retry=True))
+            for obj in go.iter_json(["mod", "download", "-json"], run_params, retry=True)
         )
 
     if "force-gomod-tidy" in flags:
@@ -811,15 +966,8 @@ def _resolve_gomod(
         # Make Go ignore the vendor dir even if there is one
         go_list.extend(["-mod", "readonly"])
 
-    main_module_name = go([*go_list, "-m"], run_params).rstrip()
-    main_module = ParsedModule(
-        path=main_module_name,
-        version=version_resolver.get_golang_version(main_module_name, app_dir),
-        main=True,
-    )
-
     def go_list_deps(pattern: Literal["./...", "all"]) -> Iterator[ParsedPackage]:
-        """Run go list -deps -json and return the parsed list of packages.
+        """Run go list -deps -json and parse the packages as they are printed.
 
         The "./..." pattern returns the list of packages compiled into the final binary.
 
@@ -827,16 +975,36 @@ def _resolve_gomod(
         complete module list (roughly matching the list of downloaded modules).
         """
         cmd = [*go_list, "-deps", "-json=ImportPath,Module,Standard,Deps", pattern]
-        return map(ParsedPackage.model_validate, load_json_stream(go(cmd, run_params)))
-
-    package_modules = (
-        module for pkg in go_list_deps("all") if (module := pkg.module) and not module.main
-    )
+        return map(ParsedPackage.model_validate, go.iter_json(cmd, run_params))
 
-    all_modules = _deduplicate_resolved_modules(package_modules, downloaded_modules)
+    def go_list_dep_modules() -> list[ParsedModule]:
+        """Get the modules of all the dependency packages, except the main module.
 
+        Only one module per name and version is kept, the packages are not kept in memory.
+        """
+        modules: dict[ModuleID, ParsedModule] = {}
+        for pkg in go_list_deps("all"):
+            if (module := pkg.module) and not module.main:
+                modules.setdefault(_get_module_id(module), module)
+        return list(modules.values())
+
+    # The go list commands are independent and read-only. Loading all the packages takes a while
+    # for large modules, run the commands concurrently.
     log.info("Retrieving the list of packages")
-    all_packages = list(go_list_deps("./..."))
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="cachi2-go-list") as executor:
+        main_module_future = executor.submit(go, [*go_list, "-m"], run_params)
+        package_modules_future = executor.submit(go_list_dep_modules)
+        all_packages_future = executor.submit(lambda: list(go_list_deps("./...")))
+
+    main_module_name = main_module_future.result().rstrip()
+    main_module = ParsedModule(
+        path=main_module_name,
+        version=version_resolver.get_golang_version(main_module_name, app_dir),
+        main=True,
+    )
+
+    all_modules = _deduplicate_resolved_modules(package_modules_future.result(), downloaded_modules)
+    all_packages = all_packages_future.result()
 
     _validate_local_replacements(all_modules, app_dir)
 
@@ -849,11 +1017,22 @@ def _parse_go_sum(module_dir: RootedPath) -> frozenset[ModuleID]:
     A module is considered present if the checksum for its .zip file is present. The go.mod file
     checksums are not relevant for our purposes.
     """
+    modules = (
+        (name, version)
+        for name, version, _ in _iter_go_sum(module_dir)
+        if Path(version).name != "go.mod"
+    )
+    return frozenset(modules)
+
+
+def _iter_go_sum(module_dir: RootedPath) -> Iterator[tuple[str, str, str]]:
+    """Iterate over the (name, version, hash) entries of the go.sum file in the directory.
+
+    For go.mod file checksums, the version ends with /go.mod.
+    """
     go_sum = module_dir.join_within_root("go.sum")
     if not go_sum.path.exists():
-        return frozenset()
-
-    modules: list[ModuleID] = []
+        return
 
     # https://github.com/golang/go/blob/d5c5808534f0ad97333b1fd5fff81998f44986fe/src/cmd/go/internal/modfetch/fetch.go#L507-L534
     lines = go_sum.path.read_text().splitlines()
@@ -873,13 +1052,113 @@ def _parse_go_sum(module_dir: RootedPath) -> frozenset[ModuleID]:
             )
             break
 
-        name, version, _ = parts
-        if Path(version).name == "go.mod":
-            continue
+        name, version, hash_ = parts
+        yield name, version, hash_
 
-        modules.append((name, version))
 
-    return frozenset(modules)
+def _download_modules_from_go_sum(
+    app_dir: RootedPath, download_dir: Path, goproxy_url: str
+) -> None:
+    """Download the modules listed in go.sum from the GOPROXY directly into the Go download cache.
+
+    Download the .info, .mod and .zip files concurrently, with retries for each file, and lay
+    them out in the GOMODCACHE/cache/download format. The .mod and .zip files are verified
+    against go.sum before they get placed into the cache. The go command then finds the modules
+    already downloaded. Whatever could not be downloaded (e.g. private modules that are not
+    available from the proxy) is left for the go command to download.
+
+    :param app_dir: the directory of the module with the go.sum file
+    :param download_dir: the GOMODCACHE/cache/download directory
+    :param goproxy_url: the GOPROXY value, the first http(s) proxy in the list is used
+    :raises PackageRejected: if a module does not match its checksum in go.sum
+    """
+    proxy = _get_http_goproxy(goproxy_url)
+    if proxy is None:
+        log.debug("No http(s) proxy in GOPROXY=%s, not downloading modules natively", goproxy_url)
+        return
+
+    module_cache = _get_module_cache()
+    download_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix=".cachi2-", dir=download_dir) as staging_dir:
+        files_to_download: dict[str, Union[str, os.PathLike[str]]] = {}
+        # URL => (the module, the path in the download cache, the expected hash)
+        targets: dict[str, tuple[str, Path, Optional[str]]] = {}
+
+        for name, module_version, hash_ in _iter_go_sum(app_dir):
+            if module_version.endswith("/go.mod"):
+                module_version = module_version.removesuffix("/go.mod")
+                files: list[tuple[str, Optional[str]]] = [(".mod", hash_)]
+            else:
+                files = [(".info", None), (".zip", hash_)]
+
+            for suffix, expected_hash in files:
+                subpath = Path(
+                    _escape_module_path(name), "@v", _escape_module_path(module_version) + suffix
+                )
+                # modules in the persistent module cache are left for the go command
+                if download_dir.joinpath(subpath).exists() or (
+                    module_cache and module_cache.root.joinpath(subpath).exists()
+                ):
+                    continue
+
+                url = f"{proxy.rstrip('/')}/{subpath.as_posix()}"
+                files_to_download[url] = Path(staging_dir, str(len(files_to_download)) + suffix)
+                targets[url] = (f"{name}@{module_version}", download_dir / subpath, expected_hash)
+
+        def verify_and_place(url: str, downloaded_path: Path) -> None:
+            module, target_path, expected_hash = targets[url]
+
+            if downloaded_path.suffix == ".zip":
+                actual_hash: Optional[str] = _hash_zip(downloaded_path)
+            elif downloaded_path.suffix == ".mod":
+                actual_hash = _hash_go_mod(downloaded_path)
+            else:
+                actual_hash = None
+
+            if actual_hash != expected_hash:
+                raise PackageRejected(
+                    f"Verifying {module}{downloaded_path.suffix}: checksum mismatch, "
+                    f"downloaded: {actual_hash}, go.sum: {expected_hash}",
+                    solution=(
+                        "Please check if the checksums in your go.sum file are correct.\n"
+                        "Caution is advised; if the checksum previously did match, "
+                        "someone may have tampered with the module!"
+                    ),
+                )
+
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(downloaded_path, target_path)
+            if actual_hash and downloaded_path.suffix == ".zip":
+                ziphash_path = Path(staging_dir, downloaded_path.stem + ".ziphash")
+                ziphash_path.write_text(actual_hash)
+                os.replace(ziphash_path, target_path.with_suffix(".ziphash"))
+
+        failed_modules: set[str] = set()
+
+        def on_failure(url: str, error: Cachi2Error) -> None:
+            module, _, _ = targets[url]
+            log.debug("Failed to download %s: %s", url, error)
+            failed_modules.add(module)
+
+        if not files_to_download:
+            return
+
+        log.info("Downloading %d Go module file(s) from %s", len(files_to_download), proxy)
+        asyncio.run(
+            async_download_files(
+                files_to_download,
+                get_config().concurrency_limit,
+                on_download=verify_and_place,
+                on_failure=on_failure,
+            )
+        )
+        if failed_modules:
+            log.warning(
+                "Failed to download %d module(s), the go command will retry: %s",
+                len(failed_modules),
+                ", ".join(sorted(failed_modules)),
+            )
 
 
 def _deduplicate_resolved_modules(
@@ -918,6 +1197,177 @@ class GoCacheTemporaryDirectory(tempfile.TemporaryDirectory[str]):
             super().__exit__(exc, value, tb)
 
 
+def _get_http_goproxy(goproxy_url: str) -> Optional[str]:
+    """Get the first http(s) proxy in the GOPROXY list, if there is one."""
+    return next(
+        (url for url in re.split(r"[,|]", goproxy_url) if url.startswith(("http://", "https://"))),
+        None,
+    )
+
+
+class GoModuleCache:
+    """A persistent Go module download cache, shared between Cachi2 runs.
+
+    The cache has the layout of the module download cache (GOMODCACHE/cache/download), which is
+    also the layout of a GOPROXY. Go uses the cache as the first proxy in the GOPROXY list, so the
+    modules found in the cache are not downloaded again, and the per-request GOMODCACHE still gets
+    only the modules that the request needs. The go command verifies the modules it gets from the
+    cache against go.sum (and the checksum database), like it does for any other proxy.
+
+    The least recently used files are evicted when the cache grows over the maximum size.
+    """
+
+    # files that only make sense in a module cache, not in a proxy
+    _IGNORED_DIRS = frozenset(["sumdb"])
+    _IGNORED_FILE_PATTERN = re.compile(r"^list$|\.lock$|\.partial$|\.tmp")
+
+    def __init__(self, root: Path, max_size: int) -> None:
+        """Initialize a GoModuleCache.
+
+        :param root: the directory of the cache
+        :param max_size: the maximum size of the cache in bytes
+        """
+        self.root = root
+        self.max_size = max_size
+
+    def goproxy(self, upstream_goproxy: str) -> str:
+        """Get the GOPROXY value that uses the cache first, then falls back to the upstream proxy."""
+        return f"file://{self.root},{upstream_goproxy or 'https://proxy.golang.org,direct'}"
+
+    def validate(self, go_sum: Path) -> None:
+        """Evict the cached modules that do not match the checksums in the go.sum file.
+
+        Otherwise, go would fail the checksum verification instead of downloading them again.
+        """
+        if not go_sum.exists():
+            return
+
+        for line in go_sum.read_text().splitlines():
+            parts = line.split()
+            if len(parts) != 3:
+                continue
+            name, version, expected_hash = parts
+
+            if version.endswith("/go.mod"):
+                version = version.removesuffix("/go.mod")
+                version_dir = self._version_dir(name)
+                mod_file = version_dir / f"{_escape_module_path(version)}.mod"
+                actual_hash = _hash_go_mod(mod_file) if mod_file.exists() else None
+            else:
+                version_dir = self._version_dir(name)
+                ziphash_file = version_dir / f"{_escape_module_path(version)}.ziphash"
+                actual_hash = ziphash_file.read_text().strip() if ziphash_file.exists() else None
+
+            if actual_hash is not None and actual_hash != expected_hash:
+                log.warning(
+                    "Go module cache: %s@%s does not match go.sum, evicting it", name, version
+                )
+                self._evict_version(name, version)
+
+    def store(self, download_dir: Path) -> None:
+        """Add the modules from a module download cache (GOMODCACHE/cache/download) to the cache.
+
+        Modules that are already cached are marked as recently used.
+        """
+        for dirpath, dirnames, filenames in os.walk(download_dir):
+            if Path(dirpath) == download_dir:
+                dirnames[:] = [name for name in dirnames if name not in self._IGNORED_DIRS]
+
+            for filename in filenames:
+                if self._IGNORED_FILE_PATTERN.search(filename):
+                    continue
+
+                file_path = Path(dirpath, filename)
+                cached_path = self.root / file_path.relative_to(download_dir)
+                if cached_path.exists():
+                    os.utime(cached_path)
+                    continue
+
+                cached_path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix=f".{filename}.", dir=cached_path.parent)
+                os.close(fd)
+                materialize_file(file_path, Path(tmp_path))
+                os.replace(tmp_path, cached_path)
+                os.utime(cached_path)
+
+    def evict(self) -> None:
+        """Remove the least recently used files until the cache fits in the maximum size."""
+        files = []
+        total_size = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                file_path = Path(dirpath, filename)
+                stat = file_path.stat()
+                files.append((stat.st_mtime, stat.st_size, file_path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return
+
+        log.info(
+            "Go module cache size %d MiB exceeds the limit of %d MiB, evicting old files",
+            total_size // 2**20,
+            self.max_size // 2**20,
+        )
+        for _, size, file_path in sorted(files):
+            file_path.unlink(missing_ok=True)
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+    def _version_dir(self, module_name: str) -> Path:
+        return self.root / _escape_module_path(module_name) / "@v"
+
+    def _evict_version(self, module_name: str, module_version: str) -> None:
+        escaped_version = _escape_module_path(module_version)
+        for suffix in (".info", ".mod", ".zip", ".ziphash"):
+            self._version_dir(module_name).joinpath(escaped_version + suffix).unlink(
+                missing_ok=True
+            )
+
+
+def _get_module_cache() -> Optional[GoModuleCache]:
+    """Get the persistent Go module cache, or None if the cache is disabled in the config."""
+    config = get_config()
+    if not config.use_gomod_cache:
+        return None
+    return GoModuleCache(get_cache_dir() / "gomod", config.gomod_cache_max_size_mb * 2**20)
+
+
+def _escape_module_path(path: str) -> str:
+    """Escape a module path or version the way the go command does in the module cache.
+
+    https://pkg.go.dev/golang.org/x/mod/module#EscapePath
+    """
+    return re.sub(r"[A-Z]", lambda match: "!" + match.group().lower(), path)
+
+
+def _hash1(files: Iterable[tuple[str, Callable[[], IO[bytes]]]]) -> str:
+    """Compute the go.sum hash of a set of files, given their names and a way to open them.
+
+    https://pkg.go.dev/golang.org/x/mod/sumdb/dirhash#Hash1
+    """
+    summary = hashlib.sha256()
+    for name, open_file in sorted(files, key=lambda file: file[0]):
+        file_hash = hashlib.sha256()
+        with open_file() as f:
+            while chunk := f.read(1024 * 1024):
+                file_hash.update(chunk)
+        summary.update(f"{file_hash.hexdigest()}  {name}\n".encode())
+    return "h1:" + base64.b64encode(summary.digest()).decode()
+
+
+def _hash_go_mod(go_mod: Path) -> str:
+    """Compute the go.sum hash of a go.mod file."""
+    return _hash1([("go.mod", lambda: go_mod.open("rb"))])
+
+
+def _hash_zip(module_zip: Path) -> str:
+    """Compute the go.sum hash of a module .zip file."""
+    with zipfile.ZipFile(module_zip) as z:
+        return _hash1((info.filename, partial(z.open, info)) for info in z.infolist())
+
+
 def _should_vendor_deps(
     flags: Iterable[str], app_dir: RootedPath, strict: bool
 ) -> Tuple[bool, bool]:
@@ -958,6 +1408,14 @@ def _should_vendor_deps(
     return False, False
 
 
+class _SemverTag(NamedTuple):
+    """A semantic version tag of a Go module."""
+
+    name: str
+    semver: semver.version.Version
+    on_commit: bool
+
+
 class ModuleVersionResolver:
     """Resolves the versions of Go modules in a git repository."""
 
@@ -968,9 +1426,18 @@ class ModuleVersionResolver:
 
     @classmethod
     def from_repo_path(cls, repo_path: RootedPath) -> "Self":
-        """Fetch tags from a git Repo and return a ModuleVersionResolver."""
+        """Fetch tags from a git Repo and return a ModuleVersionResolver.
+
+        If the gomod_skip_tag_fetch option is enabled and the repository already has some tags,
+        the tags are not fetched from the remote.
+        """
         repo = git.Repo(repo_path)
         commit = repo.commit(repo.rev_parse("HEAD").hexsha)
+
+        if get_config().gomod_skip_tag_fetch and repo.git.for_each_ref("--count=1", "refs/tags"):
+            log.debug("Using the local tags of %s, not fetching tags", repo.working_tree_dir)
+            return cls(repo, commit)
+
         try:
             repo.remote().fetch(force=True, tags=True)
         except Exception as ex:
@@ -984,54 +1451,81 @@ class ModuleVersionResolver:
     @cached_property
     def _commit_tags(self) -> list[str]:
         """Return the git tags pointing to the current commit."""
-        return self._get_commit_tags()
+        return [name for name, commit in self._reachable_tags if commit == self._commit.hexsha]
 
     @cached_property
     def _all_tags(self) -> list[str]:
         """Return all of the git tags pointing to the current and preceding commits."""
-        return self._get_commit_tags(all_reachable=True)
+        return [name for name, _ in self._reachable_tags]
 
-    def _get_commit_tags(self, all_reachable: bool = False) -> list[str]:
+    @cached_property
+    def _reachable_tags(self) -> list[tuple[str, str]]:
         """
-        Return all of the tags associated with the current commit.
+        Return the tags on the current commit and all commits preceding it.
+
+        Both the tags and the commits they point to are listed by a single git command. Annotated
+        tags are peeled to the commits they point to.
 
-        :param all_reachable: True to get all tags on the current commit and all commits preceding
-                              it. False to get the tags on the current commit only.
-        :return: a list of tag names
+        :return: a list of (tag name, commit hexsha) pairs
         :raises GitCommandError: if failed to fetch the tags on the Git repository
         """
         try:
-            if all_reachable:
-                # Get all the tags on the input commit and all that precede it.
-                # This is based on:
-                # https://github.com/golang/go/blob/0ac8739ad5394c3fe0420cf53232954fefb2418f/src/cmd/go/internal/modfetch/codehost/git.go#L659-L695
-                cmd = [
-                    "git",
-                    "for-each-ref",
-                    "--format",
-                    "%(refname:lstrip=2)",
-                    "refs/tags",
-                    "--merged",
-                    self._commit.hexsha,
-                ]
-            else:
-                # Get the tags that point to this commit
-                cmd = ["git", "tag", "--points-at", self._commit.hexsha]
-
-            tag_names = self._repo.git.execute(
+            # This is based on:
+            # https://github.com/golang/go/blob/0ac8739ad5394c3fe0420cf53232954fefb2418f/src/cmd/go/internal/modfetch/codehost/git.go#L659-L695
+            cmd = [
+                "git",
+                "for-each-ref",
+                "--format",
+                "%(refname:lstrip=2) %(objectname) %(*objectname)",
+                "refs/tags",
+                "--merged",
+                self._commit.hexsha,
+            ]
+            output = self._repo.git.execute(
                 cmd,
                 # these args are the defaults, but are required to let mypy know which override to match
                 # (the one that returns a string)
                 with_extended_output=False,
                 as_process=False,
                 stdout_as_string=True,
-            ).splitlines()
+            )
         except git.GitCommandError:
             msg = f"Failed to get the tags associated with the reference {self._commit.hexsha}"
             log.error(msg)
             raise
 
-        return tag_names
+        tags = []
+        for line in output.splitlines():
+            # the peeled object is empty for lightweight tags
+            tag_name, object_name, peeled_object_name = line.split(" ")
+            tags.append((tag_name, peeled_object_name or object_name))
+
+        return tags
+
+    @cached_property
+    def _semver_tags(self) -> dict[Optional[str], list["_SemverTag"]]:
+        """Index the semantic version tags on the current and preceding commits by module subpath.
+
+        Each tag gets parsed only once, no matter how many modules are resolved.
+        """
+        commit_tags = set(self._commit_tags)
+        index: dict[Optional[str], list[_SemverTag]] = {}
+
+        for tag_name in self._all_tags:
+            subpath, _, tag_version = tag_name.rpartition("/")
+            if not tag_version.startswith("v"):
+                continue
+
+            try:
+                semantic_version = self._get_semantic_version_from_tag(tag_name, subpath)
+            except ValueError:
+                log.debug("%s is not a semantic version tag", tag_name)
+                continue
+
+            tag = _SemverTag(tag_name, semantic_version, tag_name in commit_tags)
+            index.setdefault(subpath or None, []).append(tag)
+
+        return index
 
     def get_golang_version(
         self,
@@ -1147,32 +1641,20 @@ class ModuleVersionResolver:
         :param subpath: path to the module, relative to the root repository folder
         :return: the highest semantic version tag if one is found
         """
-        tag_names = self._all_tags if all_reachable else self._commit_tags
-
-        # Keep only semantic version tags related to the path being processed
-        prefix = f"{subpath}/v" if subpath else "v"
-        filtered_tags = [tag_name for tag_name in tag_names if tag_name.startswith(prefix)]
-
-        not_semver_tag_msg = "%s is not a semantic version tag"
-        highest: Optional[dict[str, Any]] = None
-
-        for tag_name in filtered_tags:
-            try:
-                semantic_version = self._get_semantic_version_from_tag(tag_name, subpath)
-            except ValueError:
-                log.debug(not_semver_tag_msg, tag_name)
-                continue
-
-            # If the major version of the semantic version tag doesn't match the Go module's major
-            # version, then ignore it
-            if semantic_version.major != major_version:
-                continue
-
-            if highest is None or semantic_version > highest["semver"]:
-                highest = {"tag": tag_name, "semver": semantic_version}
+        highest = max(
+            (
+                tag
+                for tag in self._semver_tags.get(subpath, [])
+                # If the major version of the semantic version tag doesn't match the Go module's
+                # major version, then ignore it
+                if tag.semver.major == major_version and (all_reachable or tag.on_commit)
+            ),
+            key=lambda tag: tag.semver,
+            default=None,
+        )
 
         if highest:
-            return self._repo.tags[highest["tag"]]
+            return git.Tag(self._repo, f"refs/tags/{highest.name}")
 
         return None
 
@@ -1360,6 +1842,9 @@ def _vendor_deps(
     return _parse_vendor(app_dir)
 
 
+_git_index_lock = threading.Lock()
+
+
 def _vendor_changed(app_dir: RootedPath) -> bool:
     """Check for changes in the vendor directory."""
     repo_root = app_dir.root
@@ -1367,22 +1852,25 @@ def _vendor_changed(app_dir: RootedPath) -> bool:
     modules_txt = vendor / "modules.txt"
 
     repo = git.Repo(repo_root)
-    # Add untracked files but do not stage them
-    repo.git.add("--intent-to-add", "--force", "--", app_dir)
-
-    try:
-        # Diffing modules.txt should catch most issues and produce relatively useful output
-        modules_txt_diff = repo.git.diff("--", str(modules_txt))
-        if modules_txt_diff:
-            log.error("%s changed after vendoring:\n%s", modules_txt, modules_txt_diff)
-            return True
-
-        # Show only if files were added/deleted/modified, not the full diff
-        vendor_diff = repo.git.diff("--name-status", "--", str(vendor))
-        if vendor_diff:
-            log.error("%s directory changed after vendoring:\n%s", vendor, vendor_diff)
-            return True
-    finally:
-        repo.git.reset("--", app_dir)
+
+    # Modules may be processed in parallel, but they all share the same git index
+    with _git_index_lock:
+        # Add untracked files but do not stage them
+        repo.git.add("--intent-to-add", "--force", "--", app_dir)
+
+        try:
+            # Diffing modules.txt should catch most issues and produce relatively useful output
+            modules_txt_diff = repo.git.diff("--", str(modules_txt))
+            if modules_txt_diff:
+                log.error("%s changed after vendoring:\n%s", modules_txt, modules_txt_diff)
+                return True
+
+            # Show only if files were added/deleted/modified, not the full diff
+            vendor_diff = repo.git.diff("--name-status", "--", str(vendor))
+            if vendor_diff:
+                log.error("%s directory changed after vendoring:\n%s", vendor, vendor_diff)
+                return True
+        finally:
+            repo.git.reset("--", app_dir)
 
     return False
@@ -11,7 +11,7 @@ from urllib.parse import urlparse
 
 from packageurl import PackageURL
 
-from cachi2.core.checksum import ChecksumInfo, must_match_any_checksum
+from cachi2.core.checksum import ChecksumInfo
 from cachi2.core.config import get_config
 from cachi2.core.errors import PackageRejected, UnexpectedFormat, UnsupportedFeature
 from cachi2.core.models.input import Request
@@ -19,8 +19,9 @@ from cachi2.core.models.output import ProjectFile, RequestOutput
 from cachi2.core.models.property_semantics import PropertySet
 from cachi2.core.models.sbom import Component
 from cachi2.core.package_managers.general import async_download_files
+from cachi2.core.plan import PlannedArtifact
 from cachi2.core.rooted_path import RootedPath
-from cachi2.core.scm import RepoID, clone_as_tarball, get_repo_id
+from cachi2.core.scm import RepoID, clone_as_tarballs_concurrently, get_repo_id
 
 DEPENDENCY_TYPES = (
     "dependencies",
@@ -456,16 +457,18 @@ def _extract_git_info_npm(vcs_url: NormalizedUrl) -> Dict[str, str]:
     return vcs_url_info
 
 
-def _clone_repo_pack_archive(
+def _prepare_repo_pack_archive(
     vcs: NormalizedUrl,
     download_dir: RootedPath,
-) -> RootedPath:
+) -> tuple[RootedPath, str, str]:
     """
-    Clone a repository and pack its content as tar.
+    Prepare cloning a repository and packing its content as tar.
+
+    The repository itself gets cloned later, together with the other git dependencies.
 
     :param url: URL for file download
     :param download_dir: Output folder where dependencies will be downloaded
-    :raise FetchError: If download failed
+    :return: the path to the archive, the URL of the repository and the ref to check out
     """
     info = _extract_git_info_npm(vcs)
     download_path = download_dir.join_within_root(
@@ -478,9 +481,8 @@ def _clone_repo_pack_archive(
     # Create missing directories
     directory = os.path.dirname(download_path)
     os.makedirs(directory, exist_ok=True)
-    clone_as_tarball(info["url"], info["ref"], download_path.path)
 
-    return download_path
+    return download_path, info["url"], info["ref"]
 
 
 def _get_npm_dependencies(
@@ -497,6 +499,7 @@ def _get_npm_dependencies(
     :return: Dictionary of Resolved URL dependencies with downloaded paths
     """
     files_to_download: dict[str, dict[str, Any]] = {}
+    repos_to_clone: dict[Path, tuple[str, str]] = {}
     download_paths = {}
     for url, info in deps_to_download.items():
         url = _normalize_resolved_url(url)
@@ -505,7 +508,9 @@ def _get_npm_dependencies(
         if dep_type == "file":
             continue
         elif dep_type == "git":
-            download_paths[url] = _clone_repo_pack_archive(url, download_dir)
+            download_path, repo_url, ref = _prepare_repo_pack_archive(url, download_dir)
+            download_paths[url] = download_path
+            repos_to_clone[download_path.path] = (repo_url, ref)
         else:
             if dep_type == "registry":
                 archive_name = f'{info["name"]}-{info["version"]}.tgz'.removeprefix("@").replace(
@@ -537,21 +542,23 @@ def _get_npm_dependencies(
                 "integrity": info["integrity"],
             }
 
-    # Asynchronously download tar files
+    checksums: dict[str, list[ChecksumInfo]] = {}
+    for url, item in files_to_download.items():
+        if item["integrity"]:
+            checksums[url] = [ChecksumInfo.from_sri(str(item["integrity"]))]
+        else:
+            log.warning("Missing integrity for %s, integrity check skipped.", url)
+
+    clone_as_tarballs_concurrently(repos_to_clone, get_config().concurrency_limit)
+
+    # Asynchronously download tar files, check integrity of downloaded packages on the fly
     asyncio.run(
         async_download_files(
             {url: item["download_path"] for (url, item) in files_to_download.items()},
             get_config().concurrency_limit,
+            checksums,
         )
     )
-    # Check integrity of downloaded packages
-    for url, item in files_to_download.items():
-        if item["integrity"]:
-            must_match_any_checksum(
-                item["download_path"], [ChecksumInfo.from_sri(str(item["integrity"]))]
-            )
-        else:
-            log.warning("Missing integrity for %s, integrity check skipped.", url)
 
     return download_paths
 
@@ -691,6 +698,62 @@ def fetch_npm_source(request: Request) -> RequestOutput:
     )
 
 
+def plan_npm_source(request: Request) -> list[PlannedArtifact]:
+    """List the files that fetch_npm_source would download, see cachi2.core.plan."""
+    artifacts = []
+    for package in request.npm_packages:
+        package_lock_path = _find_package_lock(request.source_dir.join_within_root(package.path))
+        package_lock = PackageLock.from_file(package_lock_path)
+
+        for url, info in package_lock.get_dependencies_to_download().items():
+            url = _normalize_resolved_url(url)
+            dep_type = _classify_resolved_url(url)
+
+            if dep_type == "file":
+                continue
+            elif dep_type == "git":
+                git_info = _extract_git_info_npm(url)
+                artifact = PlannedArtifact(
+                    package_manager="npm",
+                    name=str(info["name"]),
+                    version=info["version"],
+                    kind="git",
+                    url=git_info["url"],
+                    ref=git_info["ref"],
+                )
+            else:
+                artifact = PlannedArtifact(
+                    package_manager="npm",
+                    name=str(info["name"]),
+                    version=info["version"],
+                    kind="download",
+                    url=url,
+                )
+            artifacts.append(artifact)
+
+    return artifacts
+
+
+def _find_package_lock(pkg_path: RootedPath) -> RootedPath:
+    """Get the path to the npm-shrinkwrap.json or package-lock.json file of the package.
+
+    :raises PackageRejected: if neither of the files is present
+    """
+    # npm-shrinkwrap.json and package-lock.json share the same format but serve slightly
+    # different purposes. See the following documentation for more information:
+    # https://docs.npmjs.com/files/package-lock.json.
+    for lock_file in ("npm-shrinkwrap.json", "package-lock.json"):
+        package_lock_path = pkg_path.join_within_root(lock_file)
+        if package_lock_path.path.exists():
+            return package_lock_path
+
+    raise PackageRejected(
+        "The npm-shrinkwrap.json or package-lock.json file must be present for the npm "
+        "package manager",
+        solution="Please double-check that you have specified the correct path to the package directory containing one of those two files",
+    )
+
+
 def _resolve_npm(pkg_path: RootedPath, npm_deps_dir: RootedPath) -> ResolvedNpmPackage:
     """Resolve and fetch npm dependencies for the given package.
 
@@ -701,19 +764,7 @@ def _resolve_npm(pkg_path: RootedPath, npm_deps_dir: RootedPath) -> ResolvedNpmP
         ``package_lock_file`` which is the (updated) package-lock.json as a ProjectFile
     :raises PackageRejected: if the npm package is not cachi2 compatible
     """
-    # npm-shrinkwrap.json and package-lock.json share the same format but serve slightly
-    # different purposes. See the following documentation for more information:
-    # https://docs.npmjs.com/files/package-lock.json.
-    for lock_file in ("npm-shrinkwrap.json", "package-lock.json"):
-        package_lock_path = pkg_path.join_within_root(lock_file)
-        if package_lock_path.path.exists():
-            break
-    else:
-        raise PackageRejected(
-            "The npm-shrinkwrap.json or package-lock.json file must be present for the npm "
-            "package manager",
-            solution="Please double-check that you have specified the correct path to the package directory containing one of those two files",
-        )
+    package_lock_path = _find_package_lock(pkg_path)
 
     node_modules_path = pkg_path.join_within_root("node_modules")
     if node_modules_path.path.exists():
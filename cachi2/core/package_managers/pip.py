@@ -11,6 +11,7 @@ import tarfile
 import urllib
 import zipfile
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from os import PathLike
 from pathlib import Path
@@ -20,7 +21,7 @@ import tomli
 from packageurl import PackageURL
 
 from cachi2.core.rooted_path import RootedPath
-from cachi2.core.scm import clone_as_tarball, get_repo_id
+from cachi2.core.scm import clone_as_tarballs_concurrently, get_repo_id
 
 if TYPE_CHECKING:
     from typing_extensions import TypeGuard
@@ -30,17 +31,22 @@ import pypi_simple
 import requests
 from packaging.utils import canonicalize_name, canonicalize_version
 
-from cachi2.core.checksum import ChecksumInfo, must_match_any_checksum
+from cachi2.core.batch import get_batch_cache
+from cachi2.core.checksum import ChecksumInfo, must_match_any_checksum_concurrently
 from cachi2.core.config import get_config
-from cachi2.core.errors import FetchError, PackageRejected, UnexpectedFormat, UnsupportedFeature
+from cachi2.core.errors import (
+    Cachi2Error,
+    FetchError,
+    PackageRejected,
+    UnexpectedFormat,
+    UnsupportedFeature,
+)
+from cachi2.core.http_requests import SAFE_REQUEST_METHODS, get_requests_session
 from cachi2.core.models.input import Request
 from cachi2.core.models.output import EnvironmentVariable, ProjectFile, RequestOutput
 from cachi2.core.models.sbom import Component, Property
-from cachi2.core.package_managers.general import (
-    async_download_files,
-    download_binary_file,
-    extract_git_info,
-)
+from cachi2.core.package_managers.general import async_download_files, extract_git_info
+from cachi2.core.plan import PlannedArtifact
 
 log = logging.getLogger(__name__)
 
@@ -119,6 +125,68 @@ def fetch_pip_source(request: Request) -> RequestOutput:
     )
 
 
+def plan_pip_source(request: Request) -> list[PlannedArtifact]:
+    """List the files that fetch_pip_source would download, see cachi2.core.plan."""
+    pip_deps_dir = request.output_dir.join_within_root("deps", "pip")
+    artifacts: list[PlannedArtifact] = []
+
+    for package in request.pip_packages:
+        path_within_root = request.source_dir.join_within_root(package.path)
+        req_files = _resolve_requirement_files(path_within_root, package.requirements_files)
+        build_req_files = _resolve_requirement_files(
+            path_within_root, package.requirements_build_files, devel=True
+        )
+        requirements = [
+            req
+            for requirements_file in _parse_requirement_files(req_files + build_req_files)
+            for req in requirements_file.requirements
+        ]
+        _validate_requirements(requirements)
+
+        project_pages = _prefetch_project_pages(
+            req.package for req in requirements if req.kind == "pypi"
+        )
+        for req in requirements:
+            if req.kind == "pypi":
+                source, wheels = _process_package_distributions(
+                    req,
+                    pip_deps_dir,
+                    package.allow_binary,
+                    project_page=project_pages[req.package].result(),
+                )
+                distributions = [source, *wheels] if source else wheels
+                artifacts.extend(
+                    PlannedArtifact(
+                        package_manager="pip",
+                        name=dpi.name,
+                        version=dpi.version,
+                        kind="download",
+                        url=dpi.url,
+                        size=dpi.size,
+                    )
+                    for dpi in distributions
+                )
+            elif req.kind == "vcs":
+                git_info = extract_git_info(req.url)
+                artifacts.append(
+                    PlannedArtifact(
+                        package_manager="pip",
+                        name=req.package,
+                        kind="git",
+                        url=git_info["url"],
+                        ref=git_info["ref"],
+                    )
+                )
+            else:
+                artifacts.append(
+                    PlannedArtifact(
+                        package_manager="pip", name=req.package, kind="download", url=req.url
+                    )
+                )
+
+    return artifacts
+
+
 def _generate_properties(dependency: dict) -> list[Property]:
     if not dependency["hash_verified"]:
         return [Property(name="cachi2:missing_hash:in_file", value=dependency["requirement_file"])]
@@ -1404,15 +1472,39 @@ def _download_dependencies(
     pip_deps_dir.path.mkdir(parents=True, exist_ok=True)
 
     downloaded = []
-    to_download: list[DistributionPackageInfo] = []
+    # sdists, url packages and wheels are downloaded in a single concurrent batch
+    to_download: dict[str, Union[str, PathLike[str]]] = {}
+    checksums: dict[str, Iterable[ChecksumInfo]] = {}
+    wheel_urls: set[str] = set()
+    insecure_urls: set[str] = set()
+    sdists: set[Path] = set()
+    download_lines: dict[str, str] = {}
+    # VCS packages are cloned separately, concurrently with each other
+    to_clone: dict[Path, tuple[str, str]] = {}
+    vcs_checksums: dict[Path, list[ChecksumInfo]] = {}
+    vcs_download_lines: dict[Path, str] = {}
+
+    project_pages = _prefetch_project_pages(
+        req.package for req in requirements_file.requirements if req.kind == "pypi"
+    )
 
     for req in requirements_file.requirements:
         log.info("Downloading %s", req.download_line)
+        download_url: Optional[str] = None
 
         if req.kind == "pypi":
-            source, wheels = _process_package_distributions(req, pip_deps_dir, allow_binary)
+            source, wheels = _process_package_distributions(
+                req, pip_deps_dir, allow_binary, project_page=project_pages[req.package].result()
+            )
             if allow_binary:
-                to_download.extend(w for w in wheels if not w.path.exists())
+                for wheel in wheels:
+                    if wheel.path.exists():
+                        continue
+                    to_download[wheel.url] = wheel.path
+                    wheel_urls.add(wheel.url)
+                    # the checksums are verified while the wheels are being downloaded
+                    if wheel.should_verify_checksums():
+                        checksums[wheel.url] = wheel.checksums_to_verify
 
             if source is None:
                 # at least one wheel exists -> report in the SBOM
@@ -1427,47 +1519,87 @@ def _download_dependencies(
                 )
                 continue
 
-            download_binary_file(source.url, source.path, auth=None)
-            _check_metadata_in_sdist(source.path)
+            download_url = source.url
             download_info = source.download_info
+            sdists.add(source.path)
 
         elif req.kind == "vcs":
-            download_info = _download_vcs_package(req, pip_deps_dir)
+            download_info = _prepare_vcs_package(req, pip_deps_dir)
+            to_clone[download_info["path"]] = (download_info["url"], download_info["ref"])
+            vcs_download_lines[download_info["path"]] = req.download_line
         elif req.kind == "url":
-            download_info = _download_url_package(req, pip_deps_dir, trusted_hosts)
+            download_url = req.url
+            download_info = _prepare_url_package(req, pip_deps_dir)
+            if _is_trusted_host(req.url, trusted_hosts):
+                insecure_urls.add(req.url)
         else:
             # Should not happen
             raise RuntimeError(f"Unexpected requirement kind: {req.kind!r}")
 
-        log.info(
-            "Successfully downloaded %s to %s",
-            req.download_line,
-            download_info["path"].relative_to(output_dir),
-        )
-
         if require_hashes or req.kind == "url":
             hashes = req.hashes or [req.qualifiers["cachito_hash"]]
-            must_match_any_checksum(download_info["path"], list(map(_to_checksum_info, hashes)))
+            expected_checksums = list(map(_to_checksum_info, hashes))
+            if download_url is None:
+                # verified after being cloned
+                vcs_checksums[download_info["path"]] = expected_checksums
+            else:
+                # verified while being downloaded
+                checksums[download_url] = expected_checksums
             download_info["hash_verified"] = True
         else:
             download_info["hash_verified"] = False
 
+        if download_url is not None:
+            to_download[download_url] = download_info["path"]
+            download_lines[download_url] = req.download_line
+
         download_info["kind"] = req.kind
         download_info["requirement_file"] = str(requirements_file.file_path.subpath_from_root)
         downloaded.append(download_info)
 
-    if allow_binary:
-        log.info("Downloading %d wheel(s) ...", len(to_download))
-        files: dict[str, Union[str, PathLike[str]]] = {pkg.url: pkg.path for pkg in to_download}
-        asyncio.run(async_download_files(files, get_config().concurrency_limit))
+    def on_download(url: str, download_path: Path) -> None:
+        if download_path in sdists:
+            _check_metadata_in_sdist(download_path)
+        if url in download_lines:
+            log.info(
+                "Successfully downloaded %s to %s",
+                download_lines[url],
+                download_path.relative_to(output_dir),
+            )
 
-        for pkg in to_download:
-            try:
-                if pkg.should_verify_checksums():
-                    must_match_any_checksum(pkg.path, pkg.checksums_to_verify)
-            except PackageRejected:
-                pkg.path.unlink()
-                log.warning("The %s is removed from the output directory", pkg.path.name)
+    def on_failure(url: str, error: Cachi2Error) -> None:
+        if url in wheel_urls and isinstance(error, PackageRejected):
+            # the downloader already removed the wheel, the other files are still needed
+            log.warning("The %s is removed from the output directory", Path(to_download[url]).name)
+            return
+        raise error
+
+    if to_clone:
+        log.info("Cloning %d Git repositories ...", len(to_clone))
+        clone_as_tarballs_concurrently(to_clone, get_config().concurrency_limit)
+        must_match_any_checksum_concurrently(
+            {path: vcs_checksums[path] for path in to_clone if path in vcs_checksums},
+            get_config().concurrency_limit,
+        )
+        for path in to_clone:
+            log.info(
+                "Successfully downloaded %s to %s",
+                vcs_download_lines[path],
+                path.relative_to(output_dir),
+            )
+
+    if to_download:
+        log.info("Downloading %d file(s) ...", len(to_download))
+        asyncio.run(
+            async_download_files(
+                to_download,
+                get_config().concurrency_limit,
+                checksums,
+                insecure_urls=insecure_urls,
+                on_download=on_download,
+                on_failure=on_failure,
+            )
+        )
 
     return downloaded
 
@@ -1667,6 +1799,8 @@ class DistributionPackageInfo:
 
     pypi_checksums: set[ChecksumInfo] = field(default_factory=set)
     user_checksums: set[ChecksumInfo] = field(default_factory=set)
+    # the size of the file reported by PyPI, if any
+    size: Optional[int] = None
 
     checksums_to_verify: set[ChecksumInfo] = field(init=False, default_factory=set)
 
@@ -1722,20 +1856,79 @@ class DistributionPackageInfo:
         }
 
 
+def _get_pypi_client() -> pypi_simple.PyPISimple:
+    """Get the PyPI client shared by all queries, it keeps the connections to PyPI alive.
+
+    Each request queries PyPI from up to concurrency_limit threads (see _prefetch_project_pages),
+    in a batch up to batch_concurrency_limit requests do that at the same time. The connection
+    pool is large enough for all of them.
+    """
+    config = get_config()
+    return _create_pypi_client(config.concurrency_limit * config.batch_concurrency_limit)
+
+
+@functools.cache
+def _create_pypi_client(pool_maxsize: int) -> pypi_simple.PyPISimple:
+    session = get_requests_session(
+        retry_options={"allowed_methods": SAFE_REQUEST_METHODS}, pool_maxsize=pool_maxsize
+    )
+    return pypi_simple.PyPISimple(session=session)
+
+
+def _get_project_page(name: str) -> pypi_simple.ProjectPage:
+    """Get the PyPI project page for the specified package.
+
+    In a batch, the pages are fetched only once for all the requests, see cachi2.core.batch.
+
+    :raises FetchError: if the query fails or the project does not exist
+    """
+    shared_pages = get_batch_cache("pypi-project-pages")
+    if shared_pages is not None and (project_page := shared_pages.get(name)):
+        return project_page
+
+    try:
+        timeout = get_config().requests_timeout
+        project_page = _get_pypi_client().get_project_page(name, timeout)
+    except (requests.RequestException, pypi_simple.NoSuchProjectError) as e:
+        raise FetchError(f"PyPI query failed: {e}")
+
+    if shared_pages is not None:
+        shared_pages[name] = project_page
+    return project_page
+
+
+def _prefetch_project_pages(names: Iterable[str]) -> dict[str, Future[pypi_simple.ProjectPage]]:
+    """Start fetching the PyPI project pages for all the specified packages concurrently.
+
+    The pages are fetched in the background, the number of concurrent queries is limited by the
+    concurrency_limit config option. If fetching a page fails, the exception gets raised when
+    getting the result of the respective future.
+
+    :param names: names of the packages
+    :return: a future project page for each of the packages
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=get_config().concurrency_limit, thread_name_prefix="cachi2-pypi"
+    )
+    project_pages = {name: executor.submit(_get_project_page, name) for name in set(names)}
+    # does not cancel the submitted queries, only lets the worker threads exit once they are done
+    executor.shutdown(wait=False)
+    return project_pages
+
+
 def _process_package_distributions(
-    requirement: PipRequirement, pip_deps_dir: RootedPath, allow_binary: bool = False
+    requirement: PipRequirement,
+    pip_deps_dir: RootedPath,
+    allow_binary: bool = False,
+    project_page: Optional[pypi_simple.ProjectPage] = None,
 ) -> tuple[Optional[DistributionPackageInfo], list[DistributionPackageInfo]]:
     name = requirement.package
     version = requirement.version_specs[0][1]
     normalized_version = canonicalize_version(version)
 
-    client = pypi_simple.PyPISimple()
-    try:
-        timeout = get_config().requests_timeout
-        project_page = client.get_project_page(name, timeout)
-        packages = project_page.packages
-    except (requests.RequestException, pypi_simple.NoSuchProjectError) as e:
-        raise FetchError(f"PyPI query failed: {e}")
+    if project_page is None:
+        project_page = _get_project_page(name)
+    packages = project_page.packages
 
     allowed_distros = ["sdist", "wheel"] if allow_binary else ["sdist"]
     filtered_packages = filter(
@@ -1765,6 +1958,7 @@ def _process_package_distributions(
             package.is_yanked,
             pypi_checksums,
             user_checksums,
+            package.size,
         )
 
         if dpi.package_type == "sdist":
@@ -1835,9 +2029,11 @@ def _sdist_preference(sdist_pkg: DistributionPackageInfo) -> tuple[int, int]:
     return yanked_pref, filetype_pref
 
 
-def _download_vcs_package(requirement: PipRequirement, pip_deps_dir: RootedPath) -> dict[str, Any]:
+def _prepare_vcs_package(requirement: PipRequirement, pip_deps_dir: RootedPath) -> dict[str, Any]:
     """
-    Fetch the source for a Python package from VCS (only git is supported).
+    Prepare fetching the source for a Python package from VCS (only git is supported).
+
+    The repository itself gets cloned later, together with the other VCS packages.
 
     :param PipRequirement requirement: VCS requirement from a requirements.txt file
     :param RootedPath pip_deps_dir: The deps/pip directory in a Cachi2 request bundle
@@ -1849,8 +2045,6 @@ def _download_vcs_package(requirement: PipRequirement, pip_deps_dir: RootedPath)
     download_to = pip_deps_dir.join_within_root(_get_external_requirement_filepath(requirement))
     download_to.path.parent.mkdir(exist_ok=True, parents=True)
 
-    clone_as_tarball(git_info["url"], git_info["ref"], to_path=download_to.path)
-
     return {
         "package": requirement.package,
         "path": download_to.path,
@@ -1858,15 +2052,14 @@ def _download_vcs_package(requirement: PipRequirement, pip_deps_dir: RootedPath)
     }
 
 
-def _download_url_package(
-    requirement: PipRequirement, pip_deps_dir: RootedPath, trusted_hosts: set[str]
-) -> dict[str, Any]:
+def _prepare_url_package(requirement: PipRequirement, pip_deps_dir: RootedPath) -> dict[str, Any]:
     """
-    Download a Python package from a URL.
+    Prepare the download of a Python package from a URL.
 
-    :param PipRequirement requirement: VCS requirement from a requirements.txt file
+    The package itself gets downloaded later, together with the other packages.
+
+    :param PipRequirement requirement: URL requirement from a requirements.txt file
     :param RootedPath pip_deps_dir: The deps/pip directory in a Cachi2 request bundle
-    :param set[str] trusted_hosts: If host (or host:port) is trusted, do not verify SSL
 
     :return: Dict with package name, download path, original URL and URL with hash
     """
@@ -1875,17 +2068,6 @@ def _download_url_package(
     download_to = pip_deps_dir.join_within_root(_get_external_requirement_filepath(requirement))
     download_to.path.parent.mkdir(exist_ok=True, parents=True)
 
-    if url.hostname in trusted_hosts:
-        log.debug("Disabling SSL verification, %s is a --trusted-host", url.hostname)
-        insecure = True
-    elif url.port is not None and f"{url.hostname}:{url.port}" in trusted_hosts:
-        log.debug("Disabling SSL verification, %s:%s is a --trusted-host", url.hostname, url.port)
-        insecure = True
-    else:
-        insecure = False
-
-    download_binary_file(requirement.url, download_to.path, insecure=insecure)
-
     if "cachito_hash" in requirement.qualifiers:
         url_with_hash = requirement.url
     else:
@@ -1901,6 +2083,31 @@ def _download_url_package(
     }
 
 
+def _is_trusted_host(url: str, trusted_hosts: set[str]) -> bool:
+    """
+    Check if SSL verification should be disabled for the URL.
+
+    :param str url: The URL of a package
+    :param set[str] trusted_hosts: If host (or host:port) is trusted, do not verify SSL
+    """
+    parsed_url = urllib.parse.urlparse(url)
+
+    if parsed_url.hostname in trusted_hosts:
+        log.debug("Disabling SSL verification, %s is a --trusted-host", parsed_url.hostname)
+        return True
+    elif (
+        parsed_url.port is not None and f"{parsed_url.hostname}:{parsed_url.port}" in trusted_hosts
+    ):
+        log.debug(
+            "Disabling SSL verification, %s:%s is a --trusted-host",
+            parsed_url.hostname,
+            parsed_url.port,
+        )
+        return True
+    else:
+        return False
+
+
 def _add_cachito_hash_to_url(parsed_url: urllib.parse.ParseResult, hash_spec: str) -> str:
     """
     Add the #cachito_hash fragment to URL.
@@ -1956,17 +2163,25 @@ def _download_from_requirement_files(
     :raises PackageRejected: If requirement file does not exist
     """
     requirements = []
+    for requirements_file in _parse_requirement_files(files):
+        requirements.extend(_download_dependencies(output_dir, requirements_file, allow_binary))
+
+    return requirements
+
+
+def _parse_requirement_files(files: list[RootedPath]) -> list[PipRequirementsFile]:
+    """
+    Get the PipRequirementsFile for each of the requirement files.
+
+    :raises PackageRejected: If requirement file does not exist
+    """
     for req_file in files:
         if not req_file.path.exists():
             raise PackageRejected(
                 f"The requirements file does not exist: {req_file}",
                 solution="Please check that you have specified correct requirements file paths",
             )
-        requirements.extend(
-            _download_dependencies(output_dir, PipRequirementsFile(req_file), allow_binary)
-        )
-
-    return requirements
+    return [PipRequirementsFile(req_file) for req_file in files]
 
 
 def _default_requirement_file_list(path: RootedPath, devel: bool = False) -> list[RootedPath]:
@@ -1982,6 +2197,22 @@ def _default_requirement_file_list(path: RootedPath, devel: bool = False) -> lis
     return [req] if req.path.is_file() else []
 
 
+def _resolve_requirement_files(
+    app_path: RootedPath, requirement_files: Optional[list[Path]], devel: bool = False
+) -> list[RootedPath]:
+    """
+    Get the paths for the requirement files of a package, the default ones if not specified.
+
+    :param app_path: the full path to the application source code
+    :param requirement_files: the paths to the requirement files, relative to the app_path
+    :param devel: whether to return the build requirement files
+    :return: list of absolute paths to the Python requirement files, could be empty
+    """
+    if requirement_files is None:
+        return _default_requirement_file_list(app_path, devel)
+    return [app_path.join_within_root(r) for r in requirement_files]
+
+
 def _resolve_pip(
     app_path: RootedPath,
     output_dir: RootedPath,
@@ -2006,17 +2237,10 @@ def _resolve_pip(
     """
     pkg_name, pkg_version = _get_pip_metadata(app_path)
 
-    # This could be an empty list
-    if requirement_files is None:
-        resolved_req_files = _default_requirement_file_list(app_path)
-    else:
-        resolved_req_files = [app_path.join_within_root(r) for r in requirement_files]
-
-    # This could be an empty list
-    if build_requirement_files is None:
-        resolved_build_req_files = _default_requirement_file_list(app_path, devel=True)
-    else:
-        resolved_build_req_files = [app_path.join_within_root(r) for r in build_requirement_files]
+    resolved_req_files = _resolve_requirement_files(app_path, requirement_files)
+    resolved_build_req_files = _resolve_requirement_files(
+        app_path, build_requirement_files, devel=True
+    )
 
     requires = _download_from_requirement_files(output_dir, resolved_req_files, allow_binary)
     buildrequires = _download_from_requirement_files(
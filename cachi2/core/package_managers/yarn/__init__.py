@@ -1,3 +1,3 @@
-from cachi2.core.package_managers.yarn.main import fetch_yarn_source
+from cachi2.core.package_managers.yarn.main import fetch_yarn_source, plan_yarn_source
 
-__all__ = ["fetch_yarn_source"]
+__all__ = ["fetch_yarn_source", "plan_yarn_source"]
@@ -1,10 +1,12 @@
 import logging
 
 import semver
+import yaml
 
 from cachi2.core.errors import PackageManagerError, PackageRejected
 from cachi2.core.models.input import Request
 from cachi2.core.models.output import Component, EnvironmentVariable, RequestOutput
+from cachi2.core.package_managers.yarn.locators import HttpsLocator, NpmLocator, parse_locator
 from cachi2.core.package_managers.yarn.project import (
     Plugin,
     Project,
@@ -14,6 +16,7 @@ from cachi2.core.package_managers.yarn.project import (
 )
 from cachi2.core.package_managers.yarn.resolver import create_components, resolve_packages
 from cachi2.core.package_managers.yarn.utils import run_yarn_cmd
+from cachi2.core.plan import PlannedArtifact
 from cachi2.core.rooted_path import RootedPath
 
 log = logging.getLogger(__name__)
@@ -34,6 +37,64 @@ def fetch_yarn_source(request: Request) -> RequestOutput:
     )
 
 
+def plan_yarn_source(request: Request) -> list[PlannedArtifact]:
+    """List the packages that fetch_yarn_source would download, see cachi2.core.plan.
+
+    The packages are listed from the resolutions in the lockfile. Only the npm registry and https
+    dependencies get downloaded, the other ones (workspaces, patches, local files) are part of
+    the source directory.
+    """
+    artifacts = []
+    for package in request.yarn_packages:
+        project = Project.from_source_dir(request.source_dir.join_within_root(package.path))
+        _verify_repository(project)
+
+        lockfile = project.source_dir.join_within_root(project.yarn_rc.lockfilename)
+        try:
+            lockfile_data = yaml.safe_load(lockfile.path.read_text())
+        except yaml.YAMLError as e:
+            raise PackageRejected(
+                f"Can't parse the {lockfile.subpath_from_root} file. Parser error: {e}",
+                solution="Cachi2 only supports the lockfiles of Yarn v3 or newer",
+            )
+
+        for key, entry in lockfile_data.items():
+            if key == "__metadata":
+                continue
+
+            resolution = entry["resolution"]
+            locator = parse_locator(resolution)
+            if isinstance(locator, NpmLocator):
+                if locator.scope:
+                    name = f"@{locator.scope}/{locator.name}"
+                    registry = project.yarn_rc.registry_server_for_scope(locator.scope)
+                else:
+                    name = locator.name
+                    registry = project.yarn_rc.registry_server
+                url = f"{registry.rstrip('/')}/{name}/-/{locator.name}-{locator.version}.tgz"
+                artifacts.append(
+                    PlannedArtifact(
+                        package_manager="yarn",
+                        name=name,
+                        version=locator.version,
+                        kind="download",
+                        url=url,
+                    )
+                )
+            elif isinstance(locator, HttpsLocator):
+                artifacts.append(
+                    PlannedArtifact(
+                        package_manager="yarn",
+                        # [@scope/]name@https://...
+                        name=resolution[:1] + resolution[1:].partition("@")[0],
+                        kind="download",
+                        url=locator.url,
+                    )
+                )
+
+    return artifacts
+
+
 def _verify_yarnrc_paths(project: Project) -> None:
     paths_conf_opts = {
         project.yarn_rc.pnp_data_path: "pnpDataPath",
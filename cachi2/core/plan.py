@@ -0,0 +1,171 @@
+import importlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Literal, Optional, cast
+
+import pydantic
+import requests
+
+from cachi2.core.artifact_cache import get_artifact_cache
+from cachi2.core.config import get_config
+from cachi2.core.http_requests import SAFE_REQUEST_METHODS, get_requests_session
+from cachi2.core.models.input import PackageManagerType, Request
+from cachi2.core.scm import get_tarball_cache_key
+from cachi2.core.tracing import span
+
+log = logging.getLogger(__name__)
+
+
+class PlannedArtifact(pydantic.BaseModel):
+    """A file that a package manager would download, or a git repository it would clone."""
+
+    package_manager: PackageManagerType
+    name: str
+    version: Optional[str] = None
+    kind: Literal["download", "git"]
+    # None if the package manager leaves the download to its own tooling, e.g. GOPROXY=direct
+    url: Optional[str]
+    # the revision to check out, for git repositories
+    ref: Optional[str] = None
+    # in bytes, None if unknown
+    size: Optional[int] = None
+    # whether the artifact is expected to be found in one of the Cachi2 caches
+    cached: bool = False
+
+
+class PlanSummary(pydantic.BaseModel):
+    """The totals of a fetch plan."""
+
+    artifacts: int
+    estimated_cache_hits: int
+    # the total size of the artifacts with a known size
+    known_size: int
+    # the number of artifacts of unknown size
+    unknown_sizes: int
+    # the total size of the artifacts with a known size that are not cached
+    estimated_download_size: int
+
+
+class Plan(pydantic.BaseModel):
+    """What fetching the dependencies of a request would download."""
+
+    artifacts: list[PlannedArtifact]
+    summary: PlanSummary
+
+
+Planner = Callable[[Request], list[PlannedArtifact]]
+
+
+def _lazy_planner(module_name: str, planner_name: str) -> Planner:
+    """Get a planner that imports its package manager module only when it is called."""
+
+    def planner(request: Request) -> list[PlannedArtifact]:
+        module = importlib.import_module(f"cachi2.core.package_managers.{module_name}")
+        return getattr(module, planner_name)(request)
+
+    return planner
+
+
+_planners: dict[PackageManagerType, Planner] = {
+    "gomod": _lazy_planner("gomod", "plan_gomod_source"),
+    "npm": _lazy_planner("npm", "plan_npm_source"),
+    "pip": _lazy_planner("pip", "plan_pip_source"),
+    "yarn": _lazy_planner("yarn", "plan_yarn_source"),
+}
+
+# the package managers that download their files through the Cachi2 artifact cache
+_ARTIFACT_CACHE_USERS: frozenset[PackageManagerType] = frozenset(["npm", "pip"])
+
+
+def plan_request(request: Request) -> Plan:
+    """Estimate what fetching the dependencies of a request would download, without fetching them.
+
+    The package managers parse the lockfiles (or requirements files) to list the artifacts they
+    would download. The sizes come from the package metadata where available (e.g. PyPI),
+    otherwise from concurrent HEAD requests. The artifacts found in the artifact cache or the
+    Go module cache are counted as estimated cache hits.
+
+    Nothing is written to the output directory. Dependencies that are only discovered while
+    fetching (e.g. Go modules that are not in go.sum) are not included in the plan.
+    """
+    artifacts: dict[tuple[Optional[str], ...], PlannedArtifact] = {}
+    for pkg_type in sorted({package.type for package in request.packages}):
+        with span("plan", package_manager=pkg_type):
+            for artifact in _planners[pkg_type](request):
+                # e.g. the same module required by two gomod packages is only downloaded once
+                key = (pkg_type, artifact.name, artifact.version, artifact.url, artifact.ref)
+                artifacts.setdefault(key, artifact)
+
+    planned = list(artifacts.values())
+    _check_artifact_cache(planned)
+    _fill_in_sizes(planned)
+    return Plan(artifacts=planned, summary=_summarize(planned))
+
+
+def _check_artifact_cache(artifacts: list[PlannedArtifact]) -> None:
+    artifact_cache = get_artifact_cache()
+    if artifact_cache is None:
+        return
+
+    for artifact in artifacts:
+        if artifact.cached or artifact.url is None:
+            continue
+        if artifact.package_manager not in _ARTIFACT_CACHE_USERS:
+            continue
+
+        if artifact.kind == "git" and artifact.ref:
+            cache_key = get_tarball_cache_key(artifact.url, artifact.ref)
+        else:
+            cache_key = artifact.url
+
+        if blob := artifact_cache.lookup(cache_key):
+            artifact.cached = True
+            artifact.size = blob.stat().st_size
+
+
+def _fill_in_sizes(artifacts: list[PlannedArtifact]) -> None:
+    """Get the unknown sizes of the downloads from the Content-Length of HEAD requests."""
+    to_query = [
+        artifact
+        for artifact in artifacts
+        if artifact.size is None and artifact.kind == "download" and artifact.url
+    ]
+    if not to_query:
+        return
+
+    concurrency_limit = get_config().concurrency_limit
+    session = get_requests_session(
+        retry_options={"allowed_methods": SAFE_REQUEST_METHODS}, pool_maxsize=concurrency_limit
+    )
+    timeout = get_config().requests_timeout
+
+    def get_size(artifact: PlannedArtifact) -> Optional[int]:
+        url = cast(str, artifact.url)
+        try:
+            with span("head", url=url):
+                response = session.head(url, allow_redirects=True, timeout=timeout)
+                response.raise_for_status()
+        except requests.RequestException as e:
+            log.debug("Cannot get the size of %s: %s", url, e)
+            return None
+
+        content_length = response.headers.get("Content-Length")
+        return int(content_length) if content_length and content_length.isdigit() else None
+
+    log.info("Querying the sizes of %d file(s) ...", len(to_query))
+    with session, ThreadPoolExecutor(concurrency_limit, thread_name_prefix="cachi2-plan") as pool:
+        sizes = pool.map(get_size, to_query)
+        for artifact, size in zip(to_query, sizes):
+            artifact.size = size
+
+
+def _summarize(artifacts: list[PlannedArtifact]) -> PlanSummary:
+    return PlanSummary(
+        artifacts=len(artifacts),
+        estimated_cache_hits=sum(artifact.cached for artifact in artifacts),
+        known_size=sum(artifact.size or 0 for artifact in artifacts),
+        unknown_sizes=sum(artifact.size is None for artifact in artifacts),
+        estimated_download_size=sum(
+            artifact.size or 0 for artifact in artifacts if not artifact.cached
+        ),
+    )
@@ -1,22 +1,43 @@
-from collections.abc import Iterable
+import importlib
+import shutil
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Callable
+from typing import Callable, Optional
 
+from cachi2.core.config import get_config
 from cachi2.core.errors import UnsupportedFeature
+from cachi2.core.fetch_manifest import resolve_incrementally
 from cachi2.core.models.input import PackageManagerType, Request
 from cachi2.core.models.output import RequestOutput
-from cachi2.core.package_managers import gomod, npm, pip, yarn
 from cachi2.core.rooted_path import RootedPath
-from cachi2.core.utils import copy_directory
+from cachi2.core.tracing import span
+from cachi2.core.utils import copy_directory, run_cmd
 
 Handler = Callable[[Request], RequestOutput]
 
+
+def _lazy_handler(module_name: str, handler_name: str) -> Handler:
+    """Get a handler that imports its package manager module only when it is called.
+
+    The package managers (and their dependencies, e.g. aiohttp, GitPython, pypi_simple) take
+    a long time to import. Commands that do not fetch anything should not pay for that.
+    """
+
+    def handler(request: Request) -> RequestOutput:
+        module = importlib.import_module(f"cachi2.core.package_managers.{module_name}")
+        return getattr(module, handler_name)(request)
+
+    return handler
+
+
 _package_managers: dict[PackageManagerType, Handler] = {
-    "gomod": gomod.fetch_gomod_source,
-    "npm": npm.fetch_npm_source,
-    "pip": pip.fetch_pip_source,
-    "yarn": yarn.fetch_yarn_source,
+    "gomod": _lazy_handler("gomod", "fetch_gomod_source"),
+    "npm": _lazy_handler("npm", "fetch_npm_source"),
+    "pip": _lazy_handler("pip", "fetch_pip_source"),
+    "yarn": _lazy_handler("yarn", "fetch_yarn_source"),
 }
 
 # This is where we put package managers currently under development in order to
@@ -31,11 +52,32 @@ def resolve_packages(request: Request) -> RequestOutput:
     """
     Resolve all packages specified in a request.
 
+    If the incremental_fetch option is enabled, the package managers whose inputs did not change
+    since the previous run into the same output directory are not run again, see
+    cachi2.core.fetch_manifest.
+    """
+    if get_config().incremental_fetch:
+        outputs = resolve_incrementally(request, _resolve_in_working_copy)
+    else:
+        outputs = _resolve_in_working_copy(request)
+    return _merge_outputs(outputs.values())
+
+
+def _resolve_in_working_copy(request: Request) -> dict[PackageManagerType, RequestOutput]:
+    """
+    Run all requested package managers, return their outputs by type.
+
     This function performs the operations in a working copy of the source directory in case
     a package manager that can make unwanted modifications will be used.
+
+    If the yarn_in_place option is enabled, the operations are performed in the source directory
+    itself, see _restore_yarn_projects.
     """
     if not request.yarn_packages:
         return _resolve_packages(request)
+    elif get_config().yarn_in_place:
+        with _restore_yarn_projects(request):
+            return _resolve_packages(request)
     else:
         original_source_dir = request.source_dir
 
@@ -49,8 +91,107 @@ def resolve_packages(request: Request) -> RequestOutput:
             return output
 
 
-def _resolve_packages(request: Request) -> RequestOutput:
-    """Run all requested package managers, return their combined output."""
+@contextmanager
+def _restore_yarn_projects(request: Request) -> Iterator[None]:
+    """Undo the modifications of the source directory made while processing the yarn packages.
+
+    Cachi2 rewrites the package.json and .yarnrc.yml files of the yarn projects, yarn creates
+    or rewrites files such as .pnp.cjs, .yarn/install-state.gz or node_modules/. Back up the
+    files that may change and remove the created files afterwards, instead of copying the whole
+    source directory.
+
+    The changed and created files are found with git. Tracked files that yarn modified are
+    checked out again, tracked files that already had local changes are backed up. Untracked
+    directories are compared as a whole, files created inside directories that were already
+    untracked are kept. The output directory is never removed, even if it is inside a yarn
+    project.
+    """
+    source_dir = request.source_dir
+    project_dirs = [source_dir.join_within_root(package.path) for package in request.yarn_packages]
+
+    modified_before = _list_modified_files(request, project_dirs)
+
+    backups: dict[Path, Optional[bytes]] = {}
+    for path in modified_before:
+        backups[path] = path.read_bytes() if path.exists() else None
+    for project_dir in project_dirs:
+        for filename in ("package.json", ".yarnrc.yml"):
+            path = project_dir.join_within_root(filename).path
+            backups[path] = path.read_bytes() if path.exists() else None
+
+    untracked_before = _list_untracked_paths(request, project_dirs)
+    try:
+        yield
+    finally:
+        for path in _list_untracked_paths(request, project_dirs) - untracked_before:
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+
+        if modified := _list_modified_files(request, project_dirs) - modified_before:
+            run_cmd(
+                [
+                    "git",
+                    "checkout",
+                    "--",
+                    *(str(path.relative_to(source_dir.path)) for path in modified),
+                ],
+                {"cwd": source_dir},
+            )
+
+        for path, content in backups.items():
+            if content is None:
+                path.unlink(missing_ok=True)
+            else:
+                path.write_bytes(content)
+
+
+def _list_untracked_paths(request: Request, subdirs: list[RootedPath]) -> set[Path]:
+    """List the untracked files in the subdirectories, untracked directories are not expanded."""
+    source_dir = request.source_dir
+    output = run_cmd(
+        [
+            "git",
+            "ls-files",
+            "--others",
+            "--directory",
+            "-z",
+            "--",
+            *_get_pathspecs(request, subdirs),
+        ],
+        {"cwd": source_dir},
+    )
+    return {source_dir.path / relpath for relpath in output.split("\0") if relpath}
+
+
+def _list_modified_files(request: Request, subdirs: list[RootedPath]) -> set[Path]:
+    """List the tracked files in the subdirectories that differ from the index."""
+    source_dir = request.source_dir
+    output = run_cmd(
+        ["git", "diff", "--name-only", "--relative", "-z", "--", *_get_pathspecs(request, subdirs)],
+        {"cwd": source_dir},
+    )
+    return {source_dir.path / relpath for relpath in output.split("\0") if relpath}
+
+
+def _get_pathspecs(request: Request, subdirs: list[RootedPath]) -> list[str]:
+    """Get the git pathspecs for the subdirectories of the source directory.
+
+    The output directory is excluded, it gets created while the package managers are running.
+    """
+    pathspecs = [str(subdir.subpath_from_root) for subdir in subdirs]
+    try:
+        output_subpath = request.output_dir.path.relative_to(request.source_dir.path)
+        pathspecs.append(f":(exclude){output_subpath}")
+    except ValueError:
+        # the output directory is not in the source directory
+        pass
+    return pathspecs
+
+
+def _resolve_packages(request: Request) -> dict[PackageManagerType, RequestOutput]:
+    """Run all requested package managers, return their outputs by type."""
     _supported_package_managers = _package_managers
     requested_types = set(pkg.type for pkg in request.packages)
     if "dev-package-managers" in request.flags:
@@ -62,8 +203,37 @@ def _resolve_packages(request: Request) -> RequestOutput:
             # unknown package managers shouldn't get past input validation
             solution="But the good news is that we're already working on it!",
         )
-    pkg_managers = [_supported_package_managers[type_] for type_ in sorted(requested_types)]
-    return _merge_outputs(pkg_manager(request) for pkg_manager in pkg_managers)
+    types = sorted(requested_types)
+    pkg_managers = [_traced(type_, _supported_package_managers[type_]) for type_ in types]
+    return dict(zip(types, _run_package_managers(pkg_managers, request)))
+
+
+def _traced(pkg_manager_type: PackageManagerType, pkg_manager: Handler) -> Handler:
+    """Record each run of the package manager as a span, see cachi2.core.tracing."""
+
+    def run(request: Request) -> RequestOutput:
+        with span("package_manager", type=pkg_manager_type):
+            return pkg_manager(request)
+
+    return run
+
+
+def _run_package_managers(pkg_managers: list[Handler], request: Request) -> list[RequestOutput]:
+    """Run the package managers, concurrently if allowed by the config.
+
+    Each package manager writes to its own deps/<package manager> subdirectory, so they can run
+    in parallel threads. The outputs are returned in the same order as the package managers,
+    regardless of which one finished first.
+
+    If multiple package managers fail, the error from the first one (in order) is raised.
+    """
+    max_workers = min(get_config().package_manager_concurrency_limit, len(pkg_managers))
+    if max_workers <= 1:
+        return [pkg_manager(request) for pkg_manager in pkg_managers]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cachi2-pm") as executor:
+        futures = [executor.submit(pkg_manager, request) for pkg_manager in pkg_managers]
+        return [future.result() for future in futures]
 
 
 def _merge_outputs(outputs: Iterable[RequestOutput]) -> RequestOutput:
@@ -1,16 +1,27 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import fcntl
+import hashlib
 import logging
+import os
 import re
+import shutil
 import tarfile
 import tempfile
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from os import PathLike
 from pathlib import Path
-from typing import NamedTuple, Union
+from typing import Mapping, NamedTuple, Optional, Union
 
+from git.exc import GitCommandError
 from git.repo import Repo
 
+from cachi2.core.artifact_cache import get_artifact_cache
+from cachi2.core.batch import get_batch_cache
+from cachi2.core.config import get_config
 from cachi2.core.errors import FetchError, UnsupportedFeature
+from cachi2.core.tracing import span
+from cachi2.core.utils import get_cache_dir, run_cmd
 
 log = logging.getLogger(__name__)
 
@@ -79,29 +90,36 @@ def _canonicalize_origin_url(url: str) -> str:
 def clone_as_tarball(url: str, ref: str, to_path: Path) -> None:
     """Clone a git repository, check out the specified revision and create a compressed tarball.
 
-    The repository content will be under the app/ directory in the tarball.
+    The repository content will be under the app/ directory in the tarball. If the use_git_archive
+    option is enabled, the tarball is created by git archive and does not include the .git
+    directory, see _archive_git_tree.
+
+    If the artifact cache is enabled, reuse a tarball created for the same URL and ref when
+    possible. If the git mirror cache is enabled, clone from a local mirror of the repository,
+    see GitMirrorCache.
 
     :param url: the URL of the repository
     :param ref: the revision to check out
     :param to_path: create the tarball at this path
     """
+    use_git_archive = get_config().use_git_archive
+    artifact_cache = get_artifact_cache()
+    cache_key = get_tarball_cache_key(url, ref)
+    if artifact_cache and artifact_cache.materialize(cache_key, to_path):
+        return
+
     list_url = [url]
     # Fallback to `https` if cloning source via ssh fails
     if "ssh://" in url:
         list_url.append(url.replace("ssh://", "https://"))
 
+    git_mirror_cache = get_git_mirror_cache()
+
     with tempfile.TemporaryDirectory(prefix="cachito-") as temp_dir:
         for url in list_url:
-            log.debug("Cloning the Git repository from %s", url)
             try:
-                repo = Repo.clone_from(
-                    url,
-                    temp_dir,
-                    no_checkout=True,
-                    filter="blob:none",
-                    # Don't allow git to prompt for a username if we don't have access
-                    env={"GIT_TERMINAL_PROMPT": "0"},
-                )
+                with span("clone", url=url, ref=ref):
+                    repo = _clone_repo(url, ref, Path(temp_dir), git_mirror_cache, use_git_archive)
             except Exception as ex:
                 log.warning(
                     "Failed cloning the Git repository from %s, ref: %s, exception: %s, exception-msg: %s",
@@ -112,18 +130,179 @@ def clone_as_tarball(url: str, ref: str, to_path: Path) -> None:
                 )
                 continue
 
-            _reset_git_head(repo, ref)
+            if use_git_archive:
+                _archive_git_tree(repo, ref, to_path)
+            else:
+                _reset_git_head(repo, ref)
 
-            with tarfile.open(to_path, mode="w:gz") as archive:
-                # GitPython wrongly annotates working_dir as Optional, it cannot be None
-                assert repo.working_dir is not None  # nosec assert_used
-                archive.add(repo.working_dir, "app")
+                if git_mirror_cache:
+                    # The missing blobs were fetched from the mirror during the checkout. The
+                    # repository in the tarball should point to the real origin, not to the mirror.
+                    repo.remote().set_url(url)
+
+                with span("create_tarball", url=url, ref=ref):
+                    with tarfile.open(to_path, mode="w:gz") as archive:
+                        # GitPython wrongly annotates working_dir as Optional, it cannot be None
+                        assert repo.working_dir is not None  # nosec assert_used
+                        archive.add(repo.working_dir, "app")
+
+            if artifact_cache:
+                artifact_cache.store(cache_key, to_path)
 
             return
 
     raise FetchError("Failed cloning the Git repository")
 
 
+def get_tarball_cache_key(url: str, ref: str) -> str:
+    """Get the key of the tarball of a git repository in the artifact cache."""
+    # the tarballs created by git archive do not include the .git directory, don't mix them up
+    if get_config().use_git_archive:
+        return f"git-archive+{url}@{ref}"
+    return f"git+{url}@{ref}"
+
+
+def clone_as_tarballs_concurrently(
+    repos: Mapping[Path, tuple[str, str]], max_workers: Optional[int] = None
+) -> None:
+    """Clone many git repositories at once, see clone_as_tarball.
+
+    The repositories are cloned in a thread pool. All the clones run to completion even if some
+    of them fail.
+
+    :param repos: the (url, ref) of the repository to create each tarball from, by tarball path
+    :param max_workers: maximum number of repositories cloned at the same time (default: based on
+                        the number of CPUs, see concurrent.futures.ThreadPoolExecutor)
+    :raises FetchError: if any of the clones failed. If only one of them failed, its original
+                        error is raised instead.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cachi2-git") as executor:
+        futures = {
+            f"{url}@{ref}": executor.submit(clone_as_tarball, url, ref, to_path)
+            for to_path, (url, ref) in repos.items()
+        }
+
+    errors = {}
+    for repo, future in futures.items():
+        if error := future.exception():
+            log.error("Failed to fetch %s: %s", repo, error)
+            errors[repo] = error
+
+    if len(errors) == 1:
+        raise next(iter(errors.values()))
+    elif errors:
+        raise FetchError(f"Failed to fetch {len(errors)} Git repositories: {', '.join(errors)}")
+
+
+def _clone_repo(
+    url: str,
+    ref: str,
+    to_path: Path,
+    git_mirror_cache: Optional["GitMirrorCache"],
+    archive_only: bool,
+) -> Repo:
+    """Clone the repository without checking out any files, from the local mirror if enabled.
+
+    If the repository is only needed for git archive, return the mirror itself instead of a clone.
+    Without a mirror, try to fetch only the commit itself (if the ref is a full commit ID), see
+    _fetch_single_commit. The history is not needed when the .git directory is not archived.
+    """
+    if not git_mirror_cache:
+        if archive_only and _is_commit_id(ref):
+            try:
+                return _fetch_single_commit(url, ref, to_path)
+            except GitCommandError as ex:
+                log.debug("Shallow fetch of %s@%s failed, doing a full clone: %s", url, ref, ex)
+                shutil.rmtree(to_path)
+                to_path.mkdir()
+
+        log.debug("Cloning the Git repository from %s", url)
+        clone_url = url
+    else:
+        mirror = git_mirror_cache.update(url, ref)
+        if archive_only:
+            return Repo(mirror)
+        log.debug("Cloning the Git repository from the mirror of %s", url)
+        clone_url = mirror.as_uri()
+
+    return Repo.clone_from(
+        clone_url,
+        to_path,
+        no_checkout=True,
+        filter="blob:none",
+        # Don't allow git to prompt for a username if we don't have access
+        env={"GIT_TERMINAL_PROMPT": "0"},
+    )
+
+
+def _fetch_single_commit(url: str, commit_id: str, to_path: Path) -> Repo:
+    """Fetch just the commit and its tree, without any history (git fetch --depth=1).
+
+    Fetching a commit by its ID requires the server to allow requests for unadvertised objects.
+    All the common git hosting services allow that, the git protocol v2 allows it by default.
+
+    :raises GitCommandError: if the fetch fails
+    """
+    log.debug("Fetching the commit %s from %s", commit_id, url)
+    repo = Repo.init(to_path)
+    repo.create_remote("origin", url)
+    # Don't allow git to prompt for a username if we don't have access
+    repo.git.fetch("--depth=1", "origin", commit_id, env={"GIT_TERMINAL_PROMPT": "0"})
+    return repo
+
+
+def _archive_git_tree(repo: Repo, ref: str, to_path: Path) -> None:
+    """Create a compressed tarball of the tree at the ref with git archive, without a checkout.
+
+    The content is under the app/ directory, the .git directory is not included. If pigz is
+    available, git compresses the tarball with it (using multiple threads).
+
+    The export-ignore and export-subst attributes of the repository are overridden, the tarball
+    has the same files with the same content as a checkout of the commit.
+    """
+    try:
+        commit_id = repo.commit(ref).hexsha
+    except Exception as ex:
+        log.exception("Failed on resolving the Git ref %s, exception: %s", ref, type(ex).__name__)
+        raise FetchError(
+            "Failed on checking out the Git repository. Please verify the supplied reference "
+            f'of "{ref}" is valid.'
+        )
+
+    git_params = {"cwd": repo.git_dir, "env": {**os.environ, "GIT_TERMINAL_PROMPT": "0"}}
+
+    if repo.git.config("--get", "remote.origin.promisor", with_exceptions=False) == "true":
+        # In a partial clone, git archive would fetch the missing blobs one by one. Fetch them all
+        # in one request instead, the same way git checkout does.
+        tree = run_cmd(["git", "ls-tree", "-r", commit_id], git_params)
+        blobs = [line.split()[2] for line in tree.splitlines() if line.split()[1] == "blob"]
+        fetch_blobs = [
+            "git",
+            "-c",
+            "fetch.negotiationAlgorithm=noop",
+            "fetch",
+            "origin",
+            "--no-tags",
+            "--no-write-fetch-head",
+            "--recurse-submodules=no",
+            "--filter=blob:none",
+            "--stdin",
+        ]
+        run_cmd(fetch_blobs, {**git_params, "input": "\n".join(blobs)})
+
+    # info/attributes takes precedence over the .gitattributes files in the tree
+    attributes_path = Path(repo.git_dir, "info", "attributes")
+    attributes_path.parent.mkdir(exist_ok=True)
+    attributes_path.write_text("* -export-ignore -export-subst\n")
+
+    git_config = []
+    if shutil.which("pigz"):
+        git_config = ["-c", "tar.tar.gz.command=pigz -cn"]
+
+    archive_cmd = ["archive", "--format=tar.gz", "--prefix=app/", "-o", str(to_path), commit_id]
+    run_cmd(["git", *git_config, *archive_cmd], git_params)
+
+
 def _reset_git_head(repo: Repo, ref: str) -> None:
     try:
         repo.head.reference = repo.commit(ref)  # type: ignore # 'reference' is a weird property
@@ -140,3 +319,87 @@ def _reset_git_head(repo: Repo, ref: str) -> None:
             "Failed on checking out the Git repository. Please verify the supplied reference "
             f'of "{ref}" is valid.'
         )
+
+
+class GitMirrorCache:
+    """Bare mirrors of remote git repositories, shared between Cachi2 runs.
+
+    Each repository is mirrored at <root>/<sha256 of the URL>.git. The mirror is cloned once and
+    then fetched incrementally, only when it does not have the requested commit yet.
+
+    Creating or updating a mirror holds an exclusive lock on <root>/<sha256 of the URL>.lock, so
+    concurrent Cachi2 processes (and threads) can safely share the same cache. Cloning from a mirror
+    does not need the lock, git objects are never modified and refs are updated atomically.
+
+    In a batch (see cachi2.core.batch), a mirror is fetched at most once for refs that are not
+    commit IDs (e.g. tags), all the requests of the batch see the same state of the repository.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """Initialize a GitMirrorCache rooted at the specified directory."""
+        self.root = root
+
+    def update(self, url: str, ref: str) -> Path:
+        """Make sure the mirror of the repository has the ref, return the path to the mirror.
+
+        :param url: the URL of the repository
+        :param ref: the revision that will be checked out from the mirror
+        :raises GitCommandError: if cloning or fetching the repository fails
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        mirror = self.root.joinpath(f"{key}.git")
+        self.root.mkdir(parents=True, exist_ok=True)
+        fetched_in_batch = get_batch_cache("git-mirrors")
+
+        with open(self.root.joinpath(f"{key}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            if not mirror.exists():
+                log.debug("Creating a mirror of %s in the git mirror cache", url)
+                self._create_mirror(url, mirror)
+            elif _is_commit_id(ref) and _has_commit(Repo(mirror), ref):
+                log.debug("Git mirror cache hit: %s@%s", url, ref)
+            elif not _is_commit_id(ref) and fetched_in_batch and key in fetched_in_batch:
+                log.debug("Git mirror cache hit: %s@%s (fetched earlier in the batch)", url, ref)
+            else:
+                log.debug("Fetching %s into the git mirror cache", url)
+                Repo(mirror).git.fetch("--prune", "origin", env={"GIT_TERMINAL_PROMPT": "0"})
+
+            if fetched_in_batch is not None:
+                fetched_in_batch[key] = True
+
+        return mirror
+
+    @staticmethod
+    def _create_mirror(url: str, mirror: Path) -> None:
+        # Clone to a temporary directory first, an interrupted clone must not look like a mirror
+        tmp_mirror = Path(tempfile.mkdtemp(prefix=f".{mirror.name}.", dir=mirror.parent))
+        try:
+            repo = Repo.clone_from(url, tmp_mirror, mirror=True, env={"GIT_TERMINAL_PROMPT": "0"})
+            with repo.config_writer() as config:
+                # Allow partial clones from the mirror
+                config.set_value("uploadpack", "allowFilter", "true")
+                config.set_value("uploadpack", "allowAnySHA1InWant", "true")
+            os.rename(tmp_mirror, mirror)
+        except BaseException:
+            shutil.rmtree(tmp_mirror, ignore_errors=True)
+            raise
+
+
+def _is_commit_id(ref: str) -> bool:
+    return re.fullmatch(r"[0-9a-f]{40}", ref) is not None
+
+
+def _has_commit(repo: Repo, commit_id: str) -> bool:
+    try:
+        repo.git.cat_file("-e", f"{commit_id}^{{commit}}")
+    except GitCommandError:
+        return False
+    return True
+
+
+def get_git_mirror_cache() -> Optional[GitMirrorCache]:
+    """Get the git mirror cache, or None if the cache is disabled in the config."""
+    if not get_config().use_git_mirror_cache:
+        return None
+    return GitMirrorCache(get_cache_dir().joinpath("git"))
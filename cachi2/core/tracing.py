@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+
+class Tracer:
+    """Collect the spans recorded by the span() context manager.
+
+    The spans are written as Chrome trace events, the file can be viewed in chrome://tracing or
+    https://ui.perfetto.dev. See the Trace Event Format specification:
+    https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+    """
+
+    def __init__(self) -> None:
+        """Initialize a Tracer, the timestamps of the spans are relative to this moment."""
+        self._start_ns = time.perf_counter_ns()
+        self._events: list[dict[str, Any]] = []
+        self._named_threads: set[int] = set()
+        self._lock = threading.Lock()
+
+    def add_span(
+        self, name: str, tid: int, start_ns: int, end_ns: int, args: dict[str, Any]
+    ) -> None:
+        """Record a span that ran in the thread (or asyncio task) with the given ID."""
+        event = {
+            "name": name,
+            "ph": "X",
+            "pid": os.getpid(),
+            "tid": tid,
+            "ts": (start_ns - self._start_ns) / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "args": args,
+        }
+        with self._lock:
+            if tid not in self._named_threads:
+                self._named_threads.add(tid)
+                self._events.append(_thread_name_event(tid))
+            self._events.append(event)
+
+    def write(self, path: Path) -> None:
+        """Write the spans recorded so far to a file, along with the resource usage of the process."""
+        with self._lock:
+            trace = {
+                "traceEvents": list(self._events),
+                "displayTimeUnit": "ms",
+                "otherData": _resource_usage(),
+            }
+        path.write_text(json.dumps(trace))
+        log.info("Profiling data written to %s", path)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def start_tracing() -> Tracer:
+    """Start recording spans, return the tracer that collects them."""
+    global _tracer
+
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing() -> None:
+    """Stop recording spans."""
+    global _tracer
+
+    _tracer = None
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[dict[str, Any]]:
+    """Record the duration of the enclosed block if tracing is enabled, see start_tracing.
+
+    >>> with span("download", url=url) as span_args:
+    ...     span_args["bytes"] = download(url)
+
+    The keyword arguments are attached to the span. The context manager returns them as a dict,
+    the block can add more of them (e.g. the results of the operation). If the block raises an
+    exception, its type is attached to the span as "error".
+
+    Spans that run in an asyncio task are shown separately for each task, the CPU time of
+    the thread is only measured for spans outside of asyncio tasks.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield args
+        return
+
+    task = _current_task()
+    tid = id(task) if task else threading.get_ident()
+    start_cpu_ns = time.thread_time_ns()
+    start_ns = time.perf_counter_ns()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        end_ns = time.perf_counter_ns()
+        if not task:
+            args["cpu_ms"] = (time.thread_time_ns() - start_cpu_ns) / 1_000_000
+        tracer.add_span(name, tid, start_ns, end_ns, args)
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        # no running event loop in this thread
+        return None
+
+
+def _thread_name_event(tid: int) -> dict[str, Any]:
+    if tid == threading.get_ident():
+        thread_name = threading.current_thread().name
+    else:
+        thread_name = f"asyncio task {tid:#x}"
+    return {
+        "name": "thread_name",
+        "ph": "M",
+        "pid": os.getpid(),
+        "tid": tid,
+        "args": {"name": thread_name},
+    }
+
+
+def _resource_usage() -> dict[str, Any]:
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "user_cpu_s": self_usage.ru_utime,
+        "system_cpu_s": self_usage.ru_stime,
+        "max_rss_kb": self_usage.ru_maxrss,
+        "children_user_cpu_s": children_usage.ru_utime,
+        "children_system_cpu_s": children_usage.ru_stime,
+        "children_max_rss_kb": children_usage.ru_maxrss,
+    }
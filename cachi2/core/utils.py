@@ -4,16 +4,21 @@ import os
 import re
 import shutil
 import subprocess  # nosec
+import tempfile
+import threading
 from pathlib import Path
-from typing import Callable, Iterator, Optional, Sequence
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, Sequence, Union, cast
 
 import reflink  # type: ignore
 
 from cachi2.core.config import get_config
 from cachi2.core.errors import Cachi2Error
+from cachi2.core.tracing import span
 
 log = logging.getLogger(__name__)
 
+StrPath = Union[str, os.PathLike[str]]
+
 
 def run_cmd(cmd: Sequence[str], params: dict) -> str:
     """
@@ -33,17 +38,10 @@ def run_cmd(cmd: Sequence[str], params: dict) -> str:
     params.setdefault("timeout", conf.subprocess_timeout)
 
     executable, *args = cmd
-    executable_path = shutil.which(executable)
-    if executable_path is None:
-        raise Cachi2Error(
-            f"{executable!r} executable not found in PATH",
-            solution=(
-                f"Please make sure that the {executable!r} executable is installed in your PATH.\n"
-                "If you are using Cachi2 via its container image, this should not happen - please report this bug."
-            ),
-        )
+    executable_path = _get_executable_path(executable)
 
-    response = subprocess.run([executable_path, *args], **params)  # nosec
+    with span("run_cmd", cmd=" ".join(cmd)):
+        response = subprocess.run([executable_path, *args], **params)  # nosec
 
     try:
         response.check_returncode()
@@ -57,6 +55,109 @@ def run_cmd(cmd: Sequence[str], params: dict) -> str:
     return response.stdout
 
 
+def run_cmd_json_stream(cmd: Sequence[str], params: dict) -> Iterator[Any]:
+    """
+    Run the given command and load the JSON objects from its output as they are printed.
+
+    Unlike load_json_stream(run_cmd(...)), the output is read from the pipe in chunks and is never
+    held in memory as a whole. The objects can be separated by whitespace, see load_json_stream.
+
+    The command runs as the returned generator is consumed. If the generator is not consumed
+    completely (or the output is not valid JSON), the command gets killed.
+
+    :param iter cmd: iterable representing command to be executed
+    :param dict params: keyword parameters for subprocess.Popen, e.g. env and cwd
+    :returns: a generator of the parsed objects
+    :raises CalledProcessError: if the command fails, after all its output is processed
+    :raises TimeoutExpired: if the command does not finish within the subprocess timeout
+    """
+    params = params.copy()
+    timeout = params.pop("timeout", get_config().subprocess_timeout)
+
+    executable, *args = cmd
+    executable_path = _get_executable_path(executable)
+
+    with span("run_cmd", cmd=" ".join(cmd)):
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as stderr:
+            with subprocess.Popen(  # nosec
+                [executable_path, *args],
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                text=True,
+                encoding="utf-8",
+                **params,
+            ) as proc:
+                timed_out = threading.Event()
+
+                def kill_on_timeout() -> None:
+                    timed_out.set()
+                    proc.kill()
+
+                timer = threading.Timer(timeout, kill_on_timeout)
+                timer.start()
+                try:
+                    yield from _iter_json_objects(cast(IO[str], proc.stdout))
+                    returncode = proc.wait()
+                except BaseException:
+                    proc.kill()
+                    raise
+                finally:
+                    timer.cancel()
+
+                if timed_out.is_set():
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+
+                if returncode != 0:
+                    stderr.seek(0)
+                    error_output = stderr.read()
+                    log.error('The command "%s" failed', " ".join(cmd))
+                    _log_error_output("STDERR", error_output)
+                    raise subprocess.CalledProcessError(returncode, cmd, stderr=error_output)
+
+
+def _iter_json_objects(stream: IO[str], chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """Load all JSON objects from a text stream, reading it in chunks."""
+    decoder = json.JSONDecoder()
+    non_whitespace = re.compile(r"\S")
+    buffer = ""
+    i = 0
+    eof = False
+
+    while True:
+        if match := non_whitespace.search(buffer, i):
+            try:
+                obj, end = decoder.raw_decode(buffer, match.start())
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # a number at the very end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    yield obj
+                    i = end
+                    continue
+        elif eof:
+            return
+
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[i:] + chunk
+        i = 0
+
+
+def _get_executable_path(executable: str) -> str:
+    executable_path = shutil.which(executable)
+    if executable_path is None:
+        raise Cachi2Error(
+            f"{executable!r} executable not found in PATH",
+            solution=(
+                f"Please make sure that the {executable!r} executable is installed in your PATH.\n"
+                "If you are using Cachi2 via its container image, this should not happen - please report this bug."
+            ),
+        )
+    return executable_path
+
+
 def _log_error_output(out_or_err: str, output: Optional[str]) -> None:
     if output:
         log.error("%s:\n%s", out_or_err, output.rstrip())
@@ -84,34 +185,102 @@ def copy_directory(origin: Path, destination: Path) -> Path:
     """
     Recursively copy directory to another path.
 
-    Use reflinks by default if the file system supports it.
+    Use reflinks by default if the file system supports it. Never uses hardlinks, the copy can be
+    safely modified.
 
     :raise FileExistsError: if the destination path already exists.
     :raise FileNotFoundError: if the origin directory does not exist.
     """
+    log.debug(f"Copying {origin} to {destination}.")
+    materialize_directory(
+        origin, destination, hardlink=False, ignore=shutil.ignore_patterns(destination.name)
+    )
+    return destination
+
+
+class FileMaterializer:
+    """
+    Make the content of files available at other paths, avoiding data copies where possible.
 
-    def _copy_using(copy_function: Callable) -> None:
-        shutil.copytree(
-            origin,
-            destination,
-            copy_function=copy_function,
-            dirs_exist_ok=True,
-            symlinks=True,
-            ignore=shutil.ignore_patterns(destination.name),
-        )
+    Try, in order: moving the file (if enabled), a reflink, a hardlink (if enabled) and a standard
+    copy. The destination file is replaced if it already exists.
 
-    if reflink.supported_at(origin):
-        try:
-            log.debug(f"Copying {origin} to {destination} using reflinks.")
-            _copy_using(reflink.reflink)
-        except reflink.ReflinkImpossibleError:
-            log.debug("Reflink copy failed, falling back to standard copy.")
-            _copy_using(shutil.copy2)
-    else:
-        log.debug(f"Copying {origin} to {destination} using a standard copy.")
-        _copy_using(shutil.copy2)
+    A method that fails once is not tried again for the following files. The reason is typically
+    the same for all the files (the file system does not support reflinks, the destination is on
+    another device), so materializing many files does not waste syscalls on doomed attempts.
 
-    return destination
+    Note that a hardlinked destination shares its content with the origin. Do not modify it
+    in place.
+    """
+
+    def __init__(self, move: bool = False, hardlink: bool = True) -> None:
+        """Initialize a FileMaterializer.
+
+        :param move: move the files instead of copying them, the origin files are removed
+        :param hardlink: allow hardlinking the files
+        """
+        methods: list[Callable[[StrPath, StrPath], None]] = []
+        if move:
+            methods.append(os.rename)
+        methods.append(_reflink)
+        if hardlink:
+            methods.append(os.link)
+        self._methods = methods
+
+    def __call__(self, origin: StrPath, destination: StrPath) -> None:
+        """Materialize a single file, the signature is compatible with shutil.copytree."""
+        Path(destination).unlink(missing_ok=True)
+
+        for method in self._methods:
+            try:
+                method(origin, destination)
+                return
+            except (reflink.ReflinkImpossibleError, NotImplementedError, OSError):
+                self._methods = [m for m in self._methods if m is not method]
+
+        shutil.copy2(origin, destination)
+
+
+def _reflink(origin: StrPath, destination: StrPath) -> None:
+    reflink.reflink(str(origin), str(destination))
+
+
+def materialize_file(origin: Path, destination: Path) -> None:
+    """
+    Make the content of a file available at another path, avoiding data copies where possible.
+
+    See FileMaterializer, hardlinks are allowed.
+    """
+    FileMaterializer()(origin, destination)
+
+
+def materialize_directory(
+    origin: Path,
+    destination: Path,
+    move: bool = False,
+    hardlink: bool = True,
+    ignore: Optional[Callable[[Any, list[str]], Iterable[str]]] = None,
+) -> None:
+    """
+    Recursively materialize the files of a directory at another path, see FileMaterializer.
+
+    The destination directory may already exist, its files are replaced by the origin files.
+
+    :param origin: the directory to materialize
+    :param destination: the destination directory
+    :param move: move the files instead of copying them
+    :param hardlink: allow hardlinking the files
+    :param ignore: see shutil.copytree
+    :raise FileNotFoundError: if the origin directory does not exist.
+    """
+    shutil.copytree(
+        origin,
+        destination,
+        copy_function=FileMaterializer(move=move, hardlink=hardlink),
+        dirs_exist_ok=True,
+        symlinks=True,
+        ignore=ignore,
+    )
 
 
 def get_cache_dir() -> Path:
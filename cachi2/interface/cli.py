@@ -8,14 +8,17 @@ from typing import Any, Callable, Optional
 
 import pydantic
 import typer
+import yaml
 
 import cachi2.core.config as config
+from cachi2.core.batch import run_batch
 from cachi2.core.errors import Cachi2Error, InvalidInput
 from cachi2.core.extras.envfile import EnvFormat, generate_envfile
 from cachi2.core.models.input import Flag, PackageInput, Request, parse_user_input
 from cachi2.core.models.output import BuildConfig
 from cachi2.core.resolver import resolve_packages, supported_package_managers
 from cachi2.core.rooted_path import RootedPath
+from cachi2.core.tracing import span, start_tracing, stop_tracing
 from cachi2.interface.logging import LogLevel, setup_logging
 
 app = typer.Typer()
@@ -157,6 +160,24 @@ def fetch_deps(
             "already have a vendor/ directory (will fail if changes would be made)."
         ),
     ),
+    plan: bool = typer.Option(
+        False,
+        "--plan",
+        help=(
+            "Do not fetch anything, print a JSON plan of the artifacts that would be downloaded "
+            "(sizes, sources, estimated cache hits) instead."
+        ),
+    ),
+    profile: Optional[Path] = typer.Option(
+        None,
+        "--profile",
+        dir_okay=False,
+        resolve_path=True,
+        help=(
+            "Write timing data (package managers, commands, downloads, checksums) to this file "
+            "in the Chrome trace format, viewable in chrome://tracing or ui.perfetto.dev."
+        ),
+    ),
 ) -> None:
     """Fetch dependencies for supported package managers.
 
@@ -250,22 +271,137 @@ def fetch_deps(
         },
     )
 
-    request_output = resolve_packages(request)
+    tracer = start_tracing() if profile else None
+    try:
+        if plan:
+            # slow to import (requests, GitPython), the other commands do not need it
+            from cachi2.core.plan import plan_request
 
-    request.output_dir.path.mkdir(parents=True, exist_ok=True)
-    request.output_dir.join_within_root(".build-config.json").path.write_text(
-        request_output.build_config.model_dump_json()
-    )
+            with span("plan_request"):
+                request_plan = plan_request(request)
+            print(request_plan.model_dump_json(indent=2))
+            return
 
-    sbom = request_output.generate_sbom()
-    request.output_dir.join_within_root("bom.json").path.write_text(
-        # the Sbom model has camelCase aliases in some fields
-        sbom.model_dump_json(by_alias=True, exclude_none=True)
-    )
+        with span("fetch_deps"):
+            _fetch_deps(request)
+    finally:
+        if profile and tracer:
+            stop_tracing()
+            tracer.write(profile)
 
     log.info(r"All dependencies fetched successfully \o/")
 
 
+def _fetch_deps(request: Request) -> None:
+    """Fetch the dependencies of a request and write the output files."""
+    request_output = resolve_packages(request)
+
+    with span("write_output"):
+        request.output_dir.path.mkdir(parents=True, exist_ok=True)
+        request.output_dir.join_within_root(".build-config.json").path.write_text(
+            request_output.build_config.model_dump_json()
+        )
+
+        sbom = request_output.generate_sbom()
+        request.output_dir.join_within_root("bom.json").path.write_text(
+            # the Sbom model has camelCase aliases in some fields
+            sbom.model_dump_json(by_alias=True, exclude_none=True)
+        )
+
+
+class _BatchEntry(pydantic.BaseModel, extra="forbid"):
+    source: Path
+    output: Path
+    packages: list[PackageInput]
+    flags: list[Flag] = list()
+
+
+class _BatchManifest(pydantic.RootModel[list[_BatchEntry]]):
+    pass
+
+
+@app.command()
+@handle_errors
+def fetch_deps_batch(
+    manifest: Path = typer.Argument(
+        ...,
+        exists=True,
+        dir_okay=False,
+        resolve_path=True,
+        help="Process the repositories listed in this file. See usage examples.",
+    ),
+) -> None:
+    """Fetch dependencies for many repositories in a single process.
+
+    The manifest is a YAML (or JSON) list of repositories, each with the same input as the
+    fetch-deps command. Relative source and output paths are relative to the manifest file.
+
+    \b
+    - source: ./repo-a
+      output: ./cachi2-output/repo-a
+      packages: [{"type": "gomod"}]
+    - source: ./repo-b
+      output: ./cachi2-output/repo-b
+      packages: [{"type": "pip"}, {"type": "npm", "path": "frontend"}]
+      flags: [cgo-disable]
+
+    Several repositories are processed at the same time (see the batch_concurrency_limit config
+    option). They share the HTTP connections, the PyPI project pages, the git mirrors (if the
+    git mirror cache is enabled) and the limit on concurrent downloads. A failed repository
+    does not stop the other ones, the command fails at the end if any of them failed.
+    """  # noqa: D301; backslashes intentional
+    requests = _parse_batch_manifest(manifest)
+
+    errors = run_batch(requests, _fetch_deps)
+    if errors:
+        failed = ", ".join(str(requests[i].source_dir) for i in errors)
+        print(
+            f"Error: failed to fetch the dependencies of {len(errors)} out of {len(requests)} "
+            f"repositories: {failed}",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    log.info(r"All dependencies of %d repositories fetched successfully \o/", len(requests))
+
+
+def _parse_batch_manifest(manifest: Path) -> list[Request]:
+    try:
+        manifest_data = yaml.safe_load(manifest.read_text())
+    except yaml.YAMLError as e:
+        raise InvalidInput(f"The batch manifest {manifest} is not valid YAML: {e}")
+
+    entries = parse_user_input(_BatchManifest.model_validate, manifest_data)
+
+    requests = []
+    output_dirs = set()
+    for entry in entries.root:
+        source = manifest.parent / entry.source
+        if not source.is_dir():
+            raise InvalidInput(f"The source directory does not exist: {source}")
+
+        # the repositories are processed at the same time, they would overwrite each other
+        output = (manifest.parent / entry.output).resolve()
+        if output in output_dirs:
+            raise InvalidInput(
+                f"The output directory is used by more than one repository: {output}"
+            )
+        output_dirs.add(output)
+
+        request = parse_user_input(
+            Request.model_validate,
+            {
+                "source_dir": source.resolve(),
+                "output_dir": output,
+                "packages": entry.packages,
+                "flags": entry.flags,
+            },
+        )
+        requests.append(request)
+
+    return requests
+
+
 FROM_OUTPUT_DIR_ARG = typer.Argument(
     ...,
     exists=True,
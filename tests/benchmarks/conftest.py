@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import ssl
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import pytest
+
+import cachi2.core.config as cachi2_config
+from cachi2.core.config import Config
+
+from . import utils
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--bench-deps",
+        default="100",
+        help="Comma-separated numbers of dependencies of the synthetic projects (default: 100).",
+    )
+    group.addoption(
+        "--bench-json",
+        default=None,
+        help="Write the benchmark results to this JSON file, e.g. to compare them across runs.",
+    )
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    if "n_deps" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("--bench-deps", "100").split(",")]
+        metafunc.parametrize("n_deps", sizes)
+
+
+def pytest_terminal_summary(
+    terminalreporter: pytest.TerminalReporter, config: pytest.Config
+) -> None:
+    if not utils.BENCHMARK_RESULTS:
+        return
+
+    terminalreporter.section("benchmark results")
+    terminalreporter.write_line(utils.BenchmarkResult.HEADER)
+    for result in utils.BENCHMARK_RESULTS:
+        terminalreporter.write_line(result.format_row())
+    terminalreporter.write_line(
+        "RSS is the peak of the whole pytest process (and its largest child process) so far, "
+        "run a single benchmark for an isolated measurement."
+    )
+
+    if json_path := config.getoption("--bench-json", None):
+        Path(json_path).write_text(
+            json.dumps([result.as_dict() for result in utils.BENCHMARK_RESULTS], indent=2)
+        )
+
+
+@pytest.fixture
+def registry() -> Iterator[utils.LocalRegistry]:
+    registry = utils.LocalRegistry()
+    try:
+        yield registry
+    finally:
+        registry.close()
+
+
+@pytest.fixture
+def https_registry(tmp_path: Path) -> Iterator[tuple[utils.LocalRegistry, Path]]:
+    """Get a registry served over HTTPS and the path to its CA certificate (yarn rejects HTTP)."""
+    if not shutil.which("openssl"):
+        pytest.skip("openssl is needed to create the certificate of the HTTPS registry")
+
+    cert, key = utils.make_self_signed_cert(tmp_path)
+    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ssl_context.load_cert_chain(cert, key)
+
+    registry = utils.LocalRegistry(ssl_context)
+    try:
+        yield registry, cert
+    finally:
+        registry.close()
+
+
+@pytest.fixture
+def git_daemon(tmp_path: Path) -> Iterator[utils.GitDaemon]:
+    base_path = tmp_path / "git-daemon"
+    base_path.mkdir()
+    git_daemon = utils.GitDaemon(base_path)
+    try:
+        yield git_daemon
+    finally:
+        git_daemon.close()
+
+
+@pytest.fixture
+def yarn_path() -> Path:
+    """Get the yarn release to use, e.g. CACHI2_BENCH_YARN_PATH=.yarn/releases/yarn-3.6.1.cjs."""
+    yarn_path = os.environ.get("CACHI2_BENCH_YARN_PATH")
+    if not yarn_path or not shutil.which("node"):
+        pytest.skip("the yarn benchmark needs node and CACHI2_BENCH_YARN_PATH")
+    return Path(yarn_path).resolve()
+
+
+@pytest.fixture
+def set_config(monkeypatch: pytest.MonkeyPatch) -> Callable[..., None]:
+    """Get a function that sets the cachi2 configuration options for the benchmark."""
+
+    def set_config(**options: Any) -> None:
+        monkeypatch.setattr(cachi2_config, "config", Config(**options))
+
+    return set_config
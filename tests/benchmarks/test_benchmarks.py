@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+from typing import Callable
+from unittest import mock
+
+import pytest
+
+from cachi2.core.models.input import Request
+from cachi2.core.package_managers import gomod, npm, pip, yarn
+
+from . import utils
+
+
+def make_request(source_dir: Path, output_dir: Path, package_type: str) -> Request:
+    return Request(source_dir=source_dir, output_dir=output_dir, packages=[{"type": package_type}])
+
+
+def test_pip(
+    n_deps: int,
+    tmp_path: Path,
+    registry: utils.LocalRegistry,
+    git_daemon: utils.GitDaemon,
+    set_config: Callable[..., None],
+) -> None:
+    utils.make_pip_project(tmp_path / "source", n_deps, registry, git_daemon)
+    set_config()
+
+    pypi_client = pip.pypi_simple.PyPISimple(endpoint=f"{registry.url}/pypi/simple/")
+    with mock.patch.object(pip, "_get_pypi_client", return_value=pypi_client):
+        utils.run_benchmark(
+            "pip",
+            n_deps,
+            pip.fetch_pip_source,
+            make_request(tmp_path / "source", tmp_path / "output", "pip"),
+        )
+
+
+def test_npm(
+    n_deps: int,
+    tmp_path: Path,
+    registry: utils.LocalRegistry,
+    git_daemon: utils.GitDaemon,
+    set_config: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    utils.make_npm_project(tmp_path / "source", n_deps, registry, git_daemon)
+    set_config()
+    # process the local registry like the real one
+    monkeypatch.setattr(npm, "NPM_REGISTRY_CNAMES", (*npm.NPM_REGISTRY_CNAMES, "127.0.0.1"))
+
+    utils.run_benchmark(
+        "npm",
+        n_deps,
+        npm.fetch_npm_source,
+        make_request(tmp_path / "source", tmp_path / "output", "npm"),
+    )
+
+
+def test_gomod(
+    n_deps: int,
+    tmp_path: Path,
+    registry: utils.LocalRegistry,
+    git_daemon: utils.GitDaemon,
+    set_config: Callable[..., None],
+) -> None:
+    goproxy_url = utils.make_gomod_project(tmp_path / "source", n_deps, registry, git_daemon)
+    set_config(goproxy_url=goproxy_url)
+
+    utils.run_benchmark(
+        "gomod",
+        n_deps,
+        gomod.fetch_gomod_source,
+        make_request(tmp_path / "source", tmp_path / "output", "gomod"),
+    )
+
+
+def test_yarn(
+    n_deps: int,
+    tmp_path: Path,
+    https_registry: tuple[utils.LocalRegistry, Path],
+    yarn_path: Path,
+    set_config: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    registry, ca_file = https_registry
+    utils.make_yarn_project(tmp_path / "source", n_deps, registry, yarn_path, ca_file)
+    set_config()
+    # cachi2 runs "yarn", let it run the yarn release of the project
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    bin_dir.joinpath("yarn").write_text(f'#!/bin/sh\nexec node "{yarn_path}" "$@"\n')
+    bin_dir.joinpath("yarn").chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir), prepend=os.pathsep)
+
+    utils.run_benchmark(
+        "yarn",
+        n_deps,
+        yarn.fetch_yarn_source,
+        make_request(tmp_path / "source", tmp_path / "output", "yarn"),
+    )
@@ -0,0 +1,475 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import resource
+import shutil
+import socket
+import ssl
+import subprocess
+import tarfile
+import threading
+import time
+import zipfile
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from git import Actor, Repo
+
+from cachi2.core.models.input import Request
+
+log = logging.getLogger(__name__)
+
+GIT_AUTHOR = Actor("Cachi2 Benchmark", "cachi2-benchmark@example.org")
+
+
+class LocalRegistry:
+    """A local HTTP server that serves static content, a stand-in for the real registries.
+
+    A single server plays all the roles (PyPI simple index, npm registry, GOPROXY), each of them
+    under its own path prefix. The content is added with add() before the benchmark starts.
+    """
+
+    def __init__(self, ssl_context: Optional[ssl.SSLContext] = None) -> None:
+        """Start the server on a free localhost port, optionally serving HTTPS."""
+        self._content: dict[str, tuple[str, bytes]] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        if ssl_context:
+            self._server.socket = ssl_context.wrap_socket(self._server.socket, server_side=True)
+        scheme = "https" if ssl_context else "http"
+        self.url = f"{scheme}://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def add(self, path: str, content: bytes, content_type: str = "application/octet-stream") -> str:
+        """Serve the content at the path, return the full URL."""
+        self._content[path] = (content_type, content)
+        return f"{self.url}{path}"
+
+    def close(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                path = self.path.split("?", 1)[0]
+                if path not in registry._content:
+                    self.send_error(404)
+                    return
+                content_type, content = registry._content[path]
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args: object) -> None:
+                log.debug("%s - %s", self.address_string(), format % args)
+
+        return Handler
+
+
+class GitDaemon:
+    """A git daemon serving the bare repositories in a directory over the git:// protocol."""
+
+    def __init__(self, base_path: Path) -> None:
+        """Start the daemon on a free localhost port."""
+        self.base_path = base_path
+        port = _get_free_port()
+        # not 127.0.0.1, the benchmarks treat that host as the npm registry
+        self.url = f"git://localhost:{port}"
+        self._proc = subprocess.Popen(
+            [
+                "git",
+                "daemon",
+                "--reuseaddr",
+                "--export-all",
+                "--listen=127.0.0.1",
+                f"--port={port}",
+                f"--base-path={base_path}",
+                str(base_path),
+            ],
+        )
+        _wait_for_port(port)
+
+    def create_repo(self, name: str, files: dict[str, str]) -> tuple[str, str]:
+        """Create a repository with a single commit, return its git:// URL and the commit ID."""
+        worktree = self.base_path / "worktrees" / name
+        commit_id = init_git_repo(worktree, files)
+        return self.publish(worktree, name), commit_id
+
+    def publish(self, repo_path: Path, name: str) -> str:
+        """Serve a bare clone of the repository and make it the origin, return its URL."""
+        url = f"{self.url}/{name}.git"
+        repo = Repo(repo_path)
+        repo.clone(self.base_path / f"{name}.git", bare=True)
+        repo.create_remote("origin", url)
+        return url
+
+    def close(self) -> None:
+        """Stop the daemon."""
+        self._proc.terminate()
+        self._proc.wait()
+
+
+def init_git_repo(path: Path, files: dict[str, str], origin_url: Optional[str] = None) -> str:
+    """Write the files to a new git repository and commit them, return the commit ID."""
+    for relpath, content in files.items():
+        path.joinpath(relpath).parent.mkdir(parents=True, exist_ok=True)
+        path.joinpath(relpath).write_text(content)
+
+    repo = Repo.init(path)
+    repo.git.add("--all")
+    commit = repo.index.commit("Benchmark project", author=GIT_AUTHOR, committer=GIT_AUTHOR)
+    if origin_url:
+        repo.create_remote("origin", origin_url)
+    return commit.hexsha
+
+
+def _get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def make_self_signed_cert(directory: Path) -> tuple[Path, Path]:
+    """Create a self-signed certificate for 127.0.0.1 with openssl, return the cert and key paths."""
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey=rsa:2048",
+            "-nodes",
+            "-days=1",
+            "-subj=/CN=127.0.0.1",
+            "-addext=subjectAltName=IP:127.0.0.1",
+            f"-keyout={key}",
+            f"-out={cert}",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def make_tarball(files: dict[str, str]) -> bytes:
+    """Create a .tar.gz archive with the files, reproducibly."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, content in files.items():
+            data = content.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def sri(content: bytes) -> str:
+    """Get the sha512 Subresource Integrity value of the content (npm lockfile format)."""
+    return "sha512-" + base64.b64encode(hashlib.sha512(content).digest()).decode()
+
+
+def go_hash(files: dict[str, bytes]) -> str:
+    """Compute the "h1:" hash of files like Go does for go.sum (golang.org/x/mod/sumdb/dirhash)."""
+    summary = "".join(
+        f"{hashlib.sha256(files[name]).hexdigest()}  {name}\n" for name in sorted(files)
+    )
+    return "h1:" + base64.b64encode(hashlib.sha256(summary.encode()).digest()).decode()
+
+
+def dep_names(prefix: str, n_deps: int) -> list[str]:
+    return [f"{prefix}{i:05}" for i in range(n_deps)]
+
+
+def n_git_deps(n_deps: int) -> int:
+    """Make about 1% of the dependencies git dependencies."""
+    return max(1, n_deps // 100)
+
+
+def make_pip_project(
+    path: Path, n_deps: int, registry: LocalRegistry, git_daemon: GitDaemon
+) -> None:
+    """Create a pip project with n_deps sdists in the PyPI index and ~1% git requirements."""
+    requirements = []
+    n_git = n_git_deps(n_deps)
+
+    for name in dep_names("dep", n_deps - n_git):
+        filename = f"{name}-1.0.0.tar.gz"
+        sdist = make_tarball(
+            {
+                f"{name}-1.0.0/PKG-INFO": f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0.0\n",
+                f"{name}-1.0.0/setup.py": f"from setuptools import setup\nsetup(name={name!r})\n",
+            }
+        )
+        sdist_url = registry.add(f"/pypi/packages/{filename}", sdist)
+        digest = hashlib.sha256(sdist).hexdigest()
+        page = f'<html><body><a href="{sdist_url}#sha256={digest}">{filename}</a></body></html>'
+        registry.add(f"/pypi/simple/{name}/", page.encode(), "text/html")
+        requirements.append(f"{name}==1.0.0")
+
+    for name in dep_names("vcs", n_git):
+        url, commit_id = git_daemon.create_repo(
+            f"bench/{name}", {"setup.py": f"from setuptools import setup\nsetup(name={name!r})\n"}
+        )
+        requirements.append(f"{name} @ {url}@{commit_id}")
+
+    files = {
+        "setup.py": "from setuptools import setup\nsetup(name='bench-app', version='1.0.0')\n",
+        "requirements.txt": "\n".join(requirements) + "\n",
+    }
+    init_git_repo(path, files)
+    git_daemon.publish(path, "bench/app")
+
+
+def make_npm_project(
+    path: Path, n_deps: int, registry: LocalRegistry, git_daemon: GitDaemon
+) -> None:
+    """Create an npm project with n_deps registry packages and ~1% git dependencies."""
+    dependencies = {}
+    lock_packages: dict[str, dict] = {}
+    n_git = n_git_deps(n_deps)
+
+    for name in dep_names("dep", n_deps - n_git):
+        package_json = json.dumps({"name": name, "version": "1.0.0"})
+        tarball = make_tarball({"package/package.json": package_json})
+        url = registry.add(f"/npm/{name}/-/{name}-1.0.0.tgz", tarball)
+        dependencies[name] = "^1.0.0"
+        lock_packages[f"node_modules/{name}"] = {
+            "version": "1.0.0",
+            "resolved": url,
+            "integrity": sri(tarball),
+        }
+
+    for name in dep_names("gitdep", n_git):
+        package_json = json.dumps({"name": name, "version": "1.0.0"})
+        url, commit_id = git_daemon.create_repo(f"bench/{name}", {"package.json": package_json})
+        dependencies[name] = f"{url}#{commit_id}"
+        lock_packages[f"node_modules/{name}"] = {
+            "version": "1.0.0",
+            "resolved": f"git+{url}#{commit_id}",
+        }
+
+    main_package = {"name": "bench-app", "version": "1.0.0", "dependencies": dependencies}
+    package_lock = {
+        "name": "bench-app",
+        "version": "1.0.0",
+        "lockfileVersion": 3,
+        "requires": True,
+        "packages": {"": main_package, **lock_packages},
+    }
+    files = {
+        "package.json": json.dumps(main_package, indent=2),
+        "package-lock.json": json.dumps(package_lock, indent=2),
+    }
+    init_git_repo(path, files)
+    git_daemon.publish(path, "bench/app")
+
+
+def make_gomod_project(
+    path: Path, n_deps: int, registry: LocalRegistry, git_daemon: GitDaemon
+) -> str:
+    """Create a Go module that imports n_deps modules from the GOPROXY, return the GOPROXY URL."""
+    goproxy = "/goproxy"
+    requires, imports, uses, go_sum = [], [], [], []
+
+    for name in dep_names("dep", n_deps):
+        module = f"bench.test/{name}"
+        go_mod = f"module {module}\n\ngo 1.21\n".encode()
+        source = f"package {name}\n\nfunc F() int {{ return 1 }}\n".encode()
+        zip_files = {f"{module}@v1.0.0/go.mod": go_mod, f"{module}@v1.0.0/{name}.go": source}
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            for name_in_zip, content in zip_files.items():
+                zf.writestr(name_in_zip, content)
+
+        prefix = f"{goproxy}/{module}/@v"
+        registry.add(f"{prefix}/list", b"v1.0.0\n", "text/plain")
+        registry.add(
+            f"{prefix}/v1.0.0.info",
+            json.dumps({"Version": "v1.0.0", "Time": "2024-01-01T00:00:00Z"}).encode(),
+            "application/json",
+        )
+        registry.add(f"{prefix}/v1.0.0.mod", go_mod, "text/plain")
+        registry.add(f"{prefix}/v1.0.0.zip", buffer.getvalue(), "application/zip")
+
+        requires.append(f"\t{module} v1.0.0\n")
+        imports.append(f'\t"{module}"\n')
+        uses.append(f"\t_ = {name}.F()\n")
+        go_sum.append(f"{module} v1.0.0 {go_hash(zip_files)}\n")
+        go_sum.append(f"{module} v1.0.0/go.mod {go_hash({'go.mod': go_mod})}\n")
+
+    files = {
+        "go.mod": f"module bench.test/app\n\ngo 1.21\n\nrequire (\n{''.join(requires)})\n",
+        "go.sum": "".join(go_sum),
+        "main.go": (
+            f"package main\n\nimport (\n{''.join(imports)})\n\n"
+            f"func main() {{\n{''.join(uses)}}}\n"
+        ),
+    }
+    init_git_repo(path, files)
+    git_daemon.publish(path, "bench/app")
+    return registry.url + goproxy
+
+
+def make_yarn_project(
+    path: Path, n_deps: int, registry: LocalRegistry, yarn_path: Path, ca_file: Path
+) -> None:
+    """Create a yarn project with n_deps packages from the (HTTPS) registry.
+
+    The yarn.lock file is generated by yarn itself, the checksums in it cannot be computed
+    without yarn.
+    """
+    dependencies = {}
+    for name in dep_names("dep", n_deps):
+        package_json = json.dumps({"name": name, "version": "1.0.0"})
+        tarball = make_tarball({"package/package.json": package_json})
+        tarball_url = registry.add(f"/{name}/-/{name}-1.0.0.tgz", tarball)
+        dist = {
+            "tarball": tarball_url,
+            "shasum": hashlib.sha1(tarball, usedforsecurity=False).hexdigest(),
+            "integrity": sri(tarball),
+        }
+        packument = {
+            "name": name,
+            "dist-tags": {"latest": "1.0.0"},
+            "versions": {"1.0.0": {"name": name, "version": "1.0.0", "dist": dist}},
+        }
+        registry.add(f"/{name}", json.dumps(packument).encode(), "application/json")
+        dependencies[name] = "1.0.0"
+
+    release = Path(".yarn", "releases", yarn_path.name)
+    path.joinpath(release).parent.mkdir(parents=True)
+    shutil.copy(yarn_path, path / release)
+
+    files = {
+        "package.json": json.dumps(
+            {"name": "bench-app", "version": "1.0.0", "dependencies": dependencies}, indent=2
+        ),
+        ".yarnrc.yml": (
+            f"yarnPath: {release}\n"
+            f"npmRegistryServer: {registry.url}\n"
+            f"httpsCaFilePath: {ca_file}\n"
+            "enableTelemetry: false\n"
+        ),
+        ".gitignore": ".yarn/cache\n.yarn/install-state.gz\n.pnp.*\n",
+    }
+    for relpath, content in files.items():
+        path.joinpath(relpath).write_text(content)
+
+    yarn_global_folder = path.parent / "yarn-global"
+    env = os.environ | {
+        "YARN_ENABLE_GLOBAL_CACHE": "true",
+        "YARN_GLOBAL_FOLDER": str(yarn_global_folder),
+    }
+    subprocess.run(
+        ["node", str(path / release), "install", "--mode=update-lockfile"],
+        cwd=path,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    init_git_repo(path, {}, origin_url="https://example.org/bench/app.git")
+
+
+@dataclass
+class BenchmarkResult:
+    """The measurements of a single benchmark run."""
+
+    name: str
+    n_deps: int
+    seconds: float
+    output_bytes: int
+    max_rss_mb: float
+    children_max_rss_mb: float
+
+    @property
+    def deps_per_second(self) -> float:
+        return self.n_deps / self.seconds
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.output_bytes / 1024 / 1024 / self.seconds
+
+    def as_dict(self) -> dict:
+        return asdict(self) | {
+            "deps_per_second": self.deps_per_second,
+            "mb_per_second": self.mb_per_second,
+        }
+
+    def format_row(self) -> str:
+        return (
+            f"{self.name:<8} {self.n_deps:>7} {self.seconds:>9.2f} {self.deps_per_second:>9.1f} "
+            f"{self.mb_per_second:>8.2f} {self.max_rss_mb:>9.1f} {self.children_max_rss_mb:>12.1f}"
+        )
+
+    HEADER = (
+        f"{'name':<8} {'deps':>7} {'seconds':>9} {'deps/s':>9} "
+        f"{'MB/s':>8} {'RSS (MB)':>9} {'child RSS':>12}"
+    )
+
+
+BENCHMARK_RESULTS: list[BenchmarkResult] = []
+
+
+def run_benchmark(
+    name: str, n_deps: int, fetch: Callable[[Request], Any], request: Request
+) -> None:
+    """Run the fetch function end to end, record the measurements for the summary."""
+    start = time.perf_counter()
+    fetch(request)
+    seconds = time.perf_counter() - start
+
+    max_rss, children_max_rss = max_rss_mb()
+    result = BenchmarkResult(
+        name=name,
+        n_deps=n_deps,
+        seconds=seconds,
+        output_bytes=directory_size(request.output_dir.path),
+        max_rss_mb=max_rss,
+        children_max_rss_mb=children_max_rss,
+    )
+    log.info("%s\n%s", BenchmarkResult.HEADER, result.format_row())
+    BENCHMARK_RESULTS.append(result)
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in _iter_files(path))
+
+
+def _iter_files(path: Path) -> Iterator[Path]:
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            yield Path(dirpath, filename)
+
+
+def max_rss_mb() -> tuple[float, float]:
+    """Get the peak RSS of this process and of its largest child process so far, in MB."""
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return self_usage.ru_maxrss / 1024, children_usage.ru_maxrss / 1024
@@ -1,5 +1,6 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import asyncio
+import hashlib
 import random
 from os import PathLike
 from pathlib import Path
@@ -12,8 +13,10 @@ import pytest
 import requests
 from requests.auth import AuthBase, HTTPBasicAuth
 
+from cachi2.core.artifact_cache import ArtifactCache
+from cachi2.core.checksum import ChecksumInfo
 from cachi2.core.config import get_config
-from cachi2.core.errors import FetchError
+from cachi2.core.errors import FetchError, PackageRejected
 from cachi2.core.package_managers import general
 from cachi2.core.package_managers.general import (
     _async_download_binary_file,
@@ -174,7 +177,54 @@ async def test_async_download_binary_file(tmp_path: Path, caplog: pytest.LogCapt
         assert f.read() == b"first_chunk-second_chunk-"
 
     assert session.get.called
-    assert session.get.call_args == mock.call(url, auth=None, raise_for_status=True)
+    assert session.get.call_args == mock.call(url, auth=None, raise_for_status=True, ssl=True)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("checksum_matches", [True, False])
+async def test_async_download_binary_file_verifies_checksums(
+    checksum_matches: bool, tmp_path: Path
+) -> None:
+    url = "http://example.com/file.tar"
+    download_path = tmp_path / "file.tar"
+    # sha256 of b"content"
+    digest = "ed7002b439e9ac845f22357d822bac1444730fbdb6016d3ec9432297b9ec9f73"
+    checksums = [ChecksumInfo("sha256", digest if checksum_matches else "a" * 64)]
+
+    response, session = MagicMock(), MagicMock()
+    response.content.read = mock.AsyncMock(side_effect=[b"con", b"tent", b""])
+    session.get().__aenter__.return_value = response
+
+    if checksum_matches:
+        await _async_download_binary_file(session, url, download_path, checksums=checksums)
+        assert download_path.read_bytes() == b"content"
+    else:
+        with pytest.raises(PackageRejected, match="Failed to verify file.tar"):
+            await _async_download_binary_file(session, url, download_path, checksums=checksums)
+        assert not download_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_async_download_binary_file_hash_algorithms(tmp_path: Path) -> None:
+    download_path = tmp_path / "file.tar"
+    checksums = [ChecksumInfo("sha512", hashlib.sha512(b"content").hexdigest())]
+
+    response, session = MagicMock(), MagicMock()
+    response.content.read = mock.AsyncMock(side_effect=[b"con", b"tent", b""])
+    session.get().__aenter__.return_value = response
+
+    digests = await _async_download_binary_file(
+        session,
+        "http://example.com/file.tar",
+        download_path,
+        checksums=checksums,
+        hash_algorithms=["sha256"],
+    )
+
+    assert digests == {
+        "sha256": hashlib.sha256(b"content").hexdigest(),
+        "sha512": hashlib.sha512(b"content").hexdigest(),
+    }
 
 
 @pytest.mark.asyncio
@@ -240,6 +290,189 @@ async def test_async_download_files(
         assert file, path in files_to_download.items()
 
 
+@pytest.mark.asyncio
+@mock.patch("cachi2.core.package_managers.general.get_artifact_cache")
+@mock.patch("cachi2.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_uses_artifact_cache(
+    mock_download_file: MagicMock, mock_get_artifact_cache: MagicMock, tmp_path: Path
+) -> None:
+    artifact_cache = mock_get_artifact_cache.return_value
+    # file1 is cached, file2 is not
+    artifact_cache.materialize.side_effect = lambda url, path, checksums: url == "file1"
+
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        "file1": tmp_path / "path1",
+        "file2": tmp_path / "path2",
+    }
+    await async_download_files(files_to_download, 2)
+
+    assert mock_download_file.call_count == 1
+    assert mock_download_file.call_args.args[1:] == ("file2", tmp_path / "path2")
+    # the checksum needed by the cache is computed while downloading
+    assert mock_download_file.call_args.kwargs["hash_algorithms"] == ["sha256"]
+    artifact_cache.store.assert_called_once_with(
+        "file2", tmp_path / "path2", (), mock_download_file.return_value
+    )
+
+
+@pytest.mark.asyncio
+@mock.patch("cachi2.core.package_managers.general.get_artifact_cache")
+@mock.patch("cachi2.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_cache_mismatch(
+    mock_download_file: MagicMock, mock_get_artifact_cache: MagicMock, tmp_path: Path
+) -> None:
+    artifact_cache = ArtifactCache(tmp_path / "cache")
+    mock_get_artifact_cache.return_value = artifact_cache
+
+    # the content behind the URL changed since it was cached
+    old_file = tmp_path / "old"
+    old_file.write_bytes(b"old content")
+    artifact_cache.store("file1", old_file)
+    old_blob = artifact_cache.lookup("file1")
+
+    async def download_file(session: Any, url: str, download_path: Path, **kwargs: Any) -> None:
+        download_path.write_bytes(b"content")
+
+    mock_download_file.side_effect = download_file
+    # sha256 of b"content"
+    checksum = ChecksumInfo(
+        "sha256", "ed7002b439e9ac845f22357d822bac1444730fbdb6016d3ec9432297b9ec9f73"
+    )
+
+    download_path = tmp_path / "path1"
+    await async_download_files({"file1": download_path}, 1, checksums={"file1": [checksum]})
+
+    assert download_path.read_bytes() == b"content"
+    assert mock_download_file.call_count == 1
+    # the old content in the cache was not overwritten, the new content replaces it in the index
+    assert old_blob is not None and old_blob.read_bytes() == b"old content"
+    new_blob = artifact_cache.lookup("file1")
+    assert new_blob is not None and new_blob.read_bytes() == b"content"
+
+    # the next time, the file is found in the cache by its checksum
+    download_path.unlink()
+    artifact_cache.forget("file1")
+    await async_download_files({"file1": download_path}, 1, checksums={"file1": [checksum]})
+
+    assert download_path.read_bytes() == b"content"
+    assert mock_download_file.call_count == 1
+
+
+@pytest.mark.asyncio
+@mock.patch("cachi2.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_on_download(
+    mock_download_file: MagicMock, tmp_path: Path
+) -> None:
+    downloaded = []
+
+    def on_download(url: str, download_path: Path) -> None:
+        # the file must already be downloaded when the callback runs
+        expect_call = mock.call(
+            mock.ANY, url, download_path, checksums=(), insecure=mock.ANY, hash_algorithms=()
+        )
+        assert expect_call in mock_download_file.mock_calls
+        downloaded.append(url)
+
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        "file1": tmp_path / "path1",
+        "file2": tmp_path / "path2",
+    }
+    await async_download_files(
+        files_to_download, 2, insecure_urls={"file2"}, on_download=on_download
+    )
+
+    assert sorted(downloaded) == ["file1", "file2"]
+    assert [call.kwargs["insecure"] for call in mock_download_file.mock_calls] == [False, True]
+
+
+@pytest.mark.asyncio
+@mock.patch("cachi2.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_on_failure(
+    mock_download_file: MagicMock, tmp_path: Path
+) -> None:
+    async def download_file(session: Any, url: str, download_path: Path, **kwargs: Any) -> None:
+        if url == "file1":
+            raise FetchError("404 Not Found")
+        download_path.write_text(url)
+
+    mock_download_file.side_effect = download_file
+    failures = []
+    downloaded = []
+
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        "file1": tmp_path / "path1",
+        "file2": tmp_path / "path2",
+        "file3": tmp_path / "path3",
+    }
+    await async_download_files(
+        files_to_download,
+        1,
+        on_download=lambda url, path: downloaded.append(url),
+        on_failure=lambda url, error: failures.append((url, str(error))),
+    )
+
+    # the failure does not stop the other downloads
+    assert failures == [("file1", "404 Not Found")]
+    assert sorted(downloaded) == ["file2", "file3"]
+
+
+@pytest.mark.asyncio
+@mock.patch("cachi2.core.package_managers.general.get_artifact_cache")
+@mock.patch("cachi2.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_on_download_moves_file(
+    mock_download_file: MagicMock, mock_get_artifact_cache: MagicMock, tmp_path: Path
+) -> None:
+    artifact_cache = ArtifactCache(tmp_path / "cache")
+    mock_get_artifact_cache.return_value = artifact_cache
+
+    async def download_file(session: Any, url: str, download_path: Path, **kwargs: Any) -> None:
+        download_path.write_text("content")
+
+    def on_download(url: str, download_path: Path) -> None:
+        download_path.rename(target_path)
+
+    mock_download_file.side_effect = download_file
+    target_path = tmp_path / "target"
+
+    await async_download_files({"file1": tmp_path / "path1"}, 1, on_download=on_download)
+
+    assert target_path.read_text() == "content"
+    # the file was stored in the cache before on_download moved it away
+    blob = artifact_cache.lookup("file1")
+    assert blob is not None and blob.read_text() == "content"
+
+
+@pytest.mark.asyncio
+@mock.patch("cachi2.core.package_managers.general.get_artifact_cache")
+@mock.patch("cachi2.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_on_download_error_forgets_file(
+    mock_download_file: MagicMock, mock_get_artifact_cache: MagicMock, tmp_path: Path
+) -> None:
+    artifact_cache = ArtifactCache(tmp_path / "cache")
+    mock_get_artifact_cache.return_value = artifact_cache
+
+    async def download_file(session: Any, url: str, download_path: Path, **kwargs: Any) -> None:
+        download_path.write_text("bad content")
+
+    def on_download(url: str, download_path: Path) -> None:
+        raise PackageRejected("checksum mismatch", solution=None)
+
+    mock_download_file.side_effect = download_file
+    checksum = ChecksumInfo("sha512", hashlib.sha512(b"bad content").hexdigest())
+
+    with pytest.raises(PackageRejected):
+        await async_download_files(
+            {"file1": tmp_path / "path1"},
+            1,
+            checksums={"file1": [checksum]},
+            on_download=on_download,
+        )
+
+    # neither by the URL nor by the checksum
+    assert artifact_cache.lookup("file1") is None
+    assert artifact_cache.lookup_checksums([checksum]) is None
+
+
 @pytest.mark.asyncio
 async def test_async_download_files_exception(
     tmp_path: Path, caplog: pytest.LogCaptureFixture
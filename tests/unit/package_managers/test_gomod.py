@@ -1,9 +1,15 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import base64
+import hashlib
+import io
 import json
 import os
 import re
+import shutil
 import subprocess
 import textwrap
+import threading
+import zipfile
 from pathlib import Path
 from textwrap import dedent
 from typing import Any, Iterator, Optional, Union
@@ -19,6 +25,7 @@ from cachi2.core.models.sbom import Component, Property
 from cachi2.core.package_managers import gomod
 from cachi2.core.package_managers.gomod import (
     Go,
+    GoModuleCache,
     Module,
     ModuleID,
     ModuleVersionResolver,
@@ -30,8 +37,13 @@ from cachi2.core.package_managers.gomod import (
     _create_modules_from_parsed_data,
     _create_packages_from_parsed_data,
     _deduplicate_resolved_modules,
+    _download_modules_from_go_sum,
+    _escape_module_path,
+    _find_symlinks,
     _get_gomod_version,
     _get_repository_name,
+    _hash_go_mod,
+    _hash_zip,
     _parse_go_sum,
     _parse_vendor,
     _resolve_gomod,
@@ -40,7 +52,9 @@ from cachi2.core.package_managers.gomod import (
     _vendor_changed,
     _vendor_deps,
     fetch_gomod_source,
+    plan_gomod_source,
 )
+from cachi2.core.plan import PlannedArtifact
 from cachi2.core.rooted_path import PathOutsideRoot, RootedPath
 from tests.common_utils import write_file_tree
 
@@ -109,6 +123,43 @@ def proc_mock(
     return subprocess.CompletedProcess(args, returncode=returncode, stdout=stdout)
 
 
+def mock_go_commands(
+    mock_run: mock.Mock, mock_popen: mock.Mock, procs: list[subprocess.CompletedProcess]
+) -> mock.Mock:
+    """Make subprocess.run and subprocess.Popen return the mocked processes.
+
+    Commands with JSON output are streamed via subprocess.Popen, the other ones use subprocess.run.
+    Some commands run concurrently, so each command gets the first remaining process whose args
+    end with the same argument (e.g. "all" for "go list -deps -json all").
+
+    Return a mock that records the calls of both, in the order they were made.
+    """
+    remaining_procs = list(procs)
+    go_calls = mock.Mock()
+    lock = threading.Lock()
+
+    def get_proc(cmd: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
+        with lock:
+            go_calls(cmd, **kwargs)
+            for proc in remaining_procs:
+                if str(proc.args).split()[-1] == cmd[-1]:
+                    remaining_procs.remove(proc)
+                    return proc
+        raise AssertionError(f"unexpected command: {cmd}")
+
+    def popen(cmd: list[str], **kwargs: Any) -> mock.MagicMock:
+        proc = get_proc(cmd, **kwargs)
+        popen_mock = mock.MagicMock()
+        popen_mock.__enter__.return_value = popen_mock
+        popen_mock.stdout = io.StringIO(proc.stdout or "")
+        popen_mock.wait.return_value = proc.returncode
+        return popen_mock
+
+    mock_run.side_effect = get_proc
+    mock_popen.side_effect = popen
+    return go_calls
+
+
 def get_mocked_data(data_dir: Path, filepath: Union[str, Path]) -> str:
     return data_dir.joinpath("gomod-mocks", filepath).read_text()
 
@@ -133,7 +184,9 @@ def _parse_mocked_data(data_dir: Path, file_path: str) -> ResolvedGoModule:
 @mock.patch("cachi2.core.package_managers.gomod.ModuleVersionResolver")
 @mock.patch("cachi2.core.package_managers.gomod._validate_local_replacements")
 @mock.patch("subprocess.run")
+@mock.patch("subprocess.Popen")
 def test_resolve_gomod(
+    mock_popen: mock.Mock,
     mock_run: mock.Mock,
     mock_validate_local_replacements: mock.Mock,
     mock_version_resolver: mock.Mock,
@@ -145,7 +198,7 @@ def test_resolve_gomod(
     data_dir: Path,
     gomod_request: Request,
 ) -> None:
-    # Mock the "subprocess.run" calls
+    # Mock the go commands
     run_side_effects = []
     run_side_effects.append(
         proc_mock(
@@ -177,7 +230,7 @@ def test_resolve_gomod(
             stdout=get_mocked_data(data_dir, "non-vendored/go_list_deps_threedot.json"),
         )
     )
-    mock_run.side_effect = run_side_effects
+    go_calls = mock_go_commands(mock_run, mock_popen, run_side_effects)
 
     mock_version_resolver.get_golang_version.return_value = "v0.1.0"
     mock_go_release.return_value = "go0.1.0"
@@ -200,7 +253,7 @@ def test_resolve_gomod(
     resolve_result = _resolve_gomod(module_dir, gomod_request, tmp_path, mock_version_resolver)
 
     if force_gomod_tidy:
-        assert mock_run.call_args_list[1][0][0] == [GO_CMD_PATH, "mod", "tidy"]
+        assert go_calls.call_args_list[1][0][0] == [GO_CMD_PATH, "mod", "tidy"]
 
     # when not vendoring, go list should be called with -mod readonly
     listdeps_cmd = [
@@ -212,10 +265,11 @@ def test_resolve_gomod(
         "-deps",
         "-json=ImportPath,Module,Standard,Deps",
     ]
-    assert mock_run.call_args_list[-2][0][0] == [*listdeps_cmd, "all"]
-    assert mock_run.call_args_list[-1][0][0] == [*listdeps_cmd, "./..."]
+    go_cmds = [call.args[0] for call in go_calls.call_args_list]
+    assert [*listdeps_cmd, "all"] in go_cmds
+    assert [*listdeps_cmd, "./..."] in go_cmds
 
-    for call in mock_run.call_args_list:
+    for call in go_calls.call_args_list:
         env = call.kwargs["env"]
         if cgo_disable:
             assert env["CGO_ENABLED"] == "0"
@@ -240,7 +294,9 @@ def test_resolve_gomod(
 @mock.patch("cachi2.core.package_managers.gomod.ModuleVersionResolver")
 @mock.patch("cachi2.core.package_managers.gomod._validate_local_replacements")
 @mock.patch("subprocess.run")
+@mock.patch("subprocess.Popen")
 def test_resolve_gomod_vendor_dependencies(
+    mock_popen: mock.Mock,
     mock_run: mock.Mock,
     mock_validate_local_replacements: mock.Mock,
     mock_version_resolver: mock.Mock,
@@ -251,7 +307,7 @@ def test_resolve_gomod_vendor_dependencies(
     data_dir: Path,
     gomod_request: Request,
 ) -> None:
-    # Mock the "subprocess.run" calls
+    # Mock the go commands
     run_side_effects = []
     run_side_effects.append(proc_mock("go mod vendor", returncode=0, stdout=None))
     if force_gomod_tidy:
@@ -277,7 +333,7 @@ def test_resolve_gomod_vendor_dependencies(
             stdout=get_mocked_data(data_dir, "vendored/go_list_deps_threedot.json"),
         )
     )
-    mock_run.side_effect = run_side_effects
+    go_calls = mock_go_commands(mock_run, mock_popen, run_side_effects)
 
     mock_version_resolver.get_golang_version.return_value = "v0.1.0"
     mock_go_release.return_value = "go0.1.0"
@@ -300,16 +356,17 @@ def test_resolve_gomod_vendor_dependencies(
 
     resolve_result = _resolve_gomod(module_dir, gomod_request, tmp_path, mock_version_resolver)
 
-    assert mock_run.call_args_list[0][0][0] == [GO_CMD_PATH, "mod", "vendor"]
+    assert go_calls.call_args_list[0][0][0] == [GO_CMD_PATH, "mod", "vendor"]
     # when vendoring, go list should be called without -mod readonly
-    assert mock_run.call_args_list[-2][0][0] == [
+    go_cmds = [call.args[0] for call in go_calls.call_args_list]
+    assert [
         GO_CMD_PATH,
         "list",
         "-e",
         "-deps",
         "-json=ImportPath,Module,Standard,Deps",
         "all",
-    ]
+    ] in go_cmds
 
     expect_result = _parse_mocked_data(data_dir, "expected-results/resolve_gomod_vendored.json")
 
@@ -346,7 +403,9 @@ def test_resolve_gomod_vendor_without_flag(
 @mock.patch("cachi2.core.package_managers.gomod._get_gomod_version")
 @mock.patch("cachi2.core.package_managers.gomod.ModuleVersionResolver")
 @mock.patch("subprocess.run")
+@mock.patch("subprocess.Popen")
 def test_resolve_gomod_no_deps(
+    mock_popen: mock.Mock,
     mock_run: mock.Mock,
     mock_version_resolver: mock.Mock,
     mock_get_gomod_version: mock.Mock,
@@ -367,7 +426,7 @@ def test_resolve_gomod_no_deps(
         """
     )
 
-    # Mock the "subprocess.run" calls
+    # Mock the go commands
     run_side_effects = []
     run_side_effects.append(proc_mock("go mod download -json", returncode=0, stdout=""))
     if force_gomod_tidy:
@@ -389,7 +448,7 @@ def test_resolve_gomod_no_deps(
             "go list -e -mod readonly -deps -json ./...", returncode=0, stdout=mock_pkg_deps_no_deps
         )
     )
-    mock_run.side_effect = run_side_effects
+    mock_go_commands(mock_run, mock_popen, run_side_effects)
 
     mock_version_resolver.get_golang_version.return_value = "v2.1.1"
     mock_go_release.return_value = "go2.1.0"
@@ -447,6 +506,29 @@ def test_resolve_gomod_suspicious_symlinks(symlinked_file: str, gomod_request: R
     assert "Found a potentially harmful symlink" in e.friendly_msg()
 
 
+def test_find_symlinks(tmp_path: Path) -> None:
+    write_file_tree(
+        {
+            "main.go": "",
+            "pkg": {"foo.go": "", "nested": {"bar.go": ""}},
+            "vendor": {"github.com": {"foo": {"baz.go": ""}}},
+        },
+        tmp_path,
+    )
+    tmp_path.joinpath("pkg/nested/link.go").symlink_to("bar.go")
+    tmp_path.joinpath("vendor/github.com/foo/outside.go").symlink_to("/foo")
+    tmp_path.joinpath("README.md").symlink_to("/foo")
+    # symlinked directories are not followed
+    tmp_path.joinpath("pkg-link").symlink_to("pkg")
+
+    symlinks = _find_symlinks(tmp_path, suffix=".go")
+
+    assert sorted(symlinks) == [
+        tmp_path / "pkg/nested/link.go",
+        tmp_path / "vendor/github.com/foo/outside.go",
+    ]
+
+
 @pytest.mark.parametrize(
     "go_sum_content, expect_modules",
     [
@@ -785,7 +867,9 @@ def test_package_to_component(package: Package, expected_component: Component) -
 @mock.patch("cachi2.core.package_managers.gomod._get_gomod_version")
 @mock.patch("cachi2.core.package_managers.gomod.get_config")
 @mock.patch("subprocess.run")
+@mock.patch("subprocess.Popen")
 def test_go_list_cmd_failure(
+    mock_popen: mock.Mock,
     mock_run: mock.Mock,
     mock_config: mock.Mock,
     mock_get_gomod_version: mock.Mock,
@@ -799,18 +883,24 @@ def test_go_list_cmd_failure(
     version_resolver = mock.Mock()
 
     mock_config.return_value.gomod_download_max_tries = 1
+    mock_config.return_value.gomod_native_download = False
+    mock_config.return_value.use_gomod_cache = False
     mock_go_release.return_value = "go0.1.0"
     mock_get_gomod_version.return_value = "0.1.1"
 
-    # Mock the "subprocess.run" calls
-    mock_run.side_effect = [
-        proc_mock("go mod download", returncode=go_mod_rc, stdout=""),
-        proc_mock(
-            "go list -e -mod readonly -m",
-            returncode=go_list_rc,
-            stdout="",
-        ),
-    ]
+    # Mock the go commands
+    mock_go_commands(
+        mock_run,
+        mock_popen,
+        [
+            proc_mock("go mod download -json", returncode=go_mod_rc, stdout=""),
+            proc_mock(
+                "go list -e -mod readonly -m",
+                returncode=go_list_rc,
+                stdout="",
+            ),
+        ],
+    )
 
     expect_error = "Go execution failed: "
     if go_mod_rc == 0:
@@ -1041,6 +1131,290 @@ def test_invalid_local_replacements(tmpdir: Path) -> None:
         _validate_local_replacements(modules, app_path)
 
 
+def test_escape_module_path() -> None:
+    assert _escape_module_path("github.com/Azure/go-autorest") == "github.com/!azure/go-autorest"
+    assert _escape_module_path("v1.0.0-RC1") == "v1.0.0-!r!c1"
+
+
+def test_hash_go_mod(tmp_path: Path) -> None:
+    go_mod = tmp_path / "go.mod"
+    go_mod.write_text("module golang.org/x/text\n")
+    # golang.org/x/text v0.3.0/go.mod h1:NqM8EUOU14njkJ3fqMW+pc6Ldnwhi/IjpwHt7yyuwOQ=
+    assert _hash_go_mod(go_mod) == "h1:NqM8EUOU14njkJ3fqMW+pc6Ldnwhi/IjpwHt7yyuwOQ="
+
+
+def test_hash_zip(tmp_path: Path) -> None:
+    module_zip = tmp_path / "v1.0.0.zip"
+    with zipfile.ZipFile(module_zip, "w") as z:
+        z.writestr("example.com/foo@v1.0.0/go.mod", "module example.com/foo\n")
+        z.writestr("example.com/foo@v1.0.0/foo.go", "package foo\n")
+
+    foo_go_hash = hashlib.sha256(b"package foo\n").hexdigest()
+    go_mod_hash = hashlib.sha256(b"module example.com/foo\n").hexdigest()
+    # the files are sorted by name
+    summary = (
+        f"{foo_go_hash}  example.com/foo@v1.0.0/foo.go\n"
+        f"{go_mod_hash}  example.com/foo@v1.0.0/go.mod\n"
+    )
+    expected_hash = base64.b64encode(hashlib.sha256(summary.encode()).digest()).decode()
+
+    assert _hash_zip(module_zip) == f"h1:{expected_hash}"
+
+
+@pytest.mark.parametrize("zip_matches", [True, False])
+@mock.patch("cachi2.core.package_managers.gomod.get_config")
+@mock.patch("cachi2.core.package_managers.gomod.async_download_files")
+def test_download_modules_from_go_sum(
+    mock_async_download_files: mock.Mock,
+    mock_get_config: mock.Mock,
+    zip_matches: bool,
+    rooted_tmp_path: RootedPath,
+    tmp_path: Path,
+) -> None:
+    mock_get_config.return_value.use_gomod_cache = False
+
+    # prepare the content "served" by the proxy
+    proxy_files = tmp_path / "proxy"
+    proxy_files.mkdir()
+    proxy_files.joinpath("foo.mod").write_text("module github.com/Foo/foo\n")
+    proxy_files.joinpath("foo.info").write_text('{"Version":"v1.0.0"}')
+    with zipfile.ZipFile(proxy_files / "foo.zip", "w") as z:
+        z.writestr("github.com/!foo/foo@v1.0.0/go.mod", "module github.com/Foo/foo\n")
+    zip_hash = _hash_zip(proxy_files / "foo.zip") if zip_matches else "h1:wrong"
+    mod_hash = _hash_go_mod(proxy_files / "foo.mod")
+
+    go_sum_lines = [
+        f"github.com/Foo/foo v1.0.0 {zip_hash}",
+        f"github.com/Foo/foo v1.0.0/go.mod {mod_hash}",
+    ]
+    rooted_tmp_path.join_within_root("go.sum").path.write_text("\n".join(go_sum_lines))
+
+    def mock_download(files: dict[str, Path], *args: Any, on_download: Any, **kwargs: Any) -> None:
+        for url, download_path in files.items():
+            suffix = Path(url).suffix
+            shutil.copy(proxy_files / f"foo{suffix}", download_path)
+            on_download(url, download_path)
+
+    mock_async_download_files.side_effect = mock_download
+
+    download_dir = tmp_path / "pkg/mod/cache/download"
+    version_dir = download_dir / "github.com/!foo/foo/@v"
+
+    if zip_matches:
+        _download_modules_from_go_sum(rooted_tmp_path, download_dir, "https://proxy,direct")
+
+        assert sorted(path.name for path in version_dir.iterdir()) == [
+            "v1.0.0.info",
+            "v1.0.0.mod",
+            "v1.0.0.zip",
+            "v1.0.0.ziphash",
+        ]
+        assert version_dir.joinpath("v1.0.0.ziphash").read_text() == zip_hash
+    else:
+        with pytest.raises(PackageRejected, match="checksum mismatch"):
+            _download_modules_from_go_sum(rooted_tmp_path, download_dir, "https://proxy,direct")
+
+        assert not version_dir.joinpath("v1.0.0.zip").exists()
+
+    urls = mock_async_download_files.call_args.args[0].keys()
+    assert sorted(urls) == [
+        "https://proxy/github.com/!foo/foo/@v/v1.0.0.info",
+        "https://proxy/github.com/!foo/foo/@v/v1.0.0.mod",
+        "https://proxy/github.com/!foo/foo/@v/v1.0.0.zip",
+    ]
+    # the staging directory is removed
+    assert [path.name for path in download_dir.iterdir()] == ["github.com"]
+
+
+@mock.patch("cachi2.core.package_managers.gomod.get_config")
+@mock.patch("cachi2.core.package_managers.gomod.async_download_files")
+def test_download_modules_from_go_sum_with_failures(
+    mock_async_download_files: mock.Mock,
+    mock_get_config: mock.Mock,
+    rooted_tmp_path: RootedPath,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    mock_get_config.return_value.use_gomod_cache = False
+    rooted_tmp_path.join_within_root("go.sum").path.write_text(
+        "example.com/private v1.0.0/go.mod h1:private\n"
+        "example.com/public v1.0.0/go.mod h1:public\n"
+    )
+
+    def mock_download(
+        files: dict[str, Path], *args: Any, on_download: Any, on_failure: Any
+    ) -> None:
+        for url in files:
+            # e.g. a private module that is not available from the proxy
+            on_failure(url, FetchError("404 Not Found"))
+
+    mock_async_download_files.side_effect = mock_download
+
+    _download_modules_from_go_sum(rooted_tmp_path, tmp_path / "download", "https://proxy,direct")
+
+    assert (
+        "Failed to download 2 module(s), the go command will retry: "
+        "example.com/private@v1.0.0, example.com/public@v1.0.0"
+    ) in caplog.text
+
+
+@mock.patch("cachi2.core.package_managers.gomod.async_download_files")
+def test_download_modules_from_go_sum_without_http_proxy(
+    mock_async_download_files: mock.Mock, rooted_tmp_path: RootedPath, tmp_path: Path
+) -> None:
+    _download_modules_from_go_sum(rooted_tmp_path, tmp_path, "direct")
+    mock_async_download_files.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "goproxy_url, expect_urls",
+    [
+        (
+            "https://proxy.example.org/,direct",
+            [
+                "https://proxy.example.org/github.com/!foo/foo/@v/v1.0.0.zip",
+                "https://proxy.example.org/golang.org/x/bar/@v/v0.1.0.zip",
+            ],
+        ),
+        ("direct", [None, None]),
+    ],
+)
+@mock.patch("cachi2.core.package_managers.gomod._get_module_cache")
+@mock.patch("cachi2.core.package_managers.gomod.get_config")
+def test_plan_gomod_source(
+    mock_get_config: mock.Mock,
+    mock_get_module_cache: mock.Mock,
+    goproxy_url: str,
+    expect_urls: list[Optional[str]],
+    rooted_tmp_path: RootedPath,
+    tmp_path: Path,
+) -> None:
+    mock_get_config.return_value.goproxy_url = goproxy_url
+    cache = GoModuleCache(tmp_path / "cache", max_size=2**30)
+    mock_get_module_cache.return_value = cache
+
+    cached_zip = cache.root / "golang.org/x/bar/@v/v0.1.0.zip"
+    cached_zip.parent.mkdir(parents=True)
+    cached_zip.write_bytes(b"x" * 10)
+
+    go_sum_lines = [
+        "golang.org/x/bar v0.1.0 h1:bar",
+        "golang.org/x/bar v0.1.0/go.mod h1:barmod",
+        "github.com/Foo/foo v1.0.0 h1:foo",
+        "github.com/Foo/foo v1.0.0/go.mod h1:foomod",
+        # only the go.mod file is needed, nothing to download
+        "github.com/Foo/baz v2.0.0/go.mod h1:bazmod",
+    ]
+    rooted_tmp_path.join_within_root("go.sum").path.write_text("\n".join(go_sum_lines))
+    request = Request(
+        source_dir=rooted_tmp_path,
+        output_dir=rooted_tmp_path.join_within_root("output"),
+        packages=[{"type": "gomod"}],
+    )
+
+    assert plan_gomod_source(request) == [
+        PlannedArtifact(
+            package_manager="gomod",
+            name="github.com/Foo/foo",
+            version="v1.0.0",
+            kind="download",
+            url=expect_urls[0],
+        ),
+        PlannedArtifact(
+            package_manager="gomod",
+            name="golang.org/x/bar",
+            version="v0.1.0",
+            kind="download",
+            url=expect_urls[1],
+            size=10,
+            cached=True,
+        ),
+    ]
+
+
+def test_go_module_cache_validate(tmp_path: Path) -> None:
+    cache = GoModuleCache(tmp_path / "cache", max_size=2**30)
+    version_dir = cache.root / "github.com/!azure/foo/@v"
+    version_dir.mkdir(parents=True)
+    write_file_tree(
+        {
+            "v1.0.0.mod": "module github.com/Azure/foo\n",
+            "v1.0.0.zip": "good zip",
+            "v1.0.0.ziphash": "h1:good",
+            "v2.0.0.mod": "module github.com/Azure/foo\n",
+            "v2.0.0.zip": "tampered zip",
+            "v2.0.0.ziphash": "h1:tampered",
+        },
+        version_dir,
+    )
+    go_mod_hash = _hash_go_mod(version_dir / "v1.0.0.mod")
+
+    go_sum = tmp_path / "go.sum"
+    go_sum.write_text(
+        dedent(
+            f"""
+            github.com/Azure/foo v1.0.0 h1:good
+            github.com/Azure/foo v1.0.0/go.mod {go_mod_hash}
+            github.com/Azure/foo v2.0.0 h1:expected
+            github.com/Azure/foo v2.0.0/go.mod {go_mod_hash}
+            github.com/not/cached v1.0.0 h1:whatever
+            """
+        )
+    )
+
+    cache.validate(go_sum)
+
+    assert sorted(path.name for path in version_dir.iterdir()) == [
+        "v1.0.0.mod",
+        "v1.0.0.zip",
+        "v1.0.0.ziphash",
+    ]
+
+
+def test_go_module_cache_store_and_evict(tmp_path: Path) -> None:
+    download_dir = tmp_path / "download"
+    download_dir.joinpath("github.com/foo/bar/@v").mkdir(parents=True)
+    download_dir.joinpath("sumdb/sum.golang.org").mkdir(parents=True)
+    write_file_tree(
+        {
+            "list": "v1.0.0\n",
+            "v1.0.0.info": "{}",
+            "v1.0.0.mod": "module github.com/foo/bar\n",
+            "v1.0.0.zip": "x" * 100,
+            "v1.0.0.lock": "",
+        },
+        download_dir / "github.com/foo/bar/@v",
+    )
+    download_dir.joinpath("sumdb/sum.golang.org/latest").write_text("tree")
+
+    cache = GoModuleCache(tmp_path / "cache", max_size=100)
+    cache.store(download_dir)
+
+    stored = sorted(
+        str(path.relative_to(cache.root)) for path in cache.root.rglob("*") if path.is_file()
+    )
+    assert stored == [
+        "github.com/foo/bar/@v/v1.0.0.info",
+        "github.com/foo/bar/@v/v1.0.0.mod",
+        "github.com/foo/bar/@v/v1.0.0.zip",
+    ]
+
+    version_dir = cache.root / "github.com/foo/bar/@v"
+    # make the .zip the most recently used file
+    os.utime(version_dir / "v1.0.0.info", (0, 0))
+    os.utime(version_dir / "v1.0.0.mod", (1, 1))
+
+    cache.evict()
+
+    assert [path.name for path in version_dir.iterdir()] == ["v1.0.0.zip"]
+
+
+def test_go_module_cache_goproxy(tmp_path: Path) -> None:
+    cache = GoModuleCache(tmp_path, max_size=2**30)
+    assert cache.goproxy("https://my.proxy") == f"file://{tmp_path},https://my.proxy"
+    assert cache.goproxy("") == f"file://{tmp_path},https://proxy.golang.org,direct"
+
+
 @pytest.mark.parametrize(
     "flags, vendor_exists, expect_result",
     [
@@ -1502,6 +1876,55 @@ def test_fetch_gomod_source(
     assert output == expected_output
 
 
+@pytest.mark.parametrize(
+    "gomod_input_packages",
+    [[{"type": "gomod", "path": "a"}, {"type": "gomod", "path": "b"}]],
+)
+@mock.patch("cachi2.core.package_managers.gomod.get_config")
+@mock.patch("cachi2.core.package_managers.gomod._get_repository_name")
+@mock.patch("cachi2.core.package_managers.gomod._find_missing_gomod_files")
+@mock.patch("cachi2.core.package_managers.gomod._resolve_gomod")
+@mock.patch("cachi2.core.package_managers.gomod.GoCacheTemporaryDirectory")
+@mock.patch("cachi2.core.package_managers.gomod.ModuleVersionResolver.from_repo_path")
+def test_fetch_gomod_source_concurrently(
+    mock_version_resolver: mock.Mock,
+    mock_tmp_dir: mock.Mock,
+    mock_resolve_gomod: mock.Mock,
+    mock_find_missing_gomod_files: mock.Mock,
+    mock_get_repository_name: mock.Mock,
+    mock_get_config: mock.Mock,
+    gomod_request: Request,
+) -> None:
+    mock_get_config.return_value.gomod_concurrency_limit = 2
+    mock_get_config.return_value.default_environment_variables = {}
+    mock_get_config.return_value.use_gomod_cache = False
+    mock_find_missing_gomod_files.return_value = []
+    mock_get_repository_name.return_value = "github.com/my-org/my-repo"
+
+    all_started = threading.Barrier(2, timeout=5)
+
+    def resolve_gomod_mocked(
+        app_dir: RootedPath,
+        request: Request,
+        tmp_dir: Path,
+        version_resolver: ModuleVersionResolver,
+    ) -> ResolvedGoModule:
+        # would time out if the modules were not processed concurrently
+        all_started.wait()
+        name = f"github.com/my-org/my-repo/{app_dir.path.name}"
+        return ResolvedGoModule(ParsedModule(path=name, version="v1.0.0"), [], [], frozenset())
+
+    mock_resolve_gomod.side_effect = resolve_gomod_mocked
+
+    output = fetch_gomod_source(gomod_request)
+
+    # the components are in the order of the input packages
+    assert [component.name for component in output.components] == [
+        "github.com/my-org/my-repo/a",
+        "github.com/my-org/my-repo/b",
+    ]
+
+
 @pytest.mark.parametrize(
     "input_url",
     (
@@ -1579,6 +2002,43 @@ def test_fetch_tags_fail(repo_remote_with_tag: tuple[RootedPath, RootedPath]) ->
         ModuleVersionResolver.from_repo_path(remote_repo_path)
 
 
+@pytest.mark.parametrize("has_local_tags", [True, False])
+@mock.patch("cachi2.core.package_managers.gomod.get_config")
+def test_skip_tag_fetch(
+    mock_config: mock.Mock,
+    has_local_tags: bool,
+    repo_remote_with_tag: tuple[RootedPath, RootedPath],
+) -> None:
+    mock_config.return_value.gomod_skip_tag_fetch = True
+    _, local_repo_path = repo_remote_with_tag
+    local_repo = git.Repo(local_repo_path)
+    if has_local_tags:
+        local_repo.create_tag("v3.0.0")
+
+    version_resolver = ModuleVersionResolver.from_repo_path(local_repo_path)
+
+    if has_local_tags:
+        # the tags from the remote were not fetched
+        assert version_resolver._all_tags == ["v3.0.0"]
+    else:
+        assert version_resolver._all_tags == ["v1.0.0", "v2.0.0"]
+
+
+def test_semver_tags_index(golang_repo_path: Path) -> None:
+    repo = git.Repo(golang_repo_path)
+    commit = repo.commit("5401bdd8a8ebfcccd2eea9451d407a5fdae6fc76")
+    version_resolver = ModuleVersionResolver(repo, commit)
+
+    semver_tags = version_resolver._semver_tags
+
+    assert {None, "submodule"} <= semver_tags.keys()
+    # the index only holds valid semantic version tags
+    for subpath, tags in semver_tags.items():
+        for tag in tags:
+            assert tag.name == (f"{subpath}/v{tag.semver}" if subpath else f"v{tag.semver}")
+            assert tag.on_commit == (tag.name in version_resolver._commit_tags)
+
+
 @pytest.mark.parametrize(
     "go_mod_file, go_mod_version",
     [("go 1.21", "1.21"), ("    go    1.21.4    ", "1.21.4")],
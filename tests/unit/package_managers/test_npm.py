@@ -19,10 +19,10 @@ from cachi2.core.package_managers.npm import (
     Package,
     PackageLock,
     ResolvedNpmPackage,
-    _clone_repo_pack_archive,
     _extract_git_info_npm,
     _generate_component_list,
     _get_npm_dependencies,
+    _prepare_repo_pack_archive,
     _Purlifier,
     _resolve_npm,
     _should_replace_dependency,
@@ -30,7 +30,9 @@ from cachi2.core.package_managers.npm import (
     _update_package_lock_with_local_paths,
     _update_vcs_url_with_full_hostname,
     fetch_npm_source,
+    plan_npm_source,
 )
+from cachi2.core.plan import PlannedArtifact
 from cachi2.core.rooted_path import RootedPath
 from cachi2.core.scm import RepoID
 
@@ -1454,6 +1456,65 @@ def test_resolve_npm_unsupported_lockfileversion(rooted_tmp_path: RootedPath) ->
         _resolve_npm(rooted_tmp_path, npm_deps_dir)
 
 
+def test_plan_npm_source(rooted_tmp_path: RootedPath) -> None:
+    package_lock_json = {
+        "name": "foo",
+        "version": "1.0.0",
+        "lockfileVersion": 3,
+        "packages": {
+            "": {"name": "foo", "version": "1.0.0"},
+            "node_modules/bar": {
+                "version": "2.0.0",
+                "resolved": "https://registry.npmjs.org/bar/-/bar-2.0.0.tgz",
+            },
+            "node_modules/baz": {
+                "version": "1.0.0",
+                "resolved": "git+ssh://git@github.com/foolish/baz.git#abcdef1234",
+            },
+            "node_modules/spam": {
+                "version": "3.0.0",
+                "resolved": "https://example.org/spam-3.0.0.tgz",
+                "integrity": "sha512-YOLO",
+            },
+            "node_modules/eggs": {"version": "1.0.0", "resolved": "file:eggs-1.0.0.tgz"},
+        },
+    }
+    rooted_tmp_path.join_within_root("package-lock.json").path.write_text(
+        json.dumps(package_lock_json)
+    )
+    request = Request(
+        source_dir=rooted_tmp_path,
+        output_dir=rooted_tmp_path.join_within_root("output"),
+        packages=[{"type": "npm"}],
+    )
+
+    assert plan_npm_source(request) == [
+        PlannedArtifact(
+            package_manager="npm",
+            name="bar",
+            version="2.0.0",
+            kind="download",
+            url="https://registry.npmjs.org/bar/-/bar-2.0.0.tgz",
+        ),
+        PlannedArtifact(
+            package_manager="npm",
+            name="baz",
+            version="1.0.0",
+            kind="git",
+            url="ssh://git@github.com/foolish/baz.git",
+            ref="abcdef1234",
+        ),
+        PlannedArtifact(
+            package_manager="npm",
+            name="spam",
+            version="3.0.0",
+            kind="download",
+            url="https://example.org/spam-3.0.0.tgz",
+        ),
+    ]
+    assert not rooted_tmp_path.join_within_root("output").path.exists()
+
+
 @pytest.mark.parametrize(
     "vcs, expected",
     [
@@ -1504,22 +1565,19 @@ def test_update_vcs_url_with_full_hostname(vcs: str, expected: str) -> None:
     assert _update_vcs_url_with_full_hostname(vcs) == expected
 
 
-@mock.patch("cachi2.core.package_managers.npm.clone_as_tarball")
-def test_clone_repo_pack_archive(
-    mock_clone_as_tarball: mock.Mock, rooted_tmp_path: RootedPath
-) -> None:
+def test_prepare_repo_pack_archive(rooted_tmp_path: RootedPath) -> None:
     vcs = NormalizedUrl("git+ssh://bitbucket.org/cachi-testing/cachi2-without-deps.git#9e164b9")
-    download_path = _clone_repo_pack_archive(vcs, rooted_tmp_path)
+    download_path, url, ref = _prepare_repo_pack_archive(vcs, rooted_tmp_path)
     expected_path = rooted_tmp_path.join_within_root(
         "bitbucket.org",
         "cachi-testing",
         "cachi2-without-deps",
         "cachi2-without-deps-external-gitcommit-9e164b9.tgz",
     )
+    assert download_path == expected_path
     assert download_path.path.parent.is_dir()
-    mock_clone_as_tarball.assert_called_once_with(
-        "ssh://bitbucket.org/cachi-testing/cachi2-without-deps.git", "9e164b9", expected_path.path
-    )
+    assert url == "ssh://bitbucket.org/cachi-testing/cachi2-without-deps.git"
+    assert ref == "9e164b9"
 
 
 @pytest.mark.parametrize(
@@ -1606,13 +1664,11 @@ def test_should_replace_dependency(dependency_version: str, expected_result: boo
     ],
 )
 @mock.patch("cachi2.core.package_managers.npm.async_download_files")
-@mock.patch("cachi2.core.package_managers.npm.must_match_any_checksum")
 @mock.patch("cachi2.core.checksum.ChecksumInfo.from_sri")
-@mock.patch("cachi2.core.package_managers.npm.clone_as_tarball")
+@mock.patch("cachi2.core.package_managers.npm.clone_as_tarballs_concurrently")
 def test_get_npm_dependencies(
-    mock_clone_as_tarball: mock.Mock,
+    mock_clone_as_tarballs: mock.Mock,
     mock_from_sri: mock.Mock,
-    mock_must_match_any_checksum: mock.Mock,
     mock_async_download_files: mock.Mock,
     rooted_tmp_path: RootedPath,
     deps_to_download: Dict[str, Dict[str, Optional[str]]],
@@ -1627,8 +1683,7 @@ def test_get_npm_dependencies(
             return ChecksumInfo("sha256", "YOLO")
 
     mock_from_sri.side_effect = args_based_return_checksum
-    mock_must_match_any_checksum.return_value = None
-    mock_clone_as_tarball.return_value = None
+    mock_clone_as_tarballs.return_value = None
     mock_async_download_files.return_value = None
 
     download_paths = _get_npm_dependencies(rooted_tmp_path, deps_to_download)
@@ -1638,6 +1693,21 @@ def test_get_npm_dependencies(
 
     assert download_paths == expected_download_paths
 
+    # all the git dependencies are cloned in one batch
+    repos_to_clone = mock_clone_as_tarballs.call_args.args[0]
+    assert set(repos_to_clone) == {
+        expected_download_paths[url].path for url in deps_to_download if url.startswith("git+")
+    }
+
+    # the checksums are verified by the downloader, on the fly
+    files_to_download, _, checksums = mock_async_download_files.call_args.args
+    expected_checksums = {
+        url: [args_based_return_checksum(str(info["integrity"]))]
+        for url, info in deps_to_download.items()
+        if url in files_to_download and info["integrity"]
+    }
+    assert checksums == expected_checksums
+
 
 @pytest.mark.parametrize(
     "lockfile_data, download_paths, expected_lockfile_data",
@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import logging
 import re
+import threading
 from copy import deepcopy
 from pathlib import Path
 from textwrap import dedent
@@ -24,6 +25,7 @@ from cachi2.core.models.input import Request
 from cachi2.core.models.output import ProjectFile
 from cachi2.core.models.sbom import Component, Property
 from cachi2.core.package_managers import pip
+from cachi2.core.plan import PlannedArtifact
 from cachi2.core.rooted_path import PathOutsideRoot, RootedPath
 from cachi2.core.scm import RepoID
 from tests.common_utils import Symlink, write_file_tree
@@ -2686,6 +2688,62 @@ class TestDownload:
             == f"PyPI query failed: No details about project '{package_name}' available at URL"
         )
 
+    @mock.patch.object(pypi_simple.PyPISimple, "get_project_page")
+    def test_prefetch_project_pages(self, mock_get_project_page: mock.Mock) -> None:
+        all_started = threading.Barrier(2, timeout=5)
+
+        def get_project_page(name: str, timeout: int) -> mock.Mock:
+            # would time out if the pages were not fetched concurrently
+            all_started.wait()
+            if name == "does-not-exist":
+                raise pypi_simple.NoSuchProjectError(name, "URL")
+            return mock.Mock(project=name)
+
+        mock_get_project_page.side_effect = get_project_page
+
+        project_pages = pip._prefetch_project_pages(["foo", "does-not-exist", "foo"])
+
+        assert project_pages["foo"].result().project == "foo"
+        with pytest.raises(FetchError, match="PyPI query failed"):
+            project_pages["does-not-exist"].result()
+        assert mock_get_project_page.call_count == 2
+
+    def test_pypi_client_is_shared(self) -> None:
+        assert pip._get_pypi_client() is pip._get_pypi_client()
+
+    @mock.patch("cachi2.core.package_managers.pip.get_requests_session")
+    @mock.patch("cachi2.core.package_managers.pip.get_config")
+    def test_pypi_client_pool_size(
+        self, mock_get_config: mock.Mock, mock_get_requests_session: mock.Mock
+    ) -> None:
+        mock_get_config.return_value.concurrency_limit = 5
+        mock_get_config.return_value.batch_concurrency_limit = 4
+        pip._create_pypi_client.cache_clear()
+
+        pip._get_pypi_client()
+        assert mock_get_requests_session.call_args.kwargs["pool_maxsize"] == 20
+
+        # the pool follows the config
+        mock_get_config.return_value.concurrency_limit = 8
+        pip._get_pypi_client()
+        assert mock_get_requests_session.call_args.kwargs["pool_maxsize"] == 32
+        pip._create_pypi_client.cache_clear()
+
+    @mock.patch("cachi2.core.package_managers.pip.get_batch_cache")
+    @mock.patch.object(pypi_simple.PyPISimple, "get_project_page")
+    def test_project_pages_shared_in_batch(
+        self, mock_get_project_page: mock.Mock, mock_get_batch_cache: mock.Mock
+    ) -> None:
+        mock_get_batch_cache.return_value = {}
+        mock_get_project_page.side_effect = lambda name, timeout: mock.Mock(project=name)
+
+        first_page = pip._get_project_page("foo")
+        second_page = pip._get_project_page("foo")
+
+        assert second_page is first_page
+        mock_get_project_page.assert_called_once_with("foo", mock.ANY)
+        mock_get_batch_cache.assert_called_with("pypi-project-pages")
+
     @mock.patch.object(pypi_simple.PyPISimple, "get_project_page")
     def test_process_existing_package_without_source_distributions(
         self,
@@ -2978,20 +3036,18 @@ class TestDownload:
         sdists.sort(key=pip._sdist_preference)
         assert sdists == expect_order
 
-    @mock.patch("cachi2.core.package_managers.pip.clone_as_tarball")
-    def test_download_vcs_package(
+    def test_prepare_vcs_package(
         self,
-        mock_clone_as_tarball: Any,
         rooted_tmp_path: RootedPath,
     ) -> None:
-        """Test downloading of a single VCS package."""
+        """Test preparing the download of a single VCS package."""
         vcs_url = f"git+https://github.com/spam/eggs@{GIT_REF}"
 
         mock_requirement = self.mock_requirement(
             "eggs", "vcs", url=vcs_url, download_line=f"eggs @ {vcs_url}"
         )
 
-        download_info = pip._download_vcs_package(mock_requirement, rooted_tmp_path)
+        download_info = pip._prepare_vcs_package(mock_requirement, rooted_tmp_path)
 
         assert download_info == {
             "package": "eggs",
@@ -3005,39 +3061,18 @@ class TestDownload:
             "host": "github.com",
         }
 
-        download_path = download_info["path"]
-
-        mock_clone_as_tarball.assert_called_once_with(
-            "https://github.com/spam/eggs", GIT_REF, to_path=download_path
-        )
+        assert download_info["path"].parent.is_dir()
 
     @pytest.mark.parametrize("hash_as_qualifier", [True, False])
-    @pytest.mark.parametrize(
-        "host_in_url, trusted_hosts, host_is_trusted",
-        [
-            ("example.org", [], False),
-            ("example.org", ["example.org"], True),
-            ("example.org:443", ["example.org:443"], True),
-            # 'host' in URL does not match 'host:port' in trusted hosts
-            ("example.org", ["example.org:443"], False),
-            # 'host:port' in URL *does* match 'host' in trusted hosts
-            ("example.org:443", ["example.org"], True),
-        ],
-    )
-    @mock.patch("cachi2.core.package_managers.pip.download_binary_file")
-    def test_download_url_package(
+    def test_prepare_url_package(
         self,
-        mock_download_file: Any,
         hash_as_qualifier: bool,
-        host_in_url: bool,
-        trusted_hosts: list[str],
-        host_is_trusted: bool,
         rooted_tmp_path: RootedPath,
     ) -> None:
-        """Test downloading of a single URL package."""
+        """Test preparing the download of a single URL package."""
         # Add the #cachito_package fragment to make sure the .tar.gz extension
         # will be found even if the URL does not end with it
-        original_url = f"https://{host_in_url}/foo.tar.gz#cachito_package=foo"
+        original_url = "https://example.org/foo.tar.gz#cachito_package=foo"
         url_with_hash = f"{original_url}&cachito_hash=sha256:abcdef"
         if hash_as_qualifier:
             original_url = url_with_hash
@@ -3051,11 +3086,7 @@ class TestDownload:
             qualifiers={"cachito_hash": "sha256:abcdef"} if hash_as_qualifier else {},
         )
 
-        download_info = pip._download_url_package(
-            mock_requirement,
-            rooted_tmp_path,
-            set(trusted_hosts),
-        )
+        download_info = pip._prepare_url_package(mock_requirement, rooted_tmp_path)
 
         assert download_info == {
             "package": "foo",
@@ -3065,11 +3096,25 @@ class TestDownload:
             "original_url": original_url,
             "url_with_hash": url_with_hash,
         }
+        assert download_info["path"].parent.is_dir()
 
-        download_path = download_info["path"]
-        mock_download_file.assert_called_once_with(
-            original_url, download_path, insecure=host_is_trusted
-        )
+    @pytest.mark.parametrize(
+        "host_in_url, trusted_hosts, host_is_trusted",
+        [
+            ("example.org", [], False),
+            ("example.org", ["example.org"], True),
+            ("example.org:443", ["example.org:443"], True),
+            # 'host' in URL does not match 'host:port' in trusted hosts
+            ("example.org", ["example.org:443"], False),
+            # 'host:port' in URL *does* match 'host' in trusted hosts
+            ("example.org:443", ["example.org"], True),
+        ],
+    )
+    def test_is_trusted_host(
+        self, host_in_url: str, trusted_hosts: list[str], host_is_trusted: bool
+    ) -> None:
+        url = f"https://{host_in_url}/foo.tar.gz#cachito_package=foo"
+        assert pip._is_trusted_host(url, set(trusted_hosts)) == host_is_trusted
 
     @pytest.mark.parametrize(
         "original_url, url_with_hash",
@@ -3290,24 +3335,26 @@ class TestDownload:
     @pytest.mark.parametrize("use_hashes", [True, False])
     @pytest.mark.parametrize("trusted_hosts", [[], ["example.org"]])
     @pytest.mark.parametrize("allow_binary", [True, False])
+    @mock.patch("cachi2.core.package_managers.pip._get_project_page")
     @mock.patch("cachi2.core.package_managers.pip._process_package_distributions")
-    @mock.patch("cachi2.core.package_managers.pip._download_vcs_package")
-    @mock.patch("cachi2.core.package_managers.pip._download_url_package")
-    @mock.patch("cachi2.core.package_managers.pip.must_match_any_checksum")
+    @mock.patch("cachi2.core.package_managers.pip.clone_as_tarballs_concurrently")
+    @mock.patch("cachi2.core.package_managers.pip._prepare_vcs_package")
+    @mock.patch("cachi2.core.package_managers.pip._prepare_url_package")
+    @mock.patch("cachi2.core.package_managers.pip.must_match_any_checksum_concurrently")
     @mock.patch.object(Path, "unlink")
     @mock.patch("cachi2.core.package_managers.pip.async_download_files")
-    @mock.patch("cachi2.core.package_managers.pip.download_binary_file")
     @mock.patch("cachi2.core.package_managers.pip._check_metadata_in_sdist")
     def test_download_dependencies(
         self,
         check_metadata_in_sdist: mock.Mock,
-        download_binary_file: mock.Mock,
         async_download_files: mock.Mock,
         mock_path_unlink: mock.Mock,
         mock_match_checksum: mock.Mock,
-        mock_url_download: mock.Mock,
-        mock_vcs_download: mock.Mock,
+        mock_prepare_url: mock.Mock,
+        mock_prepare_vcs: mock.Mock,
+        mock_clone_as_tarballs: mock.Mock,
         mock_distributions: mock.Mock,
+        mock_get_project_page: mock.Mock,
         use_hashes: bool,
         trusted_hosts: list[str],
         allow_binary: bool,
@@ -3367,6 +3414,8 @@ class TestDownload:
         vcs_info = {
             "package": "eggs",
             "path": vcs_download,
+            "url": "https://github.com/spam/eggs",
+            "ref": GIT_REF,
             "repo": "eggs",
             "hash_verified": use_hashes,
             "requirement_file": str(req_file.file_path.subpath_from_root),
@@ -3381,14 +3430,19 @@ class TestDownload:
             "requirement_file": str(req_file.file_path.subpath_from_root),
         }
 
+        pypi_url = "https://example.org/foo-1.0.tar.gz"
         source_package = pip.DistributionPackageInfo(
-            "foo", "1.0", "sdist", pypi_download, "", False
+            "foo", "1.0", "sdist", pypi_download, pypi_url, False
         )
 
         w1_path = pip_deps.join_within_root("foo-1.0-cp25-win32.whl").path
         w2_path = pip_deps.join_within_root("foo-1.0-cp35-many-linux.whl").path
         w3_path = pip_deps.join_within_root("foo-1.0-any.whl").path
 
+        w1_url = "https://example.org/foo-1.0-cp25-win32.whl"
+        w2_url = "https://example.org/foo-1.0-cp35-many-linux.whl"
+        w3_url = "https://example.org/foo-1.0-any.whl"
+
         wheels = []
         if allow_binary:
             wheels = [
@@ -3397,7 +3451,7 @@ class TestDownload:
                     "1.0",
                     "wheel",
                     w1_path,
-                    "",
+                    w1_url,
                     False,
                     pypi_checksums={ChecksumInfo("sha256", "abcdef")},
                 ),
@@ -3406,33 +3460,31 @@ class TestDownload:
                     "1.0",
                     "wheel",
                     w2_path,
-                    "",
+                    w2_url,
                     False,
                     pypi_checksums={ChecksumInfo("sha256", "fedcba")},
                 ),
-                pip.DistributionPackageInfo("foo", "1.0", "wheel", w3_path, "", False),
+                pip.DistributionPackageInfo("foo", "1.0", "wheel", w3_path, w3_url, False),
             ]
 
         mock_distributions.return_value = source_package, wheels
-        mock_vcs_download.return_value = deepcopy(vcs_info)
-        mock_url_download.return_value = deepcopy(url_info)
-
-        if use_hashes:
-            mock_match_checksum.side_effect = [
-                # pypi_download
-                None,
-                # vcs_download
-                None,
-                # url_download
-                None,
-                # 1. wheel - checksums OK
-                None,
-                # 2. wheel - checksums NOK
-                PackageRejected("", solution=None),
-                # 3. wheel - no checksums to verify
-            ]
-        else:
-            mock_match_checksum.side_effect = [None, None, PackageRejected("", solution=None)]
+        mock_prepare_vcs.return_value = deepcopy(vcs_info)
+        mock_prepare_url.return_value = deepcopy(url_info)
+
+        mock_match_checksum.return_value = None
+
+        def mock_async_download(
+            *args: Any, on_download: Any, on_failure: Any, **kwargs: Any
+        ) -> None:
+            files_to_download = args[0]
+            for url, download_path in files_to_download.items():
+                if url == w2_url:
+                    # wheel #2 does not match any checksums
+                    on_failure(url, PackageRejected("checksum mismatch", solution=None))
+                else:
+                    on_download(url, download_path)
+
+        async_download_files.side_effect = mock_async_download
         # </setup>
 
         # <call>
@@ -3452,39 +3504,53 @@ class TestDownload:
 
         # <check calls that must always be made>
         check_metadata_in_sdist.assert_called_once_with(source_package.path)
-        mock_distributions.assert_called_once_with(pypi_req, pip_deps, allow_binary)
-        mock_vcs_download.assert_called_once_with(vcs_req, pip_deps)
-        mock_url_download.assert_called_once_with(url_req, pip_deps, set(trusted_hosts))
+        mock_get_project_page.assert_called_once_with(pypi_req.package)
+        mock_distributions.assert_called_once_with(
+            pypi_req, pip_deps, allow_binary, project_page=mock_get_project_page.return_value
+        )
+        mock_prepare_vcs.assert_called_once_with(vcs_req, pip_deps)
+        mock_clone_as_tarballs.assert_called_once_with(
+            {vcs_download: ("https://github.com/spam/eggs", GIT_REF)}, mock.ANY
+        )
+        mock_prepare_url.assert_called_once_with(url_req, pip_deps)
         # </check calls that must always be made>
 
         # <check calls to checksum verification method>
-        verify_url_checksum_call = mock.call(url_download, [ChecksumInfo("sha256", "654321")])
+        url_checksums = [ChecksumInfo("sha256", "654321")]
+        expected_checksums: dict[str, Any] = {plain_url: url_checksums}
+
         if use_hashes:
             msg = "At least one dependency uses the --hash option, will require hashes"
             assert msg in caplog.text
 
-            verify_checksums_calls = [
-                mock.call(pypi_download, [ChecksumInfo("sha256", "abcdef")]),
-                mock.call(vcs_download, [ChecksumInfo("sha256", "123456")]),
-                verify_url_checksum_call,
-            ]
+            # only the vcs package is verified after the fact, the others while being downloaded
+            mock_match_checksum.assert_called_once_with(
+                {vcs_download: [ChecksumInfo("sha256", "123456")]}, mock.ANY
+            )
+            expected_checksums[pypi_url] = [ChecksumInfo("sha256", "abcdef")]
         else:
             msg = "No hash options used, will not require hashes unless HTTP(S) dependencies are present."
             assert msg in caplog.text
-            # Hashes for URL dependencies should be verified no matter what
-            verify_checksums_calls = [verify_url_checksum_call]
+            mock_match_checksum.assert_called_once_with({}, mock.ANY)
 
-        if allow_binary:
-            verify_checksums_calls.extend(
-                [
-                    mock.call(w1_path, {ChecksumInfo("sha256", "abcdef")}),
-                    mock.call(w2_path, {ChecksumInfo("sha256", "fedcba")}),
-                ]
-            )
+        expected_files = {pypi_url: pypi_download, plain_url: url_download}
 
-        mock_match_checksum.assert_has_calls(verify_checksums_calls)
-        assert mock_match_checksum.call_count == len(verify_checksums_calls)
+        if allow_binary:
+            expected_files |= {w1_url: w1_path, w2_url: w2_path, w3_url: w3_path}
+            expected_checksums |= {
+                w1_url: {ChecksumInfo("sha256", "abcdef")},
+                w2_url: {ChecksumInfo("sha256", "fedcba")},
+            }
 
+        # sdists, url packages and wheels are all downloaded in one batch
+        async_download_files.assert_called_once_with(
+            expected_files,
+            mock.ANY,
+            expected_checksums,
+            insecure_urls={plain_url} if trusted_hosts else set(),
+            on_download=mock.ANY,
+            on_failure=mock.ANY,
+        )
         # </check calls to checksum verification method>
 
         # <check basic logging output>
@@ -3506,11 +3572,19 @@ class TestDownload:
         ) in caplog.text
         # </check basic logging output>
 
+        # <check batch download>
+        assert f"Downloading {len(expected_files)} file(s) ..." in caplog.text
+        # </check batch download>
+
         # <check downloaded wheels>
         if allow_binary:
-            assert f"Downloading {len(wheels)} wheel(s) ..." in caplog.text
             # wheel #2 does not match any checksums
             assert f"The {w2_path.name} is removed from the output directory" in caplog.text
+
+        # other files that do not match their checksums still fail the request
+        on_failure = async_download_files.call_args.kwargs["on_failure"]
+        with pytest.raises(PackageRejected):
+            on_failure(plain_url, PackageRejected("checksum mismatch", solution=None))
         # </check downloaded wheels>
 
     def test_get_user_checksums(self) -> None:
@@ -3569,14 +3643,16 @@ class TestDownload:
         }
         assert checksums == expected
 
+    @mock.patch("cachi2.core.package_managers.pip._get_project_page")
     @mock.patch("cachi2.core.package_managers.pip._process_package_distributions")
-    @mock.patch("cachi2.core.package_managers.pip.download_binary_file")
+    @mock.patch("cachi2.core.package_managers.pip.async_download_files")
     @mock.patch("cachi2.core.package_managers.pip._check_metadata_in_sdist")
     def test_download_from_requirement_files(
         self,
         check_metadata_in_sdist: mock.Mock,
-        download_binary_file: mock.Mock,
+        async_download_files: mock.Mock,
         mock_distributions: mock.Mock,
+        mock_get_project_page: mock.Mock,
         rooted_tmp_path: RootedPath,
     ) -> None:
         """Test downloading dependencies from a requirement file list."""
@@ -3599,6 +3675,12 @@ class TestDownload:
 
         mock_distributions.side_effect = [(pypi_package1, []), (pypi_package2, [])]
 
+        def mock_async_download(*args: Any, on_download: Any, **kwargs: Any) -> None:
+            for url, download_path in args[0].items():
+                on_download(url, download_path)
+
+        async_download_files.side_effect = mock_async_download
+
         downloads = pip._download_from_requirement_files(rooted_tmp_path, [req_file1, req_file2])
         assert downloads == [
             pypi_package1.download_info
@@ -4070,6 +4152,93 @@ def test_fetch_pip_source(
         mock_replace_requirements.assert_any_call("/package_b/requirements.txt")
 
 
+@pytest.mark.parametrize("allow_binary", [False, True])
+@mock.patch("cachi2.core.package_managers.pip._get_project_page")
+def test_plan_pip_source(
+    mock_get_project_page: mock.Mock, allow_binary: bool, rooted_tmp_path: RootedPath
+) -> None:
+    rooted_tmp_path.join_within_root("requirements.txt").path.write_text(
+        dedent(
+            f"""\
+            foo==1.0
+            bar @ https://example.org/bar-1.0.tar.gz#cachito_hash=sha256:abcdef
+            baz @ git+https://github.com/example/baz@{GIT_REF}
+            """
+        )
+    )
+    rooted_tmp_path.join_within_root("requirements-build.txt").path.write_text("spam==2.0\n")
+
+    def make_package(filename: str, package_type: str, size: Optional[int]) -> Any:
+        return pypi_simple.DistributionPackage(
+            filename=filename,
+            url=f"https://files.example.org/{filename}",
+            project=None,
+            version=filename.split("-")[1].removesuffix(".tar.gz"),
+            package_type=package_type,
+            digests={},
+            requires_python=None,
+            has_sig=None,
+            size=size,
+        )
+
+    project_pages = {
+        "foo": [
+            make_package("foo-1.0.tar.gz", "sdist", 100),
+            make_package("foo-1.0-py3-none-any.whl", "wheel", 50),
+            make_package("foo-0.9.tar.gz", "sdist", 90),
+        ],
+        "spam": [make_package("spam-2.0.tar.gz", "sdist", None)],
+    }
+    mock_get_project_page.side_effect = lambda name: mock.Mock(packages=project_pages[name])
+
+    request = Request(
+        source_dir=rooted_tmp_path,
+        output_dir=rooted_tmp_path.join_within_root("output"),
+        packages=[{"type": "pip", "allow_binary": allow_binary}],
+    )
+
+    foo_wheel = PlannedArtifact(
+        package_manager="pip",
+        name="foo",
+        version="1.0",
+        kind="download",
+        url="https://files.example.org/foo-1.0-py3-none-any.whl",
+        size=50,
+    )
+    assert pip.plan_pip_source(request) == [
+        PlannedArtifact(
+            package_manager="pip",
+            name="foo",
+            version="1.0",
+            kind="download",
+            url="https://files.example.org/foo-1.0.tar.gz",
+            size=100,
+        ),
+        *([foo_wheel] if allow_binary else []),
+        PlannedArtifact(
+            package_manager="pip",
+            name="bar",
+            kind="download",
+            url="https://example.org/bar-1.0.tar.gz#cachito_hash=sha256:abcdef",
+        ),
+        PlannedArtifact(
+            package_manager="pip",
+            name="baz",
+            kind="git",
+            url="https://github.com/example/baz",
+            ref=GIT_REF,
+        ),
+        PlannedArtifact(
+            package_manager="pip",
+            name="spam",
+            version="2.0",
+            kind="download",
+            url="https://files.example.org/spam-2.0.tar.gz",
+        ),
+    ]
+    assert not rooted_tmp_path.join_within_root("output").path.exists()
+
+
 @pytest.mark.parametrize(
     "dependency, expected_purl",
     [
@@ -3,6 +3,7 @@ import re
 from enum import Enum
 from itertools import zip_longest
 from pathlib import Path
+from textwrap import dedent
 from typing import List, Optional, Union
 from unittest import mock
 
@@ -22,8 +23,10 @@ from cachi2.core.package_managers.yarn.main import (
     _verify_corepack_yarn_version,
     _verify_yarnrc_paths,
     fetch_yarn_source,
+    plan_yarn_source,
 )
 from cachi2.core.package_managers.yarn.project import Plugin, YarnRc
+from cachi2.core.plan import PlannedArtifact
 from cachi2.core.rooted_path import RootedPath
 
 
@@ -464,3 +467,74 @@ def test_fetch_yarn_source(
         build_config=BuildConfig(environment_variables=yarn_env_variables),
     )
     assert output == expected_output
+
+
+def test_plan_yarn_source(rooted_tmp_path: RootedPath) -> None:
+    rooted_tmp_path.join_within_root("package.json").path.write_text('{"name": "foo"}')
+    rooted_tmp_path.join_within_root(".yarnrc.yml").path.write_text(
+        "npmScopes:\n  private:\n    npmRegistryServer: https://npm.example.org/\n"
+    )
+    rooted_tmp_path.join_within_root("yarn.lock").path.write_text(
+        dedent(
+            """\
+            __metadata:
+              version: 6
+              cacheKey: 8
+
+            "foo@workspace:.":
+              version: 0.0.0-use.local
+              resolution: "foo@workspace:."
+              languageName: unknown
+              linkType: soft
+
+            "bar@npm:^1.0.0":
+              version: 1.2.0
+              resolution: "bar@npm:1.2.0"
+              checksum: abc
+              languageName: node
+              linkType: hard
+
+            "@private/baz@npm:2.0.0":
+              version: 2.0.0
+              resolution: "@private/baz@npm:2.0.0"
+              checksum: def
+              languageName: node
+              linkType: hard
+
+            "spam@https://example.org/spam-1.0.0.tgz":
+              version: 1.0.0
+              resolution: "spam@https://example.org/spam-1.0.0.tgz"
+              checksum: ghi
+              languageName: node
+              linkType: hard
+            """
+        )
+    )
+    request = Request(
+        source_dir=rooted_tmp_path,
+        output_dir=rooted_tmp_path.join_within_root("output"),
+        packages=[{"type": "yarn"}],
+    )
+
+    assert plan_yarn_source(request) == [
+        PlannedArtifact(
+            package_manager="yarn",
+            name="bar",
+            version="1.2.0",
+            kind="download",
+            url="https://registry.yarnpkg.com/bar/-/bar-1.2.0.tgz",
+        ),
+        PlannedArtifact(
+            package_manager="yarn",
+            name="@private/baz",
+            version="2.0.0",
+            kind="download",
+            url="https://npm.example.org/@private/baz/-/baz-2.0.0.tgz",
+        ),
+        PlannedArtifact(
+            package_manager="yarn",
+            name="spam",
+            kind="download",
+            url="https://example.org/spam-1.0.0.tgz",
+        ),
+    ]
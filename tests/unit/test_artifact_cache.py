@@ -0,0 +1,142 @@
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from cachi2.core.artifact_cache import ArtifactCache, get_artifact_cache
+from cachi2.core.checksum import ChecksumInfo
+
+URL = "https://example.org/foo-1.0.tar.gz"
+FOO_SHA256 = ChecksumInfo(
+    "sha256", "2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+)
+FOO_SHA512 = ChecksumInfo(
+    "sha512",
+    "f7fbba6e0636f890e56fbbf3283e524c6fa3204ae298382d624741d0dc6638326e282c41be5e4254d8820772c"
+    "5518a2c5a8c0c7f7eda19594a7eb539453e1ed7",
+)
+
+
+@pytest.fixture
+def artifact_cache(tmp_path: Path) -> ArtifactCache:
+    return ArtifactCache(tmp_path / "cache")
+
+
+def test_store_and_materialize(artifact_cache: ArtifactCache, tmp_path: Path) -> None:
+    downloaded = tmp_path / "foo-1.0.tar.gz"
+    downloaded.write_bytes(b"foo")
+
+    assert artifact_cache.lookup(URL) is None
+
+    artifact_cache.store(URL, downloaded)
+
+    blob = artifact_cache.lookup(URL)
+    assert blob is not None
+    assert blob.read_bytes() == b"foo"
+    # sha256 of b"foo"
+    assert blob.name == "2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+
+    materialized = tmp_path / "output" / "foo-1.0.tar.gz"
+    materialized.parent.mkdir()
+    assert artifact_cache.materialize(URL, materialized)
+    assert materialized.read_bytes() == b"foo"
+
+
+def test_materialize_cache_miss(artifact_cache: ArtifactCache, tmp_path: Path) -> None:
+    to_path = tmp_path / "foo-1.0.tar.gz"
+    assert not artifact_cache.materialize(URL, to_path)
+    assert not to_path.exists()
+
+
+def test_same_content_is_stored_once(artifact_cache: ArtifactCache, tmp_path: Path) -> None:
+    downloaded = tmp_path / "foo-1.0.tar.gz"
+    downloaded.write_bytes(b"foo")
+
+    artifact_cache.store(URL, downloaded)
+    artifact_cache.store("https://mirror.example.org/foo-1.0.tar.gz", downloaded)
+
+    blobs = [p for p in artifact_cache.root.joinpath("blobs").rglob("*") if p.is_file()]
+    assert len(blobs) == 1
+    assert artifact_cache.lookup("https://mirror.example.org/foo-1.0.tar.gz") == blobs[0]
+
+
+def test_lookup_missing_blob(artifact_cache: ArtifactCache, tmp_path: Path) -> None:
+    downloaded = tmp_path / "foo-1.0.tar.gz"
+    downloaded.write_bytes(b"foo")
+    artifact_cache.store(URL, downloaded)
+
+    blob = artifact_cache.lookup(URL)
+    assert blob is not None
+    blob.unlink()
+
+    assert artifact_cache.lookup(URL) is None
+
+
+@pytest.mark.parametrize("checksum", [FOO_SHA256, FOO_SHA512])
+def test_lookup_checksums(
+    checksum: ChecksumInfo, artifact_cache: ArtifactCache, tmp_path: Path
+) -> None:
+    downloaded = tmp_path / "foo-1.0.tar.gz"
+    downloaded.write_bytes(b"foo")
+    wrong_checksum = ChecksumInfo(checksum.algorithm, "a" * len(checksum.hexdigest))
+
+    assert artifact_cache.lookup_checksums([checksum]) is None
+
+    artifact_cache.store(URL, downloaded, [checksum, wrong_checksum])
+
+    blob = artifact_cache.lookup_checksums([wrong_checksum, checksum])
+    assert blob is not None
+    assert blob.read_bytes() == b"foo"
+    # the file is only indexed under the checksums it matches
+    assert artifact_cache.lookup_checksums([wrong_checksum]) is None
+
+    # the checksum takes precedence over the URL
+    materialized = tmp_path / "materialized"
+    other = tmp_path / "other"
+    other.write_bytes(b"other")
+    artifact_cache.store(URL, other)
+    assert artifact_cache.materialize(URL, materialized, [checksum])
+    assert materialized.read_bytes() == b"foo"
+
+
+def test_store_with_known_digests(artifact_cache: ArtifactCache, tmp_path: Path) -> None:
+    downloaded = tmp_path / "foo-1.0.tar.gz"
+    downloaded.write_bytes(b"foo")
+    digests = {"sha256": FOO_SHA256.hexdigest, "sha512": FOO_SHA512.hexdigest}
+
+    with mock.patch("builtins.open", wraps=open) as mock_open:
+        artifact_cache.store(URL, downloaded, [FOO_SHA512], digests)
+
+    # the file is not read again to compute the checksums
+    assert mock.call(downloaded, "rb") not in mock_open.mock_calls
+    assert artifact_cache.lookup(URL) == artifact_cache.lookup_checksums([FOO_SHA512])
+
+
+@pytest.mark.parametrize("checksum", [FOO_SHA256, FOO_SHA512])
+def test_forget(checksum: ChecksumInfo, artifact_cache: ArtifactCache, tmp_path: Path) -> None:
+    downloaded = tmp_path / "foo-1.0.tar.gz"
+    downloaded.write_bytes(b"foo")
+    artifact_cache.store(URL, downloaded, [checksum])
+
+    artifact_cache.forget(URL, [checksum])
+
+    assert artifact_cache.lookup(URL) is None
+    assert artifact_cache.lookup_checksums([checksum]) is None
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+@mock.patch("cachi2.core.artifact_cache.get_cache_dir")
+@mock.patch("cachi2.core.artifact_cache.get_config")
+def test_get_artifact_cache(
+    mock_get_config: mock.Mock, mock_get_cache_dir: mock.Mock, enabled: bool, tmp_path: Path
+) -> None:
+    mock_get_config.return_value.use_artifact_cache = enabled
+    mock_get_cache_dir.return_value = tmp_path
+
+    artifact_cache = get_artifact_cache()
+
+    if enabled:
+        assert artifact_cache is not None
+        assert artifact_cache.root == tmp_path / "artifacts"
+    else:
+        assert artifact_cache is None
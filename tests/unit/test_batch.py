@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from pathlib import Path
+from typing import Iterator
+from unittest import mock
+
+import pytest
+
+from cachi2.core.batch import download_slot, get_batch_cache, run_batch
+from cachi2.core.models.input import Request
+
+
+@pytest.fixture
+def requests_(tmp_path: Path) -> list[Request]:
+    requests = []
+    for name in ["repo-a", "repo-b", "repo-c"]:
+        tmp_path.joinpath(name).mkdir()
+        requests.append(
+            Request(
+                source_dir=tmp_path / name,
+                output_dir=tmp_path / "output" / name,
+                packages=[{"type": "gomod"}],
+            )
+        )
+    return requests
+
+
+@pytest.fixture
+def mock_config() -> Iterator[mock.Mock]:
+    with mock.patch("cachi2.core.batch.get_config") as mock_get_config:
+        mock_get_config.return_value.batch_concurrency_limit = 2
+        mock_get_config.return_value.concurrency_limit = 1
+        yield mock_get_config.return_value
+
+
+def test_run_batch_collects_errors(requests_: list[Request], mock_config: mock.Mock) -> None:
+    processed = []
+
+    def process_request(request: Request) -> None:
+        processed.append(request.source_dir.path.name)
+        if request.source_dir.path.name == "repo-b":
+            raise RuntimeError("something went wrong")
+
+    errors = run_batch(requests_, process_request)
+
+    # a failed request does not stop the other ones
+    assert sorted(processed) == ["repo-a", "repo-b", "repo-c"]
+    assert list(errors) == [1]
+    assert str(errors[1]) == "something went wrong"
+
+
+def test_get_batch_cache(requests_: list[Request], mock_config: mock.Mock) -> None:
+    assert get_batch_cache("foo") is None
+
+    caches = []
+
+    def process_request(request: Request) -> None:
+        cache = get_batch_cache("foo")
+        assert cache is not None
+        cache[request.source_dir.path.name] = True
+        caches.append(cache)
+
+    run_batch(requests_, process_request)
+
+    # all the requests share the same cache
+    assert all(cache is caches[0] for cache in caches)
+    assert caches[0] == {"repo-a": True, "repo-b": True, "repo-c": True}
+    # the cache does not outlive the batch
+    assert get_batch_cache("foo") is None
+
+
+def test_download_slot(requests_: list[Request], mock_config: mock.Mock) -> None:
+    lock = threading.Lock()
+    in_progress = 0
+    max_in_progress = 0
+
+    async def download() -> None:
+        nonlocal in_progress, max_in_progress
+        async with download_slot():
+            with lock:
+                in_progress += 1
+                max_in_progress = max(max_in_progress, in_progress)
+            await asyncio.sleep(0.01)
+            with lock:
+                in_progress -= 1
+
+    async def download_all() -> None:
+        await asyncio.gather(*(download() for _ in range(3)))
+
+    run_batch(requests_, lambda request: asyncio.run(download_all()))
+
+    # concurrency_limit applies to the downloads of all the requests together
+    assert max_in_progress == 1
+
+
+def test_download_slot_outside_of_batch() -> None:
+    async def download() -> bool:
+        async with download_slot():
+            return True
+
+    assert asyncio.run(download())
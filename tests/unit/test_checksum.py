@@ -1,9 +1,16 @@
 from pathlib import Path
 from typing import Literal
+from unittest import mock
 
 import pytest
 
-from cachi2.core.checksum import SUPPORTED_ALGORITHMS, ChecksumInfo, must_match_any_checksum
+from cachi2.core.checksum import (
+    SUPPORTED_ALGORITHMS,
+    ChecksumInfo,
+    ChecksumVerifier,
+    must_match_any_checksum,
+    must_match_any_checksum_concurrently,
+)
 from cachi2.core.errors import PackageRejected
 
 FILE_CONTENT = "Beetlejuice! Beetlejuice! Beetlejuice!"
@@ -151,6 +158,94 @@ def test_verify_checksum_failure(
     assert caplog.messages == expect_messages
 
 
+def test_verify_checksum_reads_file_once(tmp_path: Path) -> None:
+    path = tmp_path.joinpath("spells.txt")
+    path.write_text(FILE_CONTENT)
+
+    with mock.patch("builtins.open", wraps=open) as mock_open:
+        must_match_any_checksum(path, [wrong("sha256"), wrong("md5"), correct("sha512")])
+
+    mock_open.assert_called_once()
+
+
+def test_verify_checksum_unsupported_only(tmp_path: Path) -> None:
+    path = tmp_path.joinpath("spells.txt")
+    path.write_text(FILE_CONTENT)
+
+    with mock.patch("builtins.open", wraps=open) as mock_open:
+        with pytest.raises(PackageRejected):
+            must_match_any_checksum(path, [unknown])
+
+    mock_open.assert_not_called()
+
+
+def test_verify_checksums_concurrently(tmp_path: Path) -> None:
+    files = {}
+    for i in range(10):
+        path = tmp_path.joinpath(f"spells-{i}.txt")
+        path.write_text(FILE_CONTENT)
+        files[path] = [correct("sha256")]
+
+    must_match_any_checksum_concurrently(files, max_workers=3)
+
+
+def test_verify_checksums_concurrently_failure(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    files = {}
+    for i in range(4):
+        path = tmp_path.joinpath(f"spells-{i}.txt")
+        path.write_text(FILE_CONTENT)
+        files[path] = [correct("sha256") if i % 2 == 0 else wrong("sha256")]
+
+    caplog.set_level("INFO")
+    with pytest.raises(
+        PackageRejected, match="Failed to verify spells-1.txt, spells-3.txt against any"
+    ):
+        must_match_any_checksum_concurrently(files)
+
+    # all the files got verified
+    for i in range(4):
+        assert f"Verifying checksums of spells-{i}.txt" in caplog.messages
+
+
+def test_checksum_verifier(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level("DEBUG")
+    verifier = ChecksumVerifier([unknown, wrong("sha512"), correct("sha256")])
+
+    content = FILE_CONTENT.encode()
+    for i in range(0, len(content), 5):
+        verifier.update(content[i : i + 5])
+
+    verifier.verify("spells.txt")
+
+    assert caplog.messages == [
+        "Verifying checksums of spells.txt",
+        f"spells.txt: sha256 checksum matches: {SHA256}",
+    ]
+
+
+def test_checksum_verifier_hexdigests() -> None:
+    verifier = ChecksumVerifier([correct("sha512")], extra_algorithms=["sha256", "md5"])
+    verifier.update(FILE_CONTENT.encode())
+
+    assert verifier.hexdigests() == {"sha512": SHA512, "sha256": SHA256, "md5": MD5}
+
+
+def test_checksum_verifier_failure(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level("WARNING")
+    verifier = ChecksumVerifier([wrong("sha256"), unknown])
+    verifier.update(FILE_CONTENT.encode())
+
+    with pytest.raises(PackageRejected, match="Failed to verify spells.txt"):
+        verifier.verify("spells.txt")
+
+    assert caplog.messages == [
+        f"spells.txt: sha256 checksum does not match (got: {SHA256})",
+        f"spells.txt: sha0 checksum not supported (supported: {SUPPORTED_ALG_STR})",
+    ]
+
+
 @pytest.mark.parametrize(
     "checksum, algorithm, expected",
     [
@@ -1,7 +1,10 @@
 import importlib.metadata
+import json
 import logging
 import os
 import re
+import subprocess
+import sys
 from contextlib import contextmanager
 from pathlib import Path
 from textwrap import dedent
@@ -21,6 +24,7 @@ from cachi2.core.models.output import (
     RequestOutput,
     Sbom,
 )
+from cachi2.core.plan import Plan, PlannedArtifact, PlanSummary
 from cachi2.interface.cli import DEFAULT_OUTPUT, DEFAULT_SOURCE, app
 
 runner = typer.testing.CliRunner()
@@ -84,6 +88,18 @@ class TestTopLevelOpts:
         assert lines[0] == f"cachi2 {expect_version}"
         assert lines[1].startswith("Supported package managers: gomod")
 
+    def test_package_managers_not_imported(self) -> None:
+        # the package managers are imported only when fetch-deps needs them, see resolver
+        code = (
+            "import sys\n"
+            "import cachi2.interface.cli\n"
+            "print([m for m in sys.modules if m.startswith('cachi2.core.package_managers.')])\n"
+            "print([m for m in ('aiohttp', 'git', 'pypi_simple') if m in sys.modules])\n"
+        )
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr
+        assert proc.stdout.splitlines() == ["[]", "[]"]
+
     @pytest.mark.parametrize(
         "file, file_text",
         [
@@ -608,6 +624,155 @@ class TestFetchDeps:
         assert written_build_config == request_output.build_config
         assert written_sbom == request_output.generate_sbom()
 
+    def test_profile(self, tmp_cwd: Path) -> None:
+        with mock_fetch_deps():
+            invoke_expecting_sucess(app, ["fetch-deps", "--profile=trace.json", "gomod"])
+
+        trace = json.loads(tmp_cwd.joinpath("trace.json").read_text())
+        span_names = [event["name"] for event in trace["traceEvents"] if event["ph"] == "X"]
+        assert span_names == ["write_output", "fetch_deps"]
+        assert "max_rss_kb" in trace["otherData"]
+
+    @pytest.fixture
+    def plan(self) -> Plan:
+        return Plan(
+            artifacts=[
+                PlannedArtifact(
+                    package_manager="gomod",
+                    name="github.com/foo/bar",
+                    version="v1.0.0",
+                    kind="download",
+                    url="https://proxy.golang.org/github.com/foo/bar/@v/v1.0.0.zip",
+                    size=1024,
+                )
+            ],
+            summary=PlanSummary(
+                artifacts=1,
+                estimated_cache_hits=0,
+                known_size=1024,
+                unknown_sizes=0,
+                estimated_download_size=1024,
+            ),
+        )
+
+    def test_plan(self, tmp_cwd: Path, plan: Plan) -> None:
+        with mock_fetch_deps() as mock_resolve_packages:
+            with mock.patch("cachi2.core.plan.plan_request", return_value=plan) as mock_plan:
+                result = invoke_expecting_sucess(app, ["fetch-deps", "--plan", "gomod"])
+
+        assert Plan.model_validate_json(result.stdout) == plan
+        mock_plan.assert_called_once()
+        mock_resolve_packages.assert_not_called()
+        assert not tmp_cwd.joinpath(DEFAULT_OUTPUT).exists()
+
+    def test_plan_profile(self, tmp_cwd: Path, plan: Plan) -> None:
+        with mock.patch("cachi2.core.plan.plan_request", return_value=plan):
+            invoke_expecting_sucess(app, ["fetch-deps", "--plan", "--profile=trace.json", "gomod"])
+
+        trace = json.loads(tmp_cwd.joinpath("trace.json").read_text())
+        span_names = [event["name"] for event in trace["traceEvents"] if event["ph"] == "X"]
+        assert span_names == ["plan_request"]
+
+
+class TestFetchDepsBatch:
+    @pytest.fixture
+    def manifest(self, tmp_cwd: Path) -> Path:
+        tmp_cwd.joinpath("repo-a").mkdir()
+        tmp_cwd.joinpath("repo-b").mkdir()
+        manifest = tmp_cwd / "manifest.yaml"
+        manifest.write_text(
+            dedent(
+                """
+                - source: repo-a
+                  output: output/repo-a
+                  packages: [{"type": "gomod"}]
+                - source: repo-b
+                  output: output/repo-b
+                  packages: [{"type": "pip"}]
+                  flags: [cgo-disable]
+                """
+            )
+        )
+        return manifest
+
+    def test_fetch_deps_batch(self, manifest: Path, tmp_cwd: Path) -> None:
+        with mock_fetch_deps() as mock_resolve_packages:
+            invoke_expecting_sucess(app, ["fetch-deps-batch", str(manifest)])
+
+        # the relative paths are relative to the manifest
+        expect_requests = [
+            Request(
+                source_dir=tmp_cwd / "repo-a",
+                output_dir=tmp_cwd / "output/repo-a",
+                packages=[{"type": "gomod"}],
+            ),
+            Request(
+                source_dir=tmp_cwd / "repo-b",
+                output_dir=tmp_cwd / "output/repo-b",
+                packages=[{"type": "pip"}],
+                flags=["cgo-disable"],
+            ),
+        ]
+        assert sorted(
+            (call.args[0] for call in mock_resolve_packages.call_args_list),
+            key=lambda request: str(request.source_dir),
+        ) == expect_requests
+        for request in expect_requests:
+            assert request.output_dir.join_within_root("bom.json").path.exists()
+
+    def test_failed_repository(self, manifest: Path, tmp_cwd: Path) -> None:
+        def resolve_packages(request: Request) -> RequestOutput:
+            if request.source_dir.path.name == "repo-a":
+                raise RuntimeError("something went wrong")
+            return RequestOutput.empty()
+
+        with mock_fetch_deps() as mock_resolve_packages:
+            mock_resolve_packages.side_effect = resolve_packages
+            result = runner.invoke(app, ["fetch-deps-batch", str(manifest)])
+
+        assert result.exit_code == 1
+        assert_pattern_in_output(
+            f"failed to fetch the dependencies of 1 out of 2 repositories: {tmp_cwd / 'repo-a'}",
+            result.output,
+        )
+        # the other repository was still processed
+        assert tmp_cwd.joinpath("output/repo-b/bom.json").exists()
+
+    @pytest.mark.parametrize(
+        "manifest_content, expect_error",
+        [
+            ("- source: [", "is not valid YAML"),
+            ("source: repo-a", "Input should be a valid list"),
+            (
+                "- {source: repo-a, output: output, packages: [{type: gomod}], foo: bar}",
+                "Extra inputs are not permitted",
+            ),
+            (
+                "- {source: no-such-repo, output: output, packages: [{type: gomod}]}",
+                "The source directory does not exist",
+            ),
+            (
+                dedent(
+                    """
+                    - {source: repo-a, output: output/repo, packages: [{type: gomod}]}
+                    - {source: repo-b, output: ./output/../output/repo, packages: [{type: pip}]}
+                    """
+                ),
+                "The output directory is used by more than one repository",
+            ),
+        ],
+    )
+    def test_invalid_manifest(
+        self, manifest_content: str, expect_error: str, manifest: Path
+    ) -> None:
+        manifest.write_text(manifest_content)
+
+        with mock_fetch_deps() as mock_resolve_packages:
+            result = invoke_expecting_invalid_usage(app, ["fetch-deps-batch", str(manifest)])
+
+        assert_pattern_in_output(expect_error, result.output)
+        mock_resolve_packages.assert_not_called()
+
 
 def env_file_as_json(for_output_dir: Path) -> str:
     gocache = f'{{"name": "GOCACHE", "value": "{for_output_dir}/deps/gomod"}}'
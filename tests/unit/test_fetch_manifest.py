@@ -0,0 +1,175 @@
+from pathlib import Path
+from unittest import mock
+
+import git
+import pytest
+
+from cachi2.core.fetch_manifest import MANIFEST_FILENAME, resolve_incrementally
+from cachi2.core.models.input import PackageManagerType, Request
+from cachi2.core.models.output import EnvironmentVariable, RequestOutput
+from cachi2.core.models.sbom import Component
+
+GOMOD_OUTPUT = RequestOutput.from_obj_list(
+    components=[
+        Component(name="github.com/foo/bar", version="v1.0.0", purl="pkg:golang/foo@v1.0.0")
+    ],
+    environment_variables=[
+        EnvironmentVariable(name="GOMODCACHE", value="deps/gomod/pkg/mod", kind="path"),
+    ],
+)
+PIP_OUTPUT = RequestOutput.from_obj_list(
+    components=[Component(name="spam", version="1.0.0", purl="pkg:pypi/spam@1.0.0")],
+)
+
+
+@pytest.fixture
+def source_dir(tmp_path: Path) -> Path:
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    source_dir.joinpath("go.mod").write_text("module example.org/foo\n")
+    source_dir.joinpath("go.sum").write_text("")
+    source_dir.joinpath("requirements.txt").write_text("spam==1.0.0\n")
+
+    repo = git.Repo.init(source_dir)
+    repo.index.add(["go.mod", "go.sum", "requirements.txt"])
+    repo.index.commit("initial commit")
+    return source_dir
+
+
+@pytest.fixture
+def request_(source_dir: Path) -> Request:
+    return Request(
+        source_dir=source_dir,
+        # in the source directory, but that should not make the work tree dirty
+        output_dir=source_dir / "cachi2-output",
+        packages=[{"type": "gomod"}, {"type": "pip"}],
+    )
+
+
+def make_resolve_by_type() -> mock.Mock:
+    def resolve_by_type(request: Request) -> dict[PackageManagerType, RequestOutput]:
+        outputs: dict[PackageManagerType, RequestOutput] = {}
+        for package in request.packages:
+            deps_dir = request.output_dir.join_within_root("deps", package.type).path
+            deps_dir.mkdir(parents=True, exist_ok=True)
+            deps_dir.joinpath("dep.tar.gz").write_text("dependency")
+            outputs[package.type] = GOMOD_OUTPUT if package.type == "gomod" else PIP_OUTPUT
+        return outputs
+
+    return mock.Mock(side_effect=resolve_by_type)
+
+
+def resolved_types(resolve_by_type: mock.Mock) -> list[str]:
+    [call] = resolve_by_type.call_args_list
+    return [package.type for package in call.args[0].packages]
+
+
+def test_reuse_outputs(request_: Request) -> None:
+    resolve_by_type = make_resolve_by_type()
+    expect_outputs = {"gomod": GOMOD_OUTPUT, "pip": PIP_OUTPUT}
+
+    assert resolve_incrementally(request_, resolve_by_type) == expect_outputs
+    assert resolved_types(resolve_by_type) == ["gomod", "pip"]
+    assert request_.output_dir.join_within_root(MANIFEST_FILENAME).path.exists()
+
+    resolve_by_type.reset_mock()
+    assert resolve_incrementally(request_, resolve_by_type) == expect_outputs
+    resolve_by_type.assert_not_called()
+
+
+def test_changed_lockfile(request_: Request, source_dir: Path) -> None:
+    resolve_by_type = make_resolve_by_type()
+    resolve_incrementally(request_, resolve_by_type)
+
+    source_dir.joinpath("requirements.txt").write_text("spam==2.0.0\n")
+    repo = git.Repo(source_dir)
+    repo.index.add(["requirements.txt"])
+    repo.index.commit("update spam")
+
+    resolve_by_type.reset_mock()
+    resolve_incrementally(request_, resolve_by_type)
+    # the commit changed, so the gomod output cannot be reused either (the purls include it)
+    assert resolved_types(resolve_by_type) == ["gomod", "pip"]
+
+
+def test_missing_artifact(request_: Request) -> None:
+    resolve_by_type = make_resolve_by_type()
+    resolve_incrementally(request_, resolve_by_type)
+
+    request_.output_dir.join_within_root("deps", "pip", "dep.tar.gz").path.unlink()
+
+    resolve_by_type.reset_mock()
+    assert resolve_incrementally(request_, resolve_by_type) == {
+        "gomod": GOMOD_OUTPUT,
+        "pip": PIP_OUTPUT,
+    }
+    assert resolved_types(resolve_by_type) == ["pip"]
+
+
+@pytest.mark.parametrize("new_file", ["requirements.txt", "untracked.txt"])
+def test_local_changes(request_: Request, source_dir: Path, new_file: str) -> None:
+    resolve_by_type = make_resolve_by_type()
+    resolve_incrementally(request_, resolve_by_type)
+
+    source_dir.joinpath(new_file).write_text("spam==2.0.0\n")
+
+    resolve_by_type.reset_mock()
+    resolve_incrementally(request_, resolve_by_type)
+    assert resolved_types(resolve_by_type) == ["gomod", "pip"]
+
+
+def test_changed_packages(request_: Request) -> None:
+    resolve_by_type = make_resolve_by_type()
+    resolve_incrementally(request_, resolve_by_type)
+
+    request_.packages[1] = request_.packages[1].model_copy(update={"allow_binary": True})
+
+    resolve_by_type.reset_mock()
+    resolve_incrementally(request_, resolve_by_type)
+    assert resolved_types(resolve_by_type) == ["pip"]
+
+
+def test_different_checkout(request_: Request, source_dir: Path, tmp_path: Path) -> None:
+    resolve_by_type = make_resolve_by_type()
+    resolve_incrementally(request_, resolve_by_type)
+
+    # the same commit, checked out elsewhere, fetched into the same output directory
+    other_checkout = tmp_path / "other-source"
+    git.Repo.clone_from(source_dir, other_checkout)
+    request = Request(
+        source_dir=other_checkout,
+        output_dir=request_.output_dir,
+        packages=request_.packages,
+    )
+
+    resolve_by_type.reset_mock()
+    resolve_incrementally(request, resolve_by_type)
+    assert resolved_types(resolve_by_type) == ["gomod", "pip"]
+
+
+def test_failed_run_invalidates_entry(request_: Request) -> None:
+    resolve_by_type = make_resolve_by_type()
+    resolve_incrementally(request_, resolve_by_type)
+
+    request_.output_dir.join_within_root("deps", "pip", "dep.tar.gz").path.unlink()
+    resolve_by_type.side_effect = RuntimeError("pip failed")
+    with pytest.raises(RuntimeError, match="pip failed"):
+        resolve_incrementally(request_, resolve_by_type)
+
+    # the pip entry is gone, recreating the missing file does not make it valid again
+    request_.output_dir.join_within_root("deps", "pip", "dep.tar.gz").path.write_text("partial")
+    resolve_by_type.reset_mock(side_effect=True)
+    resolve_by_type.side_effect = make_resolve_by_type().side_effect
+    resolve_incrementally(request_, resolve_by_type)
+    assert resolved_types(resolve_by_type) == ["pip"]
+
+
+def test_not_a_git_repository(tmp_path: Path) -> None:
+    request = Request(
+        source_dir=tmp_path, output_dir=tmp_path / "output", packages=[{"type": "pip"}]
+    )
+    resolve_by_type = make_resolve_by_type()
+
+    resolve_incrementally(request, resolve_by_type)
+    resolve_incrementally(request, resolve_by_type)
+    assert resolve_by_type.call_count == 2
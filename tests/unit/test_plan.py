@@ -0,0 +1,129 @@
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+import pytest
+import requests
+
+from cachi2.core.artifact_cache import ArtifactCache
+from cachi2.core.models.input import Request
+from cachi2.core.plan import PlannedArtifact, PlanSummary, plan_request
+
+FOO_URL = "https://example.org/foo-1.0.tar.gz"
+BAR_URL = "https://example.org/bar-2.0.tar.gz"
+BAZ_REPO = "https://github.com/example/baz.git"
+BAZ_REF = "a" * 40
+
+
+@pytest.fixture
+def request_(tmp_path: Path) -> Request:
+    tmp_path.joinpath("subpath").mkdir()
+    return Request(
+        source_dir=tmp_path,
+        output_dir=tmp_path / "cachi2-output",
+        packages=[{"type": "npm"}, {"type": "pip"}, {"type": "pip", "path": "subpath"}],
+    )
+
+
+def pip_artifacts(request: Request) -> list[PlannedArtifact]:
+    artifacts = []
+    for _ in request.pip_packages:
+        artifacts.extend(
+            [
+                PlannedArtifact(
+                    package_manager="pip", name="foo", version="1.0", kind="download", url=FOO_URL
+                ),
+                PlannedArtifact(
+                    package_manager="pip", name="baz", kind="git", url=BAZ_REPO, ref=BAZ_REF
+                ),
+            ]
+        )
+    return artifacts
+
+
+def npm_artifacts(request: Request) -> list[PlannedArtifact]:
+    return [
+        # the size is already known from the package metadata, no need to query it
+        PlannedArtifact(
+            package_manager="npm", name="bar", version="2.0", kind="download", url=BAR_URL, size=42
+        ),
+    ]
+
+
+def mock_head(sizes: dict[str, Optional[str]]) -> mock.Mock:
+    def head(url: str, **kwargs: object) -> mock.Mock:
+        size = sizes[url]
+        if size is None:
+            raise requests.ConnectionError("connection refused")
+        return mock.Mock(headers={"Content-Length": size})
+
+    return mock.Mock(side_effect=head)
+
+
+@mock.patch("cachi2.core.plan.get_artifact_cache", return_value=None)
+@mock.patch("cachi2.core.plan.get_requests_session")
+@mock.patch.dict("cachi2.core.plan._planners", {"npm": npm_artifacts, "pip": pip_artifacts})
+def test_plan_request(
+    mock_get_session: mock.Mock, mock_get_artifact_cache: mock.Mock, request_: Request
+) -> None:
+    mock_get_session.return_value.head = mock_head({FOO_URL: "1024"})
+
+    plan = plan_request(request_)
+
+    assert plan.artifacts == [
+        PlannedArtifact(
+            package_manager="npm", name="bar", version="2.0", kind="download", url=BAR_URL, size=42
+        ),
+        # the duplicate artifacts of the two pip packages are only listed once
+        PlannedArtifact(
+            package_manager="pip",
+            name="foo",
+            version="1.0",
+            kind="download",
+            url=FOO_URL,
+            size=1024,
+        ),
+        PlannedArtifact(package_manager="pip", name="baz", kind="git", url=BAZ_REPO, ref=BAZ_REF),
+    ]
+    assert plan.summary == PlanSummary(
+        artifacts=3,
+        estimated_cache_hits=0,
+        known_size=1066,
+        unknown_sizes=1,
+        estimated_download_size=1066,
+    )
+    mock_get_session.return_value.head.assert_called_once_with(
+        FOO_URL, allow_redirects=True, timeout=mock.ANY
+    )
+    # nothing gets written to the output directory
+    assert not request_.output_dir.path.exists()
+
+
+@mock.patch("cachi2.core.plan.get_requests_session")
+@mock.patch.dict("cachi2.core.plan._planners", {"npm": npm_artifacts, "pip": pip_artifacts})
+def test_plan_request_with_cache_hits(
+    mock_get_session: mock.Mock, request_: Request, tmp_path: Path
+) -> None:
+    artifact_cache = ArtifactCache(tmp_path / "cache")
+    cached_file = tmp_path / "cached"
+    cached_file.write_bytes(b"x" * 100)
+    artifact_cache.store(f"git+{BAZ_REPO}@{BAZ_REF}", cached_file)
+
+    mock_get_session.return_value.head = mock_head({FOO_URL: None})
+
+    with mock.patch("cachi2.core.plan.get_artifact_cache", return_value=artifact_cache):
+        plan = plan_request(request_)
+
+    assert [(a.name, a.size, a.cached) for a in plan.artifacts] == [
+        ("bar", 42, False),
+        # the size could not be queried
+        ("foo", None, False),
+        ("baz", 100, True),
+    ]
+    assert plan.summary == PlanSummary(
+        artifacts=3,
+        estimated_cache_hits=1,
+        known_size=142,
+        unknown_sizes=1,
+        estimated_download_size=42,
+    )
@@ -1,8 +1,10 @@
 import re
+import threading
 from pathlib import Path
 from typing import Callable
 from unittest import mock
 
+import git
 import pytest
 
 from cachi2.core import resolver
@@ -100,6 +102,63 @@ def test_resolve_packages(tmp_path: Path) -> None:
     assert calls_by_pkgtype == ["gomod", "npm", "pip"]
 
 
+@mock.patch("cachi2.core.resolver.get_config")
+def test_resolve_packages_concurrently(mock_get_config: mock.Mock, tmp_path: Path) -> None:
+    mock_get_config.return_value.incremental_fetch = False
+    mock_get_config.return_value.package_manager_concurrency_limit = 3
+    request = Request(
+        source_dir=tmp_path,
+        output_dir=tmp_path,
+        packages=[{"type": "pip"}, {"type": "npm"}, {"type": "gomod"}],
+    )
+
+    all_started = threading.Barrier(3, timeout=5)
+
+    def mock_fetch(output: RequestOutput) -> Callable[[Request], RequestOutput]:
+        def fetch(req: Request) -> RequestOutput:
+            # would time out if the package managers did not run concurrently
+            all_started.wait()
+            return output
+
+        return fetch
+
+    with mock.patch.dict(
+        resolver._package_managers,
+        {
+            "gomod": mock_fetch(GOMOD_OUTPUT),
+            "npm": mock_fetch(NPM_OUTPUT),
+            "pip": mock_fetch(PIP_OUTPUT),
+        },
+    ):
+        assert resolver.resolve_packages(request) == COMBINED_OUTPUT
+
+
+@mock.patch("cachi2.core.resolver.get_config")
+def test_resolve_packages_concurrently_failure(mock_get_config: mock.Mock, tmp_path: Path) -> None:
+    mock_get_config.return_value.incremental_fetch = False
+    mock_get_config.return_value.package_manager_concurrency_limit = 3
+    request = Request(
+        source_dir=tmp_path,
+        output_dir=tmp_path,
+        packages=[{"type": "pip"}, {"type": "npm"}, {"type": "gomod"}],
+    )
+
+    def fail(req: Request) -> RequestOutput:
+        raise UnsupportedFeature("npm failed")
+
+    mock_pip = mock.Mock(return_value=PIP_OUTPUT)
+
+    with mock.patch.dict(
+        resolver._package_managers,
+        {"gomod": mock.Mock(return_value=GOMOD_OUTPUT), "npm": fail, "pip": mock_pip},
+    ):
+        with pytest.raises(UnsupportedFeature, match="npm failed"):
+            resolver.resolve_packages(request)
+
+    # the other package managers still ran to completion
+    mock_pip.assert_called_once_with(request)
+
+
 @pytest.mark.parametrize(
     "packages, copy_exists",
     [
@@ -120,7 +179,7 @@ def test_source_dir_copy(
         packages=packages,
     )
 
-    def _resolve_packages(request: Request) -> None:
+    def _resolve_packages(request: Request) -> dict[str, RequestOutput]:
         if copy_exists:
             tmp_dir_name = request.source_dir.path.name
 
@@ -131,6 +190,7 @@ def test_source_dir_copy(
         else:
             # assert the original source_dir is being used
             assert request.source_dir == RootedPath(tmp_path)
+        return {}
 
     mock_resolve_packages.side_effect = _resolve_packages
 
@@ -140,6 +200,139 @@ def test_source_dir_copy(
     assert request.source_dir == RootedPath(tmp_path)
 
 
+@mock.patch("cachi2.core.resolver.get_config")
+@mock.patch("cachi2.core.resolver._resolve_packages")
+def test_yarn_in_place(
+    mock_resolve_packages: mock.Mock, mock_get_config: mock.Mock, tmp_path: Path
+) -> None:
+    mock_get_config.return_value.incremental_fetch = False
+    mock_get_config.return_value.yarn_in_place = True
+
+    repo = git.Repo.init(tmp_path)
+    project_dir = tmp_path / "frontend"
+    project_dir.mkdir()
+    project_dir.joinpath("package.json").write_text('{"name": "foo"}')
+    project_dir.joinpath("yarn.lock").write_text("lockfile")
+    project_dir.joinpath(".yarn").mkdir()
+    project_dir.joinpath(".yarn", "releases").mkdir()
+    project_dir.joinpath(".yarn", "releases", "yarn.cjs").write_text("yarn")
+    repo.index.add(["frontend/package.json", "frontend/yarn.lock", "frontend/.yarn/releases"])
+    repo.index.commit("initial commit")
+    # untracked files that existed before must be kept
+    project_dir.joinpath("notes.txt").write_text("notes")
+    tmp_path.joinpath("other").mkdir()
+    tmp_path.joinpath("other", "file.txt").write_text("file")
+
+    request = Request(
+        source_dir=tmp_path,
+        output_dir=tmp_path / "output",
+        packages=[{"type": "yarn", "path": "frontend"}],
+    )
+
+    def _resolve_packages(request: Request) -> dict[str, RequestOutput]:
+        assert request.source_dir == RootedPath(tmp_path)
+        project_dir.joinpath("package.json").write_text('{"name": "foo", "packageManager": "x"}')
+        project_dir.joinpath(".yarnrc.yml").write_text("enableScripts: false")
+        project_dir.joinpath(".pnp.cjs").write_text("pnp")
+        project_dir.joinpath(".yarn", "install-state.gz").write_text("state")
+        project_dir.joinpath("node_modules", "bar").mkdir(parents=True)
+        project_dir.joinpath("node_modules", "bar", "index.js").write_text("bar")
+        return {}
+
+    mock_resolve_packages.side_effect = _resolve_packages
+
+    resolver.resolve_packages(request)
+
+    assert project_dir.joinpath("package.json").read_text() == '{"name": "foo"}'
+    relpaths = [path.relative_to(tmp_path) for path in tmp_path.rglob("*")]
+    assert sorted(path.as_posix() for path in relpaths if path.parts[0] != ".git") == [
+        "frontend",
+        "frontend/.yarn",
+        "frontend/.yarn/releases",
+        "frontend/.yarn/releases/yarn.cjs",
+        "frontend/notes.txt",
+        "frontend/package.json",
+        "frontend/yarn.lock",
+        "other",
+        "other/file.txt",
+    ]
+
+
+@mock.patch("cachi2.core.resolver.get_config")
+@mock.patch("cachi2.core.resolver._resolve_packages")
+def test_yarn_in_place_keeps_output_dir(
+    mock_resolve_packages: mock.Mock, mock_get_config: mock.Mock, tmp_path: Path
+) -> None:
+    mock_get_config.return_value.incremental_fetch = False
+    mock_get_config.return_value.yarn_in_place = True
+
+    repo = git.Repo.init(tmp_path)
+    tmp_path.joinpath("package.json").write_text('{"name": "foo"}')
+    repo.index.add(["package.json"])
+    repo.index.commit("initial commit")
+
+    # the output directory is inside the yarn project and does not exist yet
+    output_dir = tmp_path / "cachi2-output"
+    request = Request(
+        source_dir=tmp_path,
+        output_dir=output_dir,
+        packages=[{"type": "yarn", "path": "."}],
+    )
+
+    def _resolve_packages(request: Request) -> dict[str, RequestOutput]:
+        output_dir.joinpath("deps", "yarn").mkdir(parents=True)
+        output_dir.joinpath("deps", "yarn", "bar.tgz").write_text("bar")
+        tmp_path.joinpath(".pnp.cjs").write_text("pnp")
+        return {}
+
+    mock_resolve_packages.side_effect = _resolve_packages
+
+    resolver.resolve_packages(request)
+
+    assert output_dir.joinpath("deps", "yarn", "bar.tgz").exists()
+    assert not tmp_path.joinpath(".pnp.cjs").exists()
+
+
+@mock.patch("cachi2.core.resolver.get_config")
+@mock.patch("cachi2.core.resolver._resolve_packages")
+def test_yarn_in_place_restores_tracked_files(
+    mock_resolve_packages: mock.Mock, mock_get_config: mock.Mock, tmp_path: Path
+) -> None:
+    mock_get_config.return_value.incremental_fetch = False
+    mock_get_config.return_value.yarn_in_place = True
+
+    repo = git.Repo.init(tmp_path)
+    tmp_path.joinpath("package.json").write_text('{"name": "foo"}')
+    # the project commits its yarn outputs
+    tmp_path.joinpath(".pnp.cjs").write_text("pnp")
+    tmp_path.joinpath(".pnp.loader.mjs").write_text("loader")
+    tmp_path.joinpath("README.md").write_text("readme")
+    repo.index.add(["package.json", ".pnp.cjs", ".pnp.loader.mjs", "README.md"])
+    repo.index.commit("initial commit")
+    # local changes that existed before must be kept
+    tmp_path.joinpath("README.md").write_text("local changes")
+
+    request = Request(
+        source_dir=tmp_path,
+        output_dir=tmp_path / "cachi2-output",
+        packages=[{"type": "yarn", "path": "."}],
+    )
+
+    def _resolve_packages(request: Request) -> dict[str, RequestOutput]:
+        tmp_path.joinpath(".pnp.cjs").write_text("rewritten by yarn")
+        tmp_path.joinpath(".pnp.loader.mjs").unlink()
+        tmp_path.joinpath("README.md").write_text("rewritten by yarn")
+        return {}
+
+    mock_resolve_packages.side_effect = _resolve_packages
+
+    resolver.resolve_packages(request)
+
+    assert tmp_path.joinpath(".pnp.cjs").read_text() == "pnp"
+    assert tmp_path.joinpath(".pnp.loader.mjs").read_text() == "loader"
+    assert tmp_path.joinpath("README.md").read_text() == "local changes"
+
+
 @pytest.mark.parametrize(
     "flags",
     [
@@ -1,14 +1,23 @@
 import filecmp
 import tarfile
+import threading
 from pathlib import Path
 from typing import Union
+from unittest import mock
 from urllib.parse import urlsplit
 
 import pytest
 from git.repo import Repo
 
+from cachi2.core.artifact_cache import ArtifactCache
 from cachi2.core.errors import FetchError, UnsupportedFeature
-from cachi2.core.scm import RepoID, clone_as_tarball, get_repo_id
+from cachi2.core.scm import (
+    GitMirrorCache,
+    RepoID,
+    clone_as_tarball,
+    clone_as_tarballs_concurrently,
+    get_repo_id,
+)
 
 INITIAL_COMMIT = "78510c591e2be635b010a52a7048b562bad855a3"
 
@@ -92,6 +101,145 @@ def test_clone_as_tarball(golang_repo_path: Path, tmp_path: Path) -> None:
     assert compare.diff_files == ["go.mod"]
 
 
+@mock.patch("cachi2.core.scm.get_artifact_cache")
+def test_clone_as_tarball_uses_artifact_cache(
+    mock_get_artifact_cache: mock.Mock, golang_repo_path: Path, tmp_path: Path
+) -> None:
+    artifact_cache = ArtifactCache(tmp_path / "cache")
+    mock_get_artifact_cache.return_value = artifact_cache
+    url = f"file://{golang_repo_path}"
+
+    clone_as_tarball(url, INITIAL_COMMIT, tmp_path / "first.tar.gz")
+    assert artifact_cache.lookup(f"git+{url}@{INITIAL_COMMIT}") is not None
+
+    with mock.patch("cachi2.core.scm.Repo.clone_from") as mock_clone_from:
+        clone_as_tarball(url, INITIAL_COMMIT, tmp_path / "second.tar.gz")
+        mock_clone_from.assert_not_called()
+
+    assert (tmp_path / "first.tar.gz").read_bytes() == (tmp_path / "second.tar.gz").read_bytes()
+
+
+@pytest.mark.parametrize("allow_unadvertised_objects", [True, False])
+@mock.patch("cachi2.core.scm.get_config")
+def test_clone_as_tarball_git_archive_shallow_fetch(
+    mock_get_config: mock.Mock,
+    allow_unadvertised_objects: bool,
+    golang_repo_path: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    mock_get_config.return_value.use_git_archive = True
+    mock_get_config.return_value.use_git_mirror_cache = False
+    if not allow_unadvertised_objects:
+        # unlike v2, the git protocol v0 does not allow fetching unadvertised objects by default
+        monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+        monkeypatch.setenv("GIT_CONFIG_KEY_0", "protocol.version")
+        monkeypatch.setenv("GIT_CONFIG_VALUE_0", "0")
+
+    to_path = tmp_path / "my-repo.tar.gz"
+
+    with mock.patch("cachi2.core.scm.Repo.clone_from", wraps=Repo.clone_from) as mock_clone_from:
+        clone_as_tarball(f"file://{golang_repo_path}", INITIAL_COMMIT, to_path)
+
+    # without a shallow fetch, fall back to a full clone
+    assert mock_clone_from.called != allow_unadvertised_objects
+
+    with tarfile.open(to_path) as tar:
+        assert "app/go.mod" in tar.getnames()
+
+
+@mock.patch("cachi2.core.scm.get_git_mirror_cache")
+def test_clone_as_tarball_uses_git_mirror_cache(
+    mock_get_git_mirror_cache: mock.Mock, golang_repo_path: Path, tmp_path: Path
+) -> None:
+    git_mirror_cache = GitMirrorCache(tmp_path / "cache")
+    mock_get_git_mirror_cache.return_value = git_mirror_cache
+    url = f"file://{golang_repo_path}"
+
+    clone_as_tarball(url, INITIAL_COMMIT, tmp_path / "first.tar.gz")
+
+    mirror = git_mirror_cache.update(url, INITIAL_COMMIT)
+    assert Repo(mirror).bare
+
+    # a new commit is fetched into the mirror
+    original_repo = Repo(golang_repo_path)
+    original_repo.index.commit("New commit")
+    new_commit = original_repo.head.commit.hexsha
+    clone_as_tarball(url, new_commit, tmp_path / "second.tar.gz")
+
+    # commits already in the mirror do not need the original repository
+    golang_repo_path.rename(tmp_path / "moved")
+    clone_as_tarball(url, INITIAL_COMMIT, tmp_path / "third.tar.gz")
+
+    with tarfile.open(tmp_path / "second.tar.gz") as tar:
+        tar.extractall(tmp_path / "my-repo")
+
+    my_repo = Repo(tmp_path / "my-repo" / "app")
+    assert my_repo.head.commit.hexsha == new_commit
+    # the repository in the tarball points to the original URL
+    assert my_repo.remote().url == url
+
+
+@pytest.mark.parametrize("use_git_mirror_cache", [False, True])
+@mock.patch("cachi2.core.scm.get_config")
+def test_clone_as_tarball_git_archive(
+    mock_get_config: mock.Mock, use_git_mirror_cache: bool, golang_repo_path: Path, tmp_path: Path
+) -> None:
+    mock_get_config.return_value.use_git_archive = True
+    mock_get_config.return_value.use_git_mirror_cache = use_git_mirror_cache
+    to_path = tmp_path / "my-repo.tar.gz"
+
+    # the blobs are fetched from a partial clone, the origin must allow filtering
+    Repo(golang_repo_path).git.config("uploadpack.allowFilter", "true")
+    Repo(golang_repo_path).git.config("uploadpack.allowAnySHA1InWant", "true")
+
+    with mock.patch("cachi2.core.scm.get_cache_dir", return_value=tmp_path / "cache"):
+        clone_as_tarball(f"file://{golang_repo_path}", INITIAL_COMMIT, to_path)
+
+    with tarfile.open(to_path) as tar:
+        names = tar.getnames()
+        tar.extractall(tmp_path / "my-repo")
+
+    # only the tree of the commit, without the .git directory
+    assert sorted(name for name in names if name != "app") == [
+        "app/.gitignore",
+        "app/README.md",
+        "app/go.mod",
+        "app/go.sum",
+        "app/main.go",
+    ]
+    original_go_mod = Repo(golang_repo_path).git.show(f"{INITIAL_COMMIT}:go.mod")
+    assert (tmp_path / "my-repo/app/go.mod").read_text().rstrip("\n") == original_go_mod
+
+
+@mock.patch("cachi2.core.scm.get_config")
+def test_clone_as_tarball_git_archive_ignores_export_attributes(
+    mock_get_config: mock.Mock, tmp_path: Path
+) -> None:
+    mock_get_config.return_value.use_git_archive = True
+    mock_get_config.return_value.use_git_mirror_cache = False
+
+    repo_path = tmp_path / "repo"
+    repo = Repo.init(repo_path)
+    repo_path.joinpath(".gitattributes").write_text(
+        "ignored.txt export-ignore\nversion.txt export-subst\n"
+    )
+    repo_path.joinpath("ignored.txt").write_text("ignored")
+    repo_path.joinpath("version.txt").write_text("$Format:%H$")
+    repo.index.add([".gitattributes", "ignored.txt", "version.txt"])
+    commit = repo.index.commit("initial commit").hexsha
+
+    to_path = tmp_path / "my-repo.tar.gz"
+    clone_as_tarball(f"file://{repo_path}", commit, to_path)
+
+    with tarfile.open(to_path) as tar:
+        tar.extractall(tmp_path / "my-repo")
+
+    # the same as a checkout of the commit
+    assert (tmp_path / "my-repo/app/ignored.txt").read_text() == "ignored"
+    assert (tmp_path / "my-repo/app/version.txt").read_text() == "$Format:%H$"
+
+
 def test_clone_as_tarball_wrong_url(tmp_path: Path) -> None:
     with pytest.raises(FetchError, match="Failed cloning the Git repository"):
         clone_as_tarball("file:///no/such/directory", INITIAL_COMMIT, tmp_path / "my-repo.tar.gz")
@@ -104,3 +252,54 @@ def test_clone_as_tarball_wrong_ref(golang_repo_path: Path, tmp_path: Path) -> N
         match=f'Please verify the supplied reference of "{bad_commit}" is valid',
     ):
         clone_as_tarball(f"file://{golang_repo_path}", bad_commit, tmp_path / "my-repo.tar.gz")
+
+
+@mock.patch("cachi2.core.scm.clone_as_tarball")
+def test_clone_as_tarballs_concurrently(mock_clone_as_tarball: mock.Mock, tmp_path: Path) -> None:
+    all_started = threading.Barrier(3, timeout=5)
+    # would time out if the repositories were not cloned concurrently
+    mock_clone_as_tarball.side_effect = lambda url, ref, to_path: all_started.wait()
+
+    repos = {
+        tmp_path / f"repo-{i}.tar.gz": (f"https://example.org/repo-{i}", "main") for i in range(3)
+    }
+    clone_as_tarballs_concurrently(repos, max_workers=3)
+
+    assert mock_clone_as_tarball.call_count == 3
+
+
+@pytest.mark.parametrize(
+    "failing_repos, expect_error",
+    [
+        (["repo-1"], FetchError("repo-1 failed")),
+        (
+            ["repo-0", "repo-2"],
+            FetchError(
+                "Failed to fetch 2 Git repositories: "
+                "https://example.org/repo-0@main, https://example.org/repo-2@main"
+            ),
+        ),
+    ],
+)
+@mock.patch("cachi2.core.scm.clone_as_tarball")
+def test_clone_as_tarballs_concurrently_failure(
+    mock_clone_as_tarball: mock.Mock,
+    failing_repos: list[str],
+    expect_error: FetchError,
+    tmp_path: Path,
+) -> None:
+    def clone_as_tarball(url: str, ref: str, to_path: Path) -> None:
+        repo_name = url.rsplit("/", 1)[-1]
+        if repo_name in failing_repos:
+            raise FetchError(f"{repo_name} failed")
+
+    mock_clone_as_tarball.side_effect = clone_as_tarball
+
+    repos = {
+        tmp_path / f"repo-{i}.tar.gz": (f"https://example.org/repo-{i}", "main") for i in range(3)
+    }
+    with pytest.raises(FetchError, match=str(expect_error)):
+        clone_as_tarballs_concurrently(repos)
+
+    # all the repositories were cloned, even after a failure
+    assert mock_clone_as_tarball.call_count == 3
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from cachi2.core import tracing
+from cachi2.core.tracing import Tracer, span, start_tracing, stop_tracing
+
+
+@pytest.fixture
+def tracer() -> Iterator[Tracer]:
+    tracer = start_tracing()
+    try:
+        yield tracer
+    finally:
+        stop_tracing()
+
+
+def get_spans(tracer: Tracer, tmp_path: Path) -> list[dict]:
+    tracer.write(tmp_path / "trace.json")
+    trace = json.loads(tmp_path.joinpath("trace.json").read_text())
+    return [event for event in trace["traceEvents"] if event["ph"] == "X"]
+
+
+def test_span_disabled() -> None:
+    assert tracing._tracer is None
+
+    with span("foo", bar="baz") as span_args:
+        span_args["spam"] = "eggs"
+
+    assert span_args == {"bar": "baz", "spam": "eggs"}
+
+
+def test_span(tracer: Tracer, tmp_path: Path) -> None:
+    with span("outer", url="https://example.org"):
+        with span("inner") as span_args:
+            span_args["bytes"] = 42
+
+    inner, outer = get_spans(tracer, tmp_path)
+
+    assert inner["name"] == "inner"
+    assert inner["args"]["bytes"] == 42
+    assert outer["name"] == "outer"
+    assert outer["args"]["url"] == "https://example.org"
+    assert "cpu_ms" in outer["args"]
+    assert inner["tid"] == outer["tid"] == threading.get_ident()
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_span_error(tracer: Tracer, tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("oops")
+
+    [failing] = get_spans(tracer, tmp_path)
+    assert failing["args"]["error"] == "ValueError"
+
+
+def test_span_in_asyncio_tasks(tracer: Tracer, tmp_path: Path) -> None:
+    async def traced() -> None:
+        with span("task"):
+            await asyncio.sleep(0)
+
+    async def main() -> None:
+        await asyncio.gather(traced(), traced())
+
+    asyncio.run(main())
+
+    first, second = get_spans(tracer, tmp_path)
+    # concurrent tasks are shown separately, their spans would overlap otherwise
+    assert first["tid"] != second["tid"]
+    assert "cpu_ms" not in first["args"]
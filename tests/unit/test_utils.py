@@ -1,5 +1,6 @@
-import shutil
+import io
 import subprocess
+import sys
 from pathlib import Path
 from typing import Optional
 from unittest import mock
@@ -8,7 +9,17 @@ import pytest
 import reflink  # type: ignore
 
 from cachi2.core.errors import Cachi2Error
-from cachi2.core.utils import copy_directory, get_cache_dir, run_cmd
+from cachi2.core.utils import (
+    FileMaterializer,
+    _iter_json_objects,
+    copy_directory,
+    get_cache_dir,
+    materialize_directory,
+    materialize_file,
+    run_cmd,
+    run_cmd_json_stream,
+)
+from tests.common_utils import write_file_tree
 
 
 @mock.patch("subprocess.run")
@@ -84,40 +95,72 @@ def test_run_cmd_executable_not_found(
         run_cmd(["foo"], params={})
 
 
-@mock.patch("shutil.copytree")
-@mock.patch("reflink.supported_at")
-@pytest.mark.parametrize(
-    "reflink_supported",
-    (True, False),
-)
-def test_copy_directory(
-    mock_reflink_supported_at: mock.Mock, mock_shutil_copytree: mock.Mock, reflink_supported: bool
-) -> None:
-    mock_reflink_supported_at.return_value = reflink_supported
+@pytest.mark.parametrize("chunk_size", [1, 3, 64 * 1024])
+def test_iter_json_objects(chunk_size: int) -> None:
+    stream = io.StringIO('{"a": [1, 2]}\n{"b": "c d"} 123 \n 45\n"s"\n')
 
-    origin = Path("/fake")
-    destination = Path("/phony")
+    objects = list(_iter_json_objects(stream, chunk_size))
 
-    copy_directory(origin, destination)
+    assert objects == [{"a": [1, 2]}, {"b": "c d"}, 123, 45, "s"]
 
-    if reflink_supported:
-        copy_function = reflink.reflink
-    else:
-        copy_function = shutil.copy2
 
-    assert mock_shutil_copytree.call_args.kwargs["copy_function"] == copy_function
+def test_iter_json_objects_invalid() -> None:
+    with pytest.raises(ValueError):
+        list(_iter_json_objects(io.StringIO('{"a": 1} {"b": ')))
+
+
+def test_run_cmd_json_stream() -> None:
+    script = "print('{\"a\": 1}'); print('{\"b\": 2}')"
+    objects = run_cmd_json_stream([sys.executable, "-c", script], {})
+
+    assert list(objects) == [{"a": 1}, {"b": 2}]
+
+
+def test_run_cmd_json_stream_failure(caplog: pytest.LogCaptureFixture) -> None:
+    script = "import sys; print('{}'); sys.exit('failed')"
+    objects = run_cmd_json_stream([sys.executable, "-c", script], {})
+
+    assert next(objects) == {}
+    with pytest.raises(subprocess.CalledProcessError):
+        next(objects)
+
+    assert caplog.messages[-1] == "STDERR:\nfailed"
+
+
+def test_run_cmd_json_stream_timeout() -> None:
+    script = "import time; time.sleep(10)"
+    objects = run_cmd_json_stream([sys.executable, "-c", script], {"timeout": 0.1})
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        list(objects)
+
+
+@mock.patch("os.link")
+@mock.patch("reflink.reflink")
+def test_copy_directory(mock_reflink: mock.Mock, mock_link: mock.Mock, tmp_path: Path) -> None:
+    mock_reflink.side_effect = reflink.ReflinkImpossibleError
+
+    origin = tmp_path.joinpath("src")
+    origin.mkdir()
+    origin.joinpath("foo").write_text("foo")
+    origin.joinpath("bar").symlink_to("foo")
+    destination = tmp_path.joinpath("dst")
+
+    assert copy_directory(origin, destination) == destination
+
+    assert destination.joinpath("foo").read_text() == "foo"
+    assert destination.joinpath("bar").readlink() == Path("foo")
+    # the copy must be safe to modify, hardlinks are never used
+    mock_link.assert_not_called()
 
 
 @mock.patch("shutil.copy2")
 @mock.patch("reflink.reflink")
-@mock.patch("reflink.supported_at")
 def test_copy_directory_fallback_on_reflink_fail(
-    mock_reflink_supported_at: mock.Mock,
     mock_reflink: mock.Mock,
     mock_shutil_copy2: mock.Mock,
     tmp_path: Path,
 ) -> None:
-    mock_reflink_supported_at.return_value = True
     mock_reflink.side_effect = reflink.ReflinkImpossibleError
     mock_shutil_copy2.return_value = None
 
@@ -134,6 +177,46 @@ def test_copy_directory_fallback_on_reflink_fail(
     mock_shutil_copy2.assert_called_once()
 
 
+@pytest.mark.parametrize(
+    "reflink_error, link_error",
+    [
+        (None, None),
+        (reflink.ReflinkImpossibleError, None),
+        (reflink.ReflinkImpossibleError, OSError("Invalid cross-device link")),
+    ],
+)
+@mock.patch("os.link")
+@mock.patch("reflink.reflink")
+def test_materialize_file(
+    mock_reflink: mock.Mock,
+    mock_link: mock.Mock,
+    reflink_error: Optional[type[Exception]],
+    link_error: Optional[Exception],
+    tmp_path: Path,
+) -> None:
+    mock_reflink.side_effect = reflink_error
+    mock_link.side_effect = link_error
+
+    origin = tmp_path / "origin"
+    origin.write_text("content")
+    destination = tmp_path / "destination"
+    destination.write_text("old content")
+
+    materialize_file(origin, destination)
+
+    mock_reflink.assert_called_once_with(str(origin), str(destination))
+    if reflink_error:
+        mock_link.assert_called_once_with(origin, destination)
+    else:
+        mock_link.assert_not_called()
+
+    if reflink_error and link_error:
+        assert destination.read_text() == "content"
+    else:
+        # the link functions are mocked, the old destination must have been removed
+        assert not destination.exists()
+
+
 @pytest.mark.parametrize("environ", [{"XDG_CACHE_HOME": "/tmp/xdg_home/"}, {}])
 @mock.patch("pathlib.Path.home")
 @mock.patch("os.environ")
@@ -152,3 +235,39 @@ def test_get_cache_dir(
         expected = Path(tmp_path, ".cache/cachi2")
 
     assert get_cache_dir() == expected
+
+
+@mock.patch("os.link")
+@mock.patch("reflink.reflink")
+def test_file_materializer_skips_failed_methods(
+    mock_reflink: mock.Mock, mock_link: mock.Mock, tmp_path: Path
+) -> None:
+    mock_reflink.side_effect = reflink.ReflinkImpossibleError
+    mock_link.side_effect = OSError("Invalid cross-device link")
+
+    materializer = FileMaterializer()
+    for name in ["a", "b", "c"]:
+        tmp_path.joinpath(name).write_text(name)
+        materializer(tmp_path / name, tmp_path / f"{name}-copy")
+        assert tmp_path.joinpath(f"{name}-copy").read_text() == name
+
+    # the methods that failed for the first file were not tried again
+    mock_reflink.assert_called_once()
+    mock_link.assert_called_once()
+
+
+def test_materialize_directory_move(tmp_path: Path) -> None:
+    origin = tmp_path.joinpath("src")
+    origin.mkdir()
+    write_file_tree({"foo": "foo", "sub": {"bar": "bar"}}, origin)
+    destination = tmp_path.joinpath("dst")
+    destination.mkdir()
+    destination.joinpath("foo").write_text("old foo")
+
+    materialize_directory(origin, destination, move=True)
+
+    assert destination.joinpath("foo").read_text() == "foo"
+    assert destination.joinpath("sub", "bar").read_text() == "bar"
+    # the files were moved, not copied
+    assert not origin.joinpath("foo").exists()
+    assert not origin.joinpath("sub", "bar").exists()